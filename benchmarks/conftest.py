@@ -0,0 +1,69 @@
+"""Shared setup of the pytest-benchmark suite
+
+The suite covers the hot paths of a tick: the controller's on_tick, finding
+the program due, adjusting a program for the watering, the local time
+conversions and pushing a pattern to an OSPi board. The benchmarks are
+parametrized by the number of stations, programs and days, and are not
+collected with the unit tests. They need pytest-benchmark, without which they
+are skipped. Run them with
+
+    python -m pytest benchmarks
+
+Baselines are kept in benchmarks/baselines, by machine. Compare against the
+last one saved, failing on a regression of the median (the mean moves with the
+odd slow round), with
+
+    python -m pytest benchmarks --benchmark-compare --benchmark-compare-fail=median:25%
+
+and save a new one with --benchmark-save=NAME.
+"""
+
+import os
+from typing import Any, Dict, List
+
+import pytest
+
+from sprinkler.program.program_types import ProgramType
+
+try:
+    import pytest_benchmark # pylint: disable=unused-import
+except ImportError: # pragma: no cover
+    collect_ignore_glob = ["test_bench_*.py"] # pylint: disable=invalid-name
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+DEFAULT_STORAGE = "file://./.benchmarks"
+
+LOCAL_TZ = "US/Central"
+
+STATION_COUNTS = [8, 32, 72]
+PROGRAM_COUNTS = [1, 10, 100]
+DAY_COUNTS = [1, 7, 30]
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config: pytest.Config):
+    """Keeps the baselines with the benchmarks, unless told otherwise"""
+    if getattr(config.option, "benchmark_storage", None) == DEFAULT_STORAGE:
+        config.option.benchmark_storage = f"file://{BASELINES}"
+
+def raw_programs(count: int, station_count: int) -> List[Dict[str, Any]]:
+    """Raw programs, spread over the day, each running every station for a minute
+
+The program types go round even days, odd days and weekdays.
+"""
+    program_types = [ProgramType.EVENDAYSONLY, ProgramType.ODDDAYSONLY, ProgramType.DAYOFTHEWEEK]
+    programs = []
+    for idx in range(count):
+        program_type = program_types[idx % len(program_types)]
+        program = {
+            "start_time_of_day": (idx * 86400 // count) // 60 * 60,
+            "station_durations": [{"station_id": _s, "duration": 60}
+                                  for _s in range(1, station_count + 1)],
+            "program_type": int(program_type),
+            "respect_rain": True,
+            "respect_water_adjustment": True,
+            "name": f"program {idx}",
+        }
+        if program_type == ProgramType.DAYOFTHEWEEK:
+            program["days_of_the_week"] = [0, 2, 4]
+        programs.append(program)
+    return programs
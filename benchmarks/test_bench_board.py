@@ -0,0 +1,62 @@
+"""Benchmarks of OSPIBoard.send_pattern against mockpigio"""
+
+import pytest
+
+import mockpigio
+from sprinkler.board.ospi import OSPIBoard
+from sprinkler.station.registry import StationRegistry
+
+from conftest import STATION_COUNTS
+
+# Writes kept in the log of the pi, the rest are only counted in its stats
+LOG_SIZE = 4096
+
+def make_board(station_count: int, use_waveforms: bool, **kwargs) -> OSPIBoard:
+    """A board of station_count stations on a mockpigio.pi made with kwargs"""
+    return OSPIBoard(mockpigio.pi(log_size=LOG_SIZE, **kwargs),
+                     StationRegistry(station_count).stations,
+                     use_waveforms=use_waveforms)
+
+def toggle_stations(board: OSPIBoard):
+    """Changes the pattern, alternating between the first and last station"""
+    first, last = board.stations[0], board.stations[-1]
+    first.on = not first.on
+    last.on = not first.on
+
+@pytest.mark.parametrize("use_waveforms", [True, False], ids=["waveform", "bitbang"])
+@pytest.mark.parametrize("station_count", STATION_COUNTS)
+def test_send_pattern(benchmark, station_count, use_waveforms):
+    """Pushing a changed pattern, with the calls and writes of a push counted"""
+    board = make_board(station_count, use_waveforms, cost_model=mockpigio.PIGPIOD_SOCKET)
+    pushes = []
+    def push():
+        toggle_stations(board)
+        board.send_pattern()
+        pushes.append(None)
+    board.gpio.reset_stats()
+    benchmark(push)
+    stats, pushes = board.gpio.stats, len(pushes)
+    # Every pin change of the push is counted, a clock and data change per bit
+    assert stats.total_writes >= 2 * station_count * pushes
+    benchmark.extra_info["calls_per_push"] = stats.total_calls / pushes
+    benchmark.extra_info["writes_per_push"] = stats.total_writes / pushes
+    # What a push would take against pigpiod on its socket
+    benchmark.extra_info["pigpiod_seconds_per_push"] = stats.seconds / pushes
+
+@pytest.mark.parametrize("use_waveforms", [True, False], ids=["waveform", "bitbang"])
+def test_send_pattern_latency(benchmark, use_waveforms):
+    """Pushing a changed pattern of 8 stations, taking the time pigpiod would"""
+    board = make_board(8, use_waveforms, cost_model=mockpigio.PIGPIOD_SOCKET, sleep=True)
+    def push():
+        toggle_stations(board)
+        board.send_pattern()
+    benchmark.pedantic(push, rounds=50, iterations=1)
+
+def test_send_pattern_suppressed(benchmark):
+    """Sending an unchanged pattern, which doesn't touch the pins"""
+    board = make_board(8, True)
+    board.stations[0].on = True
+    board.send_pattern()
+    board.gpio.reset_stats()
+    benchmark(board.send_pattern)
+    assert board.gpio.stats.total_calls == 0
@@ -0,0 +1,58 @@
+"""Benchmarks of SprinklerController.on_tick"""
+
+import pendulum
+import pytest
+
+from sprinkler.simulation import Simulation
+
+from conftest import DAY_COUNTS, LOCAL_TZ, PROGRAM_COUNTS, STATION_COUNTS, raw_programs
+
+START = pendulum.datetime(2022, 4, 2, tz=LOCAL_TZ).float_timestamp
+
+@pytest.mark.parametrize("program_count", PROGRAM_COUNTS)
+@pytest.mark.parametrize("station_count", STATION_COUNTS)
+def test_on_tick_running(benchmark, program_count, station_count):
+    """A tick in the middle of a program, with nothing due"""
+    simulation = Simulation.for_programs(raw_programs(program_count, station_count),
+                                         station_count, LOCAL_TZ)
+    controller = simulation.controller
+    controller.on_tick(START)
+    now = START + 30
+    controller.on_tick(now)
+    assert controller.current_program is not None
+    benchmark(controller.on_tick, now)
+
+@pytest.mark.parametrize("program_count", PROGRAM_COUNTS)
+def test_on_tick_idle(benchmark, program_count):
+    """A tick with no program running and none due"""
+    simulation = Simulation.for_programs(raw_programs(program_count, 8), 8, LOCAL_TZ)
+    controller = simulation.controller
+    # Program 0 is over by then, and the next starts no sooner than 14 minutes in
+    now = START + 12 * 60
+    controller.on_tick(now)
+    assert controller.current_program is None
+    benchmark(controller.on_tick, now)
+
+@pytest.mark.parametrize("day_count", DAY_COUNTS)
+@pytest.mark.parametrize("program_count", PROGRAM_COUNTS)
+def test_simulated_days(benchmark, program_count, day_count):
+    """Every tick of the event driven mainloop over day_count days"""
+    programs = raw_programs(program_count, 8)
+    def simulate() -> Simulation:
+        simulation = Simulation.for_programs(programs, 8, LOCAL_TZ)
+        simulation.run(START, START + day_count * 86400)
+        return simulation
+    simulation = benchmark.pedantic(simulate, rounds=3, iterations=1)
+    benchmark.extra_info["ticks"] = simulation.ticks
+
+def test_simulated_year(benchmark):
+    """A year of a program every other day, which should take well under a second"""
+    programs = raw_programs(1, 8)
+    def simulate() -> Simulation:
+        simulation = Simulation.for_programs(programs, 8, LOCAL_TZ)
+        simulation.run(START, START + 365 * 86400)
+        return simulation
+    simulation = benchmark.pedantic(simulate, rounds=3, iterations=1)
+    benchmark.extra_info["ticks"] = simulation.ticks
+    if not benchmark.disabled:
+        assert benchmark.stats.stats.median < 1
@@ -0,0 +1,44 @@
+"""Benchmarks of finding the program due with DictProgramManager"""
+
+import pendulum
+import pytest
+
+from sprinkler.program.dictionary.manager import DictProgramManager
+from sprinkler.station.registry import StationRegistry
+
+from conftest import LOCAL_TZ, PROGRAM_COUNTS, raw_programs
+
+START = pendulum.datetime(2022, 4, 2, tz=LOCAL_TZ).float_timestamp
+
+def make_manager(program_count: int) -> DictProgramManager:
+    """A manager of program_count programs on 8 stations"""
+    return DictProgramManager(raw_programs(program_count, 8), StationRegistry(8), LOCAL_TZ)
+
+@pytest.mark.parametrize("program_count", PROGRAM_COUNTS)
+def test_get_program_due(benchmark, program_count):
+    """Looking up, and building, the program due"""
+    manager = make_manager(program_count)
+    assert manager.get_program(START) is not None
+    benchmark(manager.get_program, START)
+
+@pytest.mark.parametrize("program_count", PROGRAM_COUNTS)
+def test_get_program_none_due(benchmark, program_count):
+    """Looking up the program due when there is none, as on most ticks"""
+    manager = make_manager(program_count)
+    now = START + 60
+    assert manager.get_program(now) is None
+    benchmark(manager.get_program, now)
+
+@pytest.mark.parametrize("program_count", PROGRAM_COUNTS)
+def test_next_program_start(benchmark, program_count):
+    """Finding when to wake for the next program"""
+    manager = make_manager(program_count)
+    now = START + 60
+    manager.next_program_start(now)
+    benchmark(manager.next_program_start, now)
+
+@pytest.mark.parametrize("program_count", PROGRAM_COUNTS)
+def test_build_day_index(benchmark, program_count):
+    """Rebuilding the start index as the local day rolls over"""
+    manager = make_manager(program_count)
+    benchmark(manager.build_day_index, START)
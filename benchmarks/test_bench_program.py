@@ -0,0 +1,42 @@
+"""Benchmarks of DictSprinklerProgram"""
+
+from itertools import cycle
+
+import pendulum
+import pytest
+
+from sprinkler.program.dictionary.helpers import turn_dict_into_dict_program
+from sprinkler.program.dictionary.program import DictSprinklerProgram
+from sprinkler.station.registry import StationRegistry
+
+from conftest import LOCAL_TZ, STATION_COUNTS, raw_programs
+
+START = pendulum.datetime(2022, 4, 2, tz=LOCAL_TZ).float_timestamp
+
+def make_program(station_count: int) -> DictSprinklerProgram:
+    """A program running each of station_count stations for a minute"""
+    conf = turn_dict_into_dict_program(raw_programs(1, station_count)[0])
+    return DictSprinklerProgram(START, StationRegistry(station_count), conf)
+
+@pytest.mark.parametrize("station_count", STATION_COUNTS)
+def test_adjust_watering(benchmark, station_count):
+    """Adjusting a whole program as it starts"""
+    program = make_program(station_count)
+    percentages = cycle((0.5, 1.5))
+    benchmark(lambda: program.adjust_watering(next(percentages)))
+
+@pytest.mark.parametrize("station_count", STATION_COUNTS)
+def test_adjust_watering_mid_run(benchmark, station_count):
+    """Adjusting what is left of a program, halfway through"""
+    program = make_program(station_count)
+    now = START + station_count * 30
+    percentages = cycle((0.5, 1.5))
+    benchmark(lambda: program.adjust_watering(next(percentages), now))
+
+@pytest.mark.parametrize("station_count", STATION_COUNTS)
+def test_update_program(benchmark, station_count):
+    """Servicing a running program on a tick with no transition"""
+    program = make_program(station_count)
+    now = START + station_count * 30 + 15
+    program.update_program(now)
+    benchmark(program.update_program, now)
@@ -0,0 +1,69 @@
+"""Benchmarks of the local time conversions
+
+The pendulum implementations they replaced are benchmarked alongside, in the
+same groups, so the comparison shows what the cached zoneinfo versions save.
+"""
+
+import pendulum
+import pytest
+
+from sprinkler.program.time_utilities import local_date_for_utc_now, utc_for_local_midnight
+
+from conftest import DAY_COUNTS, LOCAL_TZ
+
+# The start of DST is in the first week
+START = pendulum.datetime(2023, 3, 8, tz=LOCAL_TZ).float_timestamp
+
+def pendulum_utc_for_local_midnight(now: float, local_tz: str) -> float:
+    """The pendulum implementation of utc_for_local_midnight"""
+    local_now = pendulum.from_timestamp(now, tz=local_tz)
+    return local_now.set(hour=0, minute=0, second=0, microsecond=0).float_timestamp
+
+def pendulum_local_date_for_utc_now(now: float, local_tz: str):
+    """The pendulum implementation of local_date_for_utc_now"""
+    return pendulum.from_timestamp(now, tz=local_tz).date()
+
+CONVERSIONS = {
+    "zoneinfo": (utc_for_local_midnight, local_date_for_utc_now),
+    "pendulum": (pendulum_utc_for_local_midnight, pendulum_local_date_for_utc_now),
+}
+
+def hourly(day_count: int):
+    """A time every hour for day_count days"""
+    return [START + _h * 3600 for _h in range(day_count * 24)]
+
+def test_pendulum_matches():
+    """The pendulum implementations agree with the ones benchmarked against them"""
+    midnight, local_date = CONVERSIONS["zoneinfo"]
+    before_midnight, before_local_date = CONVERSIONS["pendulum"]
+    for now in hourly(DAY_COUNTS[-1]):
+        assert midnight(now, LOCAL_TZ) == before_midnight(now, LOCAL_TZ)
+        assert local_date(now, LOCAL_TZ) == before_local_date(now, LOCAL_TZ)
+
+@pytest.mark.benchmark(group="utc_for_local_midnight same day")
+@pytest.mark.parametrize("implementation", CONVERSIONS)
+def test_utc_for_local_midnight_same_day(benchmark, implementation):
+    """Conversions within the cached local day, as on every tick"""
+    convert = CONVERSIONS[implementation][0]
+    convert(START + 60, LOCAL_TZ)
+    benchmark(convert, START + 60, LOCAL_TZ)
+
+@pytest.mark.parametrize("implementation", CONVERSIONS)
+@pytest.mark.parametrize("day_count", DAY_COUNTS)
+def test_utc_for_local_midnight_hourly(benchmark, day_count, implementation):
+    """A conversion every hour for day_count days, crossing into each new day"""
+    benchmark.group = f"utc_for_local_midnight hourly {day_count}"
+    convert = CONVERSIONS[implementation][0]
+    nows = hourly(day_count)
+    def convert_all():
+        for now in nows:
+            convert(now, LOCAL_TZ)
+    benchmark(convert_all)
+
+@pytest.mark.benchmark(group="local_date_for_utc_now same day")
+@pytest.mark.parametrize("implementation", CONVERSIONS)
+def test_local_date_same_day(benchmark, implementation):
+    """Getting the local date within the cached local day"""
+    local_date = CONVERSIONS[implementation][1]
+    local_date(START + 60, LOCAL_TZ)
+    benchmark(local_date, START + 60, LOCAL_TZ)
@@ -2,6 +2,14 @@
 
 This library exists to handle cases where the pigpio library is not installed
 or we want to fake out the existence of the library for unit testing purposes.
+
+The writes to the pins are logged, every one of them by default or a ring
+buffer of the last log_size for long runs such as benchmarks, and counted in
+the stats of the pi. A CostModel gives what the calls
+would cost against a real pigpiod, a round trip on its socket for every call,
+plus the time a waveform takes to transmit. The cost is added up in the stats,
+and with sleep set the mock also takes that long, so the ways of driving a
+board can be measured and benchmarked without the hardware.
 """
 #pylint: disable=invalid-name
 # pragma: no cover
@@ -9,8 +17,9 @@ or we want to fake out the existence of the library for unit testing purposes.
 # GPIO modes
 
 import time
-from collections import namedtuple
-from typing import List, Mapping
+from collections import Counter, deque, namedtuple
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Mapping, Optional, Union
 
 
 INPUT  = 0
@@ -36,36 +45,192 @@ PUD_UP   = 2
 
 WriteLogEntry = namedtuple("WriteLogEntry", ["pin", "value", "time"])
 
+# Seconds a call costs: call for the round trip to pigpiod every call makes,
+# bank_write on top of it for writing a bank of pins, and wave_pulse for each
+# pulse of a waveform sent, None being the delays of the pulses themselves
+CostModel = namedtuple("CostModel", ["call", "bank_write", "wave_pulse"],
+                       defaults=[0.0, 0.0, None])
+
+# No cost at all, the default
+FREE = CostModel()
+# Rough costs of pigpiod on a Raspberry Pi, over its local socket
+PIGPIOD_SOCKET = CostModel(call=80e-6, bank_write=5e-6)
+
+@dataclass
+class Stats:
+    """What a pi has been asked to do, and what it would have cost
+
+calls counts the calls by name, writes every write by pin, and seconds
+is the total cost of the calls under the CostModel of the pi.
+"""
+    calls: Counter = field(default_factory=Counter)
+    writes: Counter = field(default_factory=Counter)
+    waves_sent: int = 0
+    pulses_sent: int = 0
+    seconds: float = 0.0
+    @property
+    def total_calls(self) -> int:
+        """Calls of every kind"""
+        return sum(self.calls.values())
+    @property
+    def total_writes(self) -> int:
+        """Pin writes of every pin"""
+        return sum(self.writes.values())
+
+class error(Exception): # pragma: no cover
+    """Mock pigpio error"""
+
+class pulse: # pragma: no cover
+    """Mock pigpio pulse used to build waveforms"""
+    def __init__(self, gpio_on: int, gpio_off: int, delay: int):
+        """Setup the pulse, the gpios are bit masks and delay is in microseconds"""
+        self.gpio_on = gpio_on
+        self.gpio_off = gpio_off
+        self.delay = delay
+
 class pi: # pragma: no cover
     """Mock pipgio pi class for testing purposes"""
     def __init__(self,
                  host: str = "localhost",
                  port: int = 8888,
-                 show_errors: bool = True):
-        """Setup the mock"""
+                 show_errors: bool = True,
+                 cost_model: CostModel = FREE,
+                 log_size: Optional[int] = None,
+                 sleep: bool = False,
+                 clock: Callable[[], float] = time.time):
+        """Setup the mock
+
+log_size None keeps every write in a list, otherwise only the last log_size
+are kept, in a deque. With sleep, calls take as long as the
+cost_model says they cost.
+"""
         self.host = host
         self.port = port
         self.show_errors = show_errors
+        self.cost_model = cost_model
+        self.sleep = sleep
+        self.clock = clock
         self.pin_modes: Mapping[int, int] = {}
         self.pin_up_downs: Mapping[int, int] = {}
-        self.write_log: List[WriteLogEntry] = []
+        self.levels: Dict[int, int] = {}
+        self.write_log: Union[List[WriteLogEntry], Deque[WriteLogEntry]] = (
+            [] if log_size is None else deque(maxlen=log_size))
+        self.stats = Stats()
         self.connected = True
+        self.wave_pulses: List[pulse] = []
+        self.waves: Dict[int, List[pulse]] = {}
+        self.next_wave_id = 0
+        self._tx_until: float = 0.0
+    def reset_stats(self):
+        """Starts the stats over"""
+        self.stats = Stats()
+    def _call(self, name: str, cost: float = 0.0):
+        """Counts a call, and what it costs"""
+        self.stats.calls[name] += 1
+        cost += self.cost_model.call
+        self.stats.seconds += cost
+        if self.sleep and cost > 0:
+            time.sleep(cost)
+    def _write(self, pin: int, value: int, now: float):
+        """Logs and counts a write to the pin"""
+        self.levels[pin] = value
+        self.write_log.append(WriteLogEntry(pin, value, now))
+        self.stats.writes[pin] += 1
     def set_mode(self, pin: int, mode: int) -> int:
         """Sets the mode"""
+        self._call("set_mode")
         self.pin_modes[pin] = mode
         return mode
     def get_mode(self, pin: int) -> int:
         """Gets the mode for the pin"""
+        self._call("get_mode")
         return self.pin_modes[pin]
     def set_pull_up_down(self, pin: int, mode: int) -> int:
         """Sets or clears the internal GPIO pull-up/down resistor."""
+        self._call("set_pull_up_down")
         self.pin_up_downs[pin] = mode
         return mode
     def write(self, pin: int, value: int) -> int:
         """Writes a value to the pin"""
-        entry = WriteLogEntry(pin, value, time.time())
-        self.write_log.append(entry)
+        self._call("write")
+        self._write(pin, value, self.clock())
         return 0
     def read(self, pin: int) -> int:
-        """Reads a value from a pin"""
+        """Reads a value from a pin, the last written to it"""
+        self._call("read")
+        return self.levels.get(pin, 0)
+    def set_bank_1(self, bits: int) -> int:
+        """Sets the pins of bank 1 (0-31) whose bits are set"""
+        self._call("set_bank_1", self.cost_model.bank_write)
+        now = self.clock()
+        for pin in range(32):
+            if bits & (1 << pin):
+                self._write(pin, ON, now)
+        return 0
+    def clear_bank_1(self, bits: int) -> int:
+        """Clears the pins of bank 1 (0-31) whose bits are set"""
+        self._call("clear_bank_1", self.cost_model.bank_write)
+        now = self.clock()
+        for pin in range(32):
+            if bits & (1 << pin):
+                self._write(pin, OFF, now)
+        return 0
+    def read_bank_1(self) -> int:
+        """Reads the levels of the pins of bank 1 (0-31)"""
+        self._call("read_bank_1")
+        return sum(1 << _pin for _pin, _level in self.levels.items() if _level and _pin < 32)
+    def wave_clear(self) -> int:
+        """Clears all waveforms and any data added by wave_add_*"""
+        self._call("wave_clear")
+        self.wave_pulses = []
+        self.waves = {}
         return 0
+    def wave_add_generic(self, pulses: List[pulse]) -> int:
+        """Adds a list of pulses to the current waveform"""
+        self._call("wave_add_generic")
+        self.wave_pulses.extend(pulses)
+        return len(self.wave_pulses)
+    def wave_create(self) -> int:
+        """Creates a waveform from the added pulses, returning its id"""
+        self._call("wave_create")
+        wave_id = self.next_wave_id
+        self.next_wave_id += 1
+        self.waves[wave_id] = self.wave_pulses
+        self.wave_pulses = []
+        return wave_id
+    def wave_delete(self, wave_id: int) -> int:
+        """Deletes the waveform"""
+        self._call("wave_delete")
+        del self.waves[wave_id]
+        return 0
+    def wave_send_once(self, wave_id: int) -> int:
+        """Transmits the waveform, replaying its pulses into the write log
+
+The transmission takes the delays of the pulses, or wave_pulse each if the cost
+model has it. With sleep, wave_tx_busy is 1 until then, otherwise the time is
+only added to the stats.
+"""
+        pulses = self.waves[wave_id]
+        self._call("wave_send_once")
+        if self.cost_model.wave_pulse is None:
+            tx_time = sum(_p.delay for _p in pulses) * 1e-6
+        else:
+            tx_time = self.cost_model.wave_pulse * len(pulses)
+        self.stats.waves_sent += 1
+        self.stats.pulses_sent += len(pulses)
+        self.stats.seconds += tx_time
+        if self.sleep:
+            self._tx_until = time.monotonic() + tx_time
+        now = self.clock()
+        for wave_pulse in pulses:
+            for pin in range(32):
+                if wave_pulse.gpio_off & (1 << pin):
+                    self._write(pin, OFF, now)
+            for pin in range(32):
+                if wave_pulse.gpio_on & (1 << pin):
+                    self._write(pin, ON, now)
+        return len(pulses)
+    def wave_tx_busy(self) -> int:
+        """Returns 1 while a waveform is transmitting"""
+        self._call("wave_tx_busy")
+        return int(self.sleep and time.monotonic() < self._tx_until)
@@ -17,11 +17,19 @@ setuptools.setup(
     packages=setuptools.find_packages(exclude=["test", "build"]),
     install_requires=[
         'click',
-        'pendulum',
-        'marshmallow'
+        'marshmallow',
+        'tzdata'
     ],
+    extras_require={
+        'plan': ['numpy'],
+        # The tests and benchmarks build their times with pendulum, and the
+        # tests cover the planner too
+        'test': ['pendulum', 'numpy'],
+        'bench': ['pendulum', 'pytest', 'pytest-benchmark'],
+    },
     entry_points={
         'console_scripts': [
+            'sprinkler-run = sprinkler.scripts.run:main',
         ]
     },
     classifiers=[
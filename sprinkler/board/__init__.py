@@ -1,4 +1,24 @@
-"""Library for the Board"""
+"""Library for the Board
 
-from sprinkler.board.virtual import VirtualStreamBoard
-from sprinkler.board.ospi import OSPIBoard
+The boards are imported on first use, so importing the package doesn't pull in
+pigpio or the board modules that aren't used.
+"""
+
+from importlib import import_module
+from typing import Any
+
+_LAZY = {
+    "VirtualStreamBoard": "sprinkler.board.virtual",
+    "OSPIBoard": "sprinkler.board.ospi",
+}
+
+__all__ = list(_LAZY)
+
+def __getattr__(name: str) -> Any:
+    """Imports the boards as they are asked for"""
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module), name)
+    globals()[name] = value
+    return value
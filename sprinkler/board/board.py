@@ -1,9 +1,11 @@
 """Board Definition"""
 
 from abc import ABC, abstractmethod
-from typing import List
+from functools import partial
+from typing import Callable, List, Optional
 
-from sprinkler.station.station import Station
+from sprinkler.metrics import MetricsSink
+from sprinkler.station.station import BaseStation
 
 class Board(ABC):
     """Represents a controller board
@@ -14,19 +16,66 @@ abstract base class that provides the interface between the Controller and the
 given Board. This allows for managing a single board physically connected to
 the device connected, as well as for a Mock Board that only exists in software
 for testing purposes.
+
+The state of the stations is kept packed in an integer, the first station being
+the least significant bit. The board watches its stations, so the integer is
+updated as a station is turned on or off rather than by looking at every
+station, and comparing two patterns is comparing two integers. The stations
+are watched when they are assigned to the board, so assign a new list rather
+than changing the list in place.
+
+A Sequencer may hold stations off for a while after they are turned on, by
+setting their bits in held, and drives the master valve or pump through
+master_on. The pattern sent is that of the stations, less what is held.
 """
     def __init__(self):
         """Setup the board"""
-        self.stations: List[Station] = []
+        self._stations: List[BaseStation] = []
+        self._watchers: List[Callable[[bool], None]] = []
+        self._state: int = 0
+        self._msb_order: range = range(0)
+        self.held: int = 0
+        self.master_on: bool = False
+        self.metrics: Optional[MetricsSink] = None
+    @property
+    def stations(self) -> List[BaseStation]:
+        """The stations of the board, in bit order"""
+        return self._stations
+    @stations.setter
+    def stations(self, stations: List[BaseStation]):
+        for station, watcher in zip(self._stations, self._watchers):
+            station.unwatch(watcher)
+        self._stations = stations
+        self._watchers = [partial(self._station_changed, 1 << bit)
+                          for bit in range(len(stations))]
+        self._state = 0
+        for bit, (station, watcher) in enumerate(zip(stations, self._watchers)):
+            station.watch(watcher)
+            if station.on:
+                self._state |= 1 << bit
+        self._msb_order = range(len(stations) - 1, -1, -1)
+    def _station_changed(self, mask: int, state: bool):
+        """Updates the packed pattern for a station changing state"""
+        if state:
+            self._state |= mask
+        else:
+            self._state &= ~mask
+    @property
+    def requested_pattern(self) -> int:
+        """The stations that are on packed in an integer, held or not"""
+        return self._state
+    @property
+    def packed_pattern(self) -> int:
+        """The bit pattern packed in an integer, the first station is bit 0"""
+        return self._state & ~self.held
     def get_bit_pattern(self) -> List[int]:
         """Get the bit pattern"""
-        pattern = []
-        for station in self.stations:
-            state = 0
-            if station.on:
-                state = 1
-            pattern.append(state)
-        return pattern
+        state = self.packed_pattern
+        return [(state >> bit) & 1 for bit in range(len(self._stations))]
+    def get_msb_pattern(self) -> List[int]:
+        """Get the bit pattern, last station first"""
+        state = self.packed_pattern
+        return [(state >> bit) & 1 for bit in self._msb_order]
     @abstractmethod
     def send_pattern(self):
         """Applies the current pattern to the underlying hardware"""
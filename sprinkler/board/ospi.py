@@ -1,66 +1,98 @@
 """Open Sprinkler Pi Board"""
 
-from typing import List
+import time
+from functools import lru_cache
+from types import ModuleType
+from typing import TYPE_CHECKING, List, Optional
 from sprinkler.board.pins import SRPins
 from sprinkler.board.board import Board
-from sprinkler.station.station import Station
+from sprinkler.station.station import BaseStation
 
 # pin_sr_dat = 27 # Shift Register Data Pin
 # pin_sr_clk = 4  # Shift Register Clock Pin
 # pin_sr_oe = 17  # Shift Register Output Enable Pin
 # pin_sr_lat = 22 # Shift Register Latch Pin
 
-# We will attempt to import pigpio
-# If we can't, we've got a mock that will pretend for the
-# core pieces we care about
-try:
+if TYPE_CHECKING: # pragma: no cover
     import pigpio # type: ignore
-except ImportError:
-    import mockpigio as pigpio
+
+# Microseconds each step of a waveform is held, well above what the 74HC595
+# shift registers need
+WAVE_STEP_US = 2
+# Seconds to wait between polls for the waveform to finish transmitting
+WAVE_POLL_S = 0.0005
+
+@lru_cache(maxsize=None)
+def load_pigpio() -> ModuleType:
+    """Imports pigpio the first time a board needs it
+
+If we can't, we've got a mock that will pretend for the core pieces we care
+about.
+"""
+    # pylint: disable=import-outside-toplevel
+    try:
+        import pigpio # type: ignore
+    except ImportError:
+        import mockpigio as pigpio
+    return pigpio
 
 def get_pigpio_pi(host: str = 'localhost',
                   port: int = 8888,
-                  show_errors: bool = True) -> pigpio.pi: # pragma: no cover
+                  show_errors: bool = True) -> "pigpio.pi": # pragma: no cover
     """Wrapper to get the pigpio"""
-    return pigpio.pi(host=host, port=port, show_errors=show_errors)
+    return load_pigpio().pi(host=host, port=port, show_errors=show_errors)
 
 class PiGPIOConnFailure(Exception):
     """Raised for connection failures"""
 
 class OSPIBoard(Board):
-    """Represents the physical hardware of a Open Sprinkler Pi Board"""
+    """Represents the physical hardware of a Open Sprinkler Pi Board
+
+With use_master_relay, the external relay follows master_on, to drive a master
+valve or pump.
+"""
     def __init__(self,
-                 gpio_connector: pigpio.pi,
-                 stations: List[Station],
-                 use_rain_sensor: bool = False):
+                 gpio_connector: "pigpio.pi",
+                 stations: List[BaseStation],
+                 use_rain_sensor: bool = False,
+                 use_waveforms: bool = True,
+                 use_master_relay: bool = False):
         super().__init__()
         self.stations = stations
         self.use_rain_sensor = use_rain_sensor
-        self.gpio: pigpio.pi = gpio_connector
+        self.use_master_relay = use_master_relay
+        # Waveforms are turned off if pigpiod ever refuses one
+        self.use_waveforms = use_waveforms
+        self.gpio: "pigpio.pi" = gpio_connector
+        self.pigpio: ModuleType = load_pigpio()
         if not self.gpio.connected:
             raise PiGPIOConnFailure("Failed to connect to pigpiod")
         self.setup_pins()
-        self._previous_pattern = None
+        self._previous_state: Optional[int] = None
+        self._previous_master: Optional[bool] = None
     def setup_pins(self):
         """Setup the pins for the board"""
         if not self.gpio:
             return # pragma: no cover
-        self.gpio.set_mode(SRPins.OUTPUT_EN, pigpio.OUTPUT)
-        self.gpio.set_mode(SRPins.CLOCK, pigpio.OUTPUT)
-        self.gpio.set_mode(SRPins.DATA, pigpio.OUTPUT)
-        self.gpio.set_mode(SRPins.LATCH, pigpio.OUTPUT)
+        self.gpio.set_mode(SRPins.OUTPUT_EN, self.pigpio.OUTPUT)
+        self.gpio.set_mode(SRPins.CLOCK, self.pigpio.OUTPUT)
+        self.gpio.set_mode(SRPins.DATA, self.pigpio.OUTPUT)
+        self.gpio.set_mode(SRPins.LATCH, self.pigpio.OUTPUT)
         if self.use_rain_sensor:
-            self.gpio.set_pull_up_down(SRPins.RAIN, pigpio.PUD_UP)
+            self.gpio.set_pull_up_down(SRPins.RAIN, self.pigpio.PUD_UP)
+        if self.use_master_relay:
+            self.gpio.set_mode(SRPins.EXTERNAL_RELAY, self.pigpio.OUTPUT)
+            self.gpio.write(SRPins.EXTERNAL_RELAY, self.pigpio.OFF)
         # Force the levels the first time, they are in a random state
-        self.gpio.write(SRPins.OUTPUT_EN, pigpio.ON)
-        self.gpio.write(SRPins.CLOCK, pigpio.OFF)
-        self.gpio.write(SRPins.DATA, pigpio.OFF)
-        self.gpio.write(SRPins.LATCH, pigpio.OFF)
+        self.gpio.write(SRPins.OUTPUT_EN, self.pigpio.ON)
+        self.gpio.write(SRPins.CLOCK, self.pigpio.OFF)
+        self.gpio.write(SRPins.DATA, self.pigpio.OFF)
+        self.gpio.write(SRPins.LATCH, self.pigpio.OFF)
     def enable_disable_register(self, enable: bool) -> int:
         """Enables or Disables the Shift Register the shift register"""
-        bit_val = pigpio.HIGH
+        bit_val = self.pigpio.HIGH
         if enable:
-            bit_val = pigpio.LOW
+            bit_val = self.pigpio.LOW
         return self.gpio.write(SRPins.OUTPUT_EN, bit_val)
     def enable_shift_register(self) -> int:
         """Enables the shift register"""
@@ -73,19 +105,19 @@ class OSPIBoard(Board):
         return self.gpio.write(SRPins.CLOCK, bit)
     def clock_up(self) -> int:
         """Set the clock high"""
-        return self.set_clock(pigpio.HIGH)
+        return self.set_clock(self.pigpio.HIGH)
     def clock_down(self) -> int:
         """Set the clock low"""
-        return self.set_clock(pigpio.LOW)
+        return self.set_clock(self.pigpio.LOW)
     def set_latch(self, bit: int) -> int:
         """Set the latch pin"""
         return self.gpio.write(SRPins.LATCH, bit)
     def latch(self) -> int:
         """Latch the shift register"""
-        return self.set_latch(pigpio.HIGH)
+        return self.set_latch(self.pigpio.HIGH)
     def unlatch(self) -> int:
         """Unlatch the shift register"""
-        return self.set_latch(pigpio.LOW)
+        return self.set_latch(self.pigpio.LOW)
     def set_data_pin(self, bit: int) -> int:
         """Sets the data pin"""
         return self.gpio.write(SRPins.DATA, bit)
@@ -99,15 +131,82 @@ class OSPIBoard(Board):
             self.set_data_pin(bit)
             self.clock_up()
         self.latch()
+    def wave_pulses_for_bits(self, bits: List[int]) -> List["pigpio.pulse"]:
+        """Encodes disabling, writing the bits in the order given, and enabling
+
+This is the same sequence of pin changes as disable_shift_register,
+write_bits_to_register and enable_shift_register, as pigpio pulses.
+"""
+        clock = 1 << SRPins.CLOCK
+        data = 1 << SRPins.DATA
+        latch = 1 << SRPins.LATCH
+        output_en = 1 << SRPins.OUTPUT_EN
+        pulse = self.pigpio.pulse
+        pulses = [pulse(output_en, clock | latch, WAVE_STEP_US)]
+        for bit in bits:
+            if bit:
+                pulses.append(pulse(data, clock, WAVE_STEP_US))
+            else:
+                pulses.append(pulse(0, clock | data, WAVE_STEP_US))
+            pulses.append(pulse(clock, 0, WAVE_STEP_US))
+        pulses.append(pulse(latch, 0, WAVE_STEP_US))
+        pulses.append(pulse(0, output_en, WAVE_STEP_US))
+        return pulses
+    def wave_bits_to_register(self, bits: List[int]) -> bool:
+        """Sends the bits as a single waveform, returns False if that failed
+
+On failure waveforms are disabled for the board, and the pattern should be
+written again bit by bit. A waveform that was created is always deleted.
+"""
+        try:
+            self.gpio.wave_add_generic(self.wave_pulses_for_bits(bits))
+            wave_id = self.gpio.wave_create()
+            if wave_id < 0:
+                self.gpio.wave_clear()
+                self.use_waveforms = False
+                return False
+            try:
+                self.gpio.wave_send_once(wave_id)
+                while self.gpio.wave_tx_busy():
+                    time.sleep(WAVE_POLL_S) # pragma: no cover
+            finally:
+                self.gpio.wave_delete(wave_id)
+        except (AttributeError, self.pigpio.error):
+            self.use_waveforms = False
+            return False
+        return True
+    def set_master_relay(self, state: bool) -> int:
+        """Switches the external relay of the master valve or pump"""
+        return self.gpio.write(SRPins.EXTERNAL_RELAY,
+                               self.pigpio.HIGH if state else self.pigpio.LOW)
     def send_pattern(self):
-        """Applies the current pattern to the underlying hardware"""
-        pattern = self.get_bit_pattern()
-        if self._previous_pattern is not None and self._previous_pattern == pattern:
+        """Applies the current pattern to the underlying hardware
+
+The master relay comes on after the valves are written, and goes off before.
+"""
+        master = self.use_master_relay and self.master_on
+        if self.use_master_relay and not master and self._previous_master:
+            self._previous_master = False
+            self.set_master_relay(False)
+        self.send_station_pattern()
+        if master and not self._previous_master:
+            self._previous_master = True
+            self.set_master_relay(True)
+    def send_station_pattern(self):
+        """Writes the pattern of the stations to the shift register, if it changed"""
+        state = self.packed_pattern
+        if self._previous_state == state:
             # We don't excessively bang on the shift-register
+            if self.metrics is not None:
+                self.metrics.increment("board_patterns_suppressed")
             return
-        self._previous_pattern = pattern
+        self._previous_state = state
+        if self.metrics is not None:
+            self.metrics.increment("board_patterns_pushed")
         # pattern goes out in MSB order
-        pattern.reverse()
+        pattern = self.get_msb_pattern()
+        if self.use_waveforms and self.wave_bits_to_register(pattern):
+            return
         self.disable_shift_register()
         self.write_bits_to_register(pattern)
         self.enable_shift_register()
@@ -0,0 +1,67 @@
+"""Sequencing of the valves of a board and its master valve or pump
+
+A program turns one station off and the next on in the same tick. The board
+already gets a single push for the both of them, but the valve closing and the
+one opening overlap on the water line, and a master valve or pump would be
+switched off and on again between them if it simply followed the stations.
+"""
+
+from typing import Optional
+
+from sprinkler.board.board import Board
+
+
+class Sequencer:
+    """Sequences the pattern sent to a board
+
+Stations turning off go off straight away. A station turning on within
+station_delay seconds of another turning off is held off until the delay is up,
+so one valve has closed before the next opens.
+
+With master set, the board drives its master valve or pump, which is on while
+a station is on or held, and for master_off_delay seconds after the last one
+goes off. Back to back stations, with or without a station delay between
+them, then keep it on throughout rather than cycling it.
+
+update is called with the time of the tick before the board is sent its
+pattern, and next_transition says when it has to be called next.
+"""
+    def __init__(self,
+                 board: Board,
+                 station_delay: float = 0,
+                 master: bool = False,
+                 master_off_delay: float = 0):
+        """Sequences board"""
+        self.board = board
+        self.station_delay = station_delay
+        self.master = master
+        self.master_off_delay = master_off_delay
+        self._sent: int = 0
+        self._last_off: float = float("-inf")
+    def update(self, now: float):
+        """Works out what is held and if the master is on at now"""
+        board = self.board
+        requested = board.requested_pattern
+        if self._sent & ~requested:
+            self._last_off = now
+        turning_on = requested & ~self._sent
+        if turning_on and now < self._last_off + self.station_delay:
+            board.held = turning_on
+        else:
+            board.held = 0
+        self._sent = requested & ~board.held
+        if self.master:
+            board.master_on = bool(requested) or now < self._last_off + self.master_off_delay
+    def next_transition(self, now: float) -> Optional[float]:
+        """The next UTC time after now that update changes the pattern, if any"""
+        board = self.board
+        if board.held:
+            return self._last_off + self.station_delay
+        if board.master_on and not board.requested_pattern:
+            return self._last_off + self.master_off_delay
+        return None
+    def stop(self):
+        """Drops anything held and turns the master off, for a full stop"""
+        self.board.held = 0
+        self.board.master_on = False
+        self._sent = 0
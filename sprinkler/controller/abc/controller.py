@@ -1,10 +1,19 @@
 """Controller that provides what is essentially the mainloop for the controller"""
 
+import threading
+import time
 from abc import ABC, abstractmethod
+from typing import Any, Callable, Optional, Union
 
 from sprinkler.board.board import Board
+from sprinkler.board.sequencer import Sequencer
+from sprinkler.controller.queue import PRIORITY_ADHOC, PRIORITY_MANUAL, PRIORITY_SCHEDULED
+from sprinkler.controller.queue import QueuePolicy, RunQueue
+from sprinkler.metrics import MetricsSink
 from sprinkler.program.abc import ProgramManager
 from sprinkler.program.abc import SprinklerProgram
+from sprinkler.program.manual import ManualProgram
+from sprinkler.station.station import BaseStation
 
 
 class SprinklerController(ABC):
@@ -30,6 +39,34 @@ state of the valves.
 The core function is on_tick, which is called with the current clock in UTC. It
 checks for weather, rain delays, watering adjustments, services existing
 programs, checks for programs to run, and asks the HW to update its state.
+
+The run method is the mainloop. Station state only changes at the edges of the
+current program and when the manager has a program due, so rather than calling
+on_tick every second, by default it sleeps until the next of those transitions,
+or at most max_sleep seconds so the weather is still looked at. Anything that
+changes the picture in between, such as a config change, a weather event or a
+manual run, calls wake to get a tick right away.
+
+If metrics is set to a MetricsSink, each tick is timed, as are its phases of
+getting the next program, updating the program and sending the pattern, and a
+tick taking longer than tick_interval is counted as an overrun.
+
+Programs to run go through run_queue, a priority queue where manual runs of a
+station come before ad-hoc programs, which come before scheduled ones. When
+the current program is over, the next program on the queue starts in the same
+tick, moved to start then if it waited. queue_policy decides what happens to a
+scheduled program coming due while another runs: SKIP, the default, drops it
+and doesn't even look for scheduled programs while one runs; DEFER queues it;
+MERGE queues it unless the stations it runs are already going to be watered.
+Manual and ad-hoc runs are queued whatever the policy. The queue only
+holds programs it was handed on time; catching up on a start missed while not
+looking, as under SKIP, is left to the manager (see DictProgramManager max_defer).
+
+A program is adjusted for the watering percentage as it starts. If the
+percentage changes while it runs, what is left of it is adjusted on that tick.
+
+With sequencer set, the pattern goes through it on the way to the board, for
+delays between stations and to drive a master valve or pump.
 """
     def __init__(self):
         """Initialize the controller"""
@@ -38,12 +75,32 @@ programs, checks for programs to run, and asks the HW to update its state.
         self.manager: ProgramManager = None
         self.last_tick: float = 0
         self.water_adjust_percent: float = 100
+        self.tick_interval: float = 1
+        self.max_sleep: float = 60
+        self._running: bool = False
+        self._wake_event = threading.Event()
+        self.metrics: Optional[MetricsSink] = None
+        self.run_queue = RunQueue()
+        self.queue_policy: QueuePolicy = QueuePolicy.SKIP
+        # water_adjust_percent as last applied to the current program
+        self._applied_adjust_percent: float = self.water_adjust_percent
+        self.sequencer: Optional[Sequencer] = None
+
+    def apply_watering_adjustment(self, now: Optional[float] = None):
+        """Applies water_adjust_percent to the current program
 
-    def get_next_program(self, now: float) -> SprinklerProgram:
+Given now, only what is left of a running program is adjusted. This is cheap,
+so it is done on the tick the percentage changes.
+"""
+        program = self.current_program
+        if program and program.respects_water_adjustment:
+            program.adjust_watering(self.water_adjust_percent / 100, now)
+        self._applied_adjust_percent = self.water_adjust_percent
+    def get_next_program(self, now: float) -> Union[SprinklerProgram, None]:
         """Get the next program"""
         program = self.manager.get_program(now)
-        if program.respects_water_adjustment:
-            program.adjust_watering(self.water_adjust_percent)
+        if program and program.respects_water_adjustment:
+            program.adjust_watering(self.water_adjust_percent / 100)
         return program
 
     @abstractmethod
@@ -56,33 +113,202 @@ programs, checks for programs to run, and asks the HW to update its state.
     def update_watering_percentage(self):
         """Updates the watering percentage"""
 
+    def _timed(self, phase: str, func: Callable, *args) -> Any:
+        """Calls func, timing it as the phase of the tick if there are metrics"""
+        metrics = self.metrics
+        if metrics is None:
+            return func(*args)
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            metrics.observe(f"tick_{phase}_seconds", time.perf_counter() - start)
+
     def on_tick(self, now: float):
         """Called on every tick of the clock"""
+        metrics = self.metrics
+        if metrics is None:
+            self.service_tick(now)
+            return
+        start = time.perf_counter()
+        self.service_tick(now)
+        elapsed = time.perf_counter() - start
+        metrics.observe("tick_seconds", elapsed)
+        if elapsed > self.tick_interval:
+            metrics.increment("tick_overruns")
+    def _count(self, name: str):
+        """Counts name if there are metrics"""
+        if self.metrics is not None:
+            self.metrics.increment(name)
+    def _runs_same_stations(self, program: SprinklerProgram) -> bool:
+        """True if the current program or a queued one runs the stations of program"""
+        stations = {id(_s) for _s in program.stations}
+        others = self.run_queue.programs
+        if self.current_program:
+            others.append(self.current_program)
+        return any(stations <= {id(_s) for _s in _other.stations} for _other in others)
+    def queue_program(self,
+                      program: SprinklerProgram,
+                      now: float,
+                      priority: int = PRIORITY_ADHOC) -> bool:
+        """Queues program to run, returning False if it was dropped
+
+The same run as the current program or one already queued is dropped, as is
+a scheduled program that queue_policy says not to run as another is running.
+Manual and ad-hoc runs were asked for, so they are always queued.
+"""
+        current = self.current_program
+        if (current and current.same_run(program)) or program in self.run_queue:
+            return False
+        if self.current_program and priority == PRIORITY_SCHEDULED:
+            if self.queue_policy == QueuePolicy.SKIP:
+                self._count("queue_skipped")
+                return False
+            if self.queue_policy == QueuePolicy.MERGE and self._runs_same_stations(program):
+                self._count("queue_merged")
+                return False
+            self._count("queue_deferred")
+        self.run_queue.push(program, priority, now)
+        return True
+    def run_program(self,
+                    program: SprinklerProgram,
+                    now: Optional[float] = None,
+                    priority: int = PRIORITY_ADHOC) -> bool:
+        """Queues an ad-hoc program, waking the mainloop to start it"""
+        queued = self.queue_program(program, time.time() if now is None else now, priority)
+        self.wake()
+        return queued
+    def run_station(self,
+                    station: BaseStation,
+                    duration: float,
+                    now: Optional[float] = None,
+                    priority: int = PRIORITY_MANUAL) -> bool:
+        """Queues a manual run of a single station for duration seconds"""
+        now = time.time() if now is None else now
+        return self.run_program(ManualProgram(now, station, duration), now, priority)
+    def _collect_due_program(self, now: float):
+        """Queues the scheduled program due now, if any"""
+        program = self._timed("get_next_program", self.get_next_program, now)
+        if program:
+            self.queue_program(program, now, PRIORITY_SCHEDULED)
+    def _start_next_program(self, now: float) -> Union[SprinklerProgram, None]:
+        """Takes the next program off the queue, moving it to now if it waited"""
+        queued = self.run_queue.pop()
+        if queued is None:
+            return None
+        program = queued.program
+        if queued.queued_at < now and program.start_time < now:
+            program.reschedule(now)
+        return program
+    def send_pattern(self):
+        """Sends the pattern of the stations to the board"""
+        if self.sequencer is not None:
+            self.sequencer.update(self.last_tick)
+        self._timed("send_pattern", self.board.send_pattern)
+    def _service_running(self, running: SprinklerProgram, now: float):
+        """Updates the running program, retiring it once it is over"""
+        if self.water_adjust_percent != self._applied_adjust_percent:
+            self.apply_watering_adjustment(now)
+        self._timed("update_program", running.update_program, now)
+        if self.queue_policy != QueuePolicy.SKIP:
+            self._collect_due_program(now)
+        if running.program_over(now):
+            self.current_program = None
+    def service_tick(self, now: float):
+        """Does the work of a tick"""
+        self.last_tick = now
         # Everything respects the cold weather lockout
         if self.cold_weather_lockout():
             if self.current_program:
                 self.current_program = None
+            self.run_queue.clear()
             self.full_stop()
             return
         # Update the watering adjustment
         self.update_watering_percentage()
-        if self.current_program:
-            if self.rain_delay() and self.current_program.respect_rain_delay():
+        running = self.current_program
+        if running:
+            if self.rain_delay() and running.respect_rain_delay:
+                # Held off by the rain, the program still ends when it would have
                 self.full_stop()
-                return
-            self.current_program.update_program(now)
+                if not running.program_over(now):
+                    if self.queue_policy != QueuePolicy.SKIP:
+                        self._collect_due_program(now)
+                    return
+                self.current_program = None
+                self._collect_due_program(now)
+            else:
+                self._service_running(running, now)
         else:
-            next_program = self.get_next_program(now)
+            self._collect_due_program(now)
+        if not self.current_program:
+            next_program = self._start_next_program(now)
             if next_program:
                 self.current_program = next_program
-                if self.rain_delay() and self.current_program.respect_rain_delay():
+                self.apply_watering_adjustment()
+                if self.rain_delay() and self.current_program.respect_rain_delay:
                     self.full_stop()
                     return
-                self.current_program.update_program(now)
-        self.board.send_pattern()
+                self._timed("update_program", self.current_program.update_program, now)
+        self.send_pattern()
         if self.current_program:
             if self.current_program.program_over(now):
                 self.current_program = None
+    def next_wakeup(self, now: float) -> float:
+        """Returns the next UTC time after now that the state may change"""
+        wakeup = now + self.max_sleep
+        if self.current_program:
+            transition = self.current_program.next_transition(now)
+            if transition is None:
+                # The program is over, and is retired on the next tick
+                transition = self.manager.next_program_start(now)
+                if transition is None:
+                    transition = now + self.tick_interval
+            if self.queue_policy != QueuePolicy.SKIP:
+                # Look for programs coming due while this one runs
+                program_start = self.manager.next_program_start(now)
+                if program_start is not None:
+                    transition = min(transition, program_start)
+        elif self.run_queue:
+            transition = now
+        else:
+            transition = self.manager.next_program_start(now)
+            if transition is None:
+                transition = now + self.tick_interval
+        if self.sequencer is not None:
+            sequenced = self.sequencer.next_transition(now)
+            if sequenced is not None:
+                transition = min(transition, sequenced)
+        return min(wakeup, transition)
+    def wake(self):
+        """Wakes the mainloop for a tick right away"""
+        self._wake_event.set()
+    def stop(self):
+        """Stops the mainloop after the current tick"""
+        self._running = False
+        self.wake()
+    def run(self,
+            clock: Callable[[], float] = time.time,
+            event_driven: bool = True):
+        """The mainloop, ticking until stop is called
+
+With event_driven off, on_tick is called every tick_interval seconds instead.
+"""
+        self._running = True
+        while self._running:
+            self._wake_event.clear()
+            now = clock()
+            self.on_tick(now)
+            if event_driven:
+                wakeup = self.next_wakeup(now)
+            else:
+                wakeup = now + self.tick_interval
+            self._wake_event.wait(max(0, wakeup - clock()))
     def full_stop(self):
         """Force a full stop"""
+        if self.sequencer is not None:
+            self.sequencer.stop()
         self.board.stop_all_stations()
+        if self.current_program:
+            # The program has to rewrite its stations when it resumes
+            self.current_program.resync()
@@ -0,0 +1,5 @@
+"""asyncio runtime for the Controller"""
+
+from sprinkler.controller.aio.controller import AsyncSprinklerController
+from sprinkler.controller.aio.controller import StaticWeatherController
+from sprinkler.controller.aio.controller import CachedWeatherController
@@ -0,0 +1,209 @@
+"""Controller whose mainloop runs on asyncio"""
+
+import asyncio
+import logging
+import time
+from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Union
+
+from sprinkler.board.board import Board
+from sprinkler.controller.abc import SprinklerController
+from sprinkler.program.abc import ProgramManager
+from sprinkler.weather import CachedWeather
+
+LOGGER = logging.getLogger(__name__)
+
+class AsyncSprinklerController(SprinklerController):
+    """Sprinkler Controller running on an asyncio event loop
+
+The weather is looked up by coroutines in a task of its own, every
+weather_interval seconds, and the answers are cached. The synchronous weather
+methods the ticks use only ever read the cache, so a slow weather provider
+can't hold up a valve. The weather is looked up once before the first tick,
+so that doesn't run on the defaults, waiting up to weather_timeout seconds for
+each lookup, as it does every time.
+
+Ticks run in a single worker thread, as talking to the board (a pigpiod socket
+for an OSPIBoard) blocks. Having just the one worker also keeps the ticks, and
+so the writes to the board, in order.
+"""
+    def __init__(self, board: Board, manager: ProgramManager):
+        """Initialize the controller"""
+        super().__init__()
+        self.board = board
+        self.manager = manager
+        self.weather_interval: float = 15 * 60
+        self.weather_timeout: float = 30
+        self._lockout: bool = False
+        self._rain: bool = False
+        self._watering_percentage: float = 100
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._loop: Union[asyncio.AbstractEventLoop, None] = None
+        self._async_wake: Union[asyncio.Event, None] = None
+
+    @abstractmethod
+    async def fetch_cold_weather_lockout(self) -> bool:
+        """Looks up if there is a lockout for cold weather"""
+    @abstractmethod
+    async def fetch_rain_delay(self) -> bool:
+        """Looks up if we should rain-delay"""
+    @abstractmethod
+    async def fetch_watering_percentage(self) -> float:
+        """Looks up the watering percentage"""
+
+    def cold_weather_lockout(self) -> bool:
+        """Returns true if there is a lockout for cold weather"""
+        return self._lockout
+    def rain_delay(self) -> bool:
+        """Returns true if we should rain-delay"""
+        return self._rain
+    def update_watering_percentage(self):
+        """Updates the watering percentage"""
+        self.water_adjust_percent = self._watering_percentage
+
+    async def refresh_weather(self):
+        """Looks up the weather, a failed lookup is logged and keeps the last known value"""
+        lookups = {"cold weather lockout": self.fetch_cold_weather_lockout(),
+                   "rain delay": self.fetch_rain_delay(),
+                   "watering percentage": self.fetch_watering_percentage()}
+        results = await asyncio.gather(*(asyncio.wait_for(_lookup, self.weather_timeout)
+                                         for _lookup in lookups.values()),
+                                       return_exceptions=True)
+        for name, result in zip(lookups, results):
+            if isinstance(result, Exception):
+                LOGGER.warning("Looking up the %s failed", name, exc_info=result)
+        lockout, rain, percentage = results
+        changed = False
+        if isinstance(lockout, bool) and lockout != self._lockout:
+            self._lockout = lockout
+            changed = True
+        if isinstance(rain, bool) and rain != self._rain:
+            self._rain = rain
+            changed = True
+        if isinstance(percentage, (int, float)) and not isinstance(percentage, bool):
+            self._watering_percentage = percentage
+        if changed:
+            self.wake()
+    async def _weather_loop(self):
+        """Refreshes the weather until cancelled, after the lookup before the first tick"""
+        while True:
+            await asyncio.sleep(self.weather_interval)
+            await self.refresh_weather()
+
+    async def tick(self, now: float):
+        """Runs on_tick in the worker thread"""
+        await self._loop.run_in_executor(self._executor, self.on_tick, now)
+    async def async_full_stop(self):
+        """Runs full_stop in the worker thread"""
+        await self._loop.run_in_executor(self._executor, self.full_stop)
+
+    def wake(self):
+        """Wakes the mainloop for a tick right away, safe to call from any thread"""
+        super().wake()
+        if self._loop is not None and self._async_wake is not None:
+            self._loop.call_soon_threadsafe(self._async_wake.set)
+    async def run_async(self,
+                        clock: Callable[[], float] = time.time,
+                        event_driven: bool = True):
+        """The mainloop, ticking until stop is called
+
+The stations are all stopped on the way out.
+"""
+        self._loop = asyncio.get_running_loop()
+        self._async_wake = asyncio.Event()
+        self._running = True
+        await self.refresh_weather()
+        weather = asyncio.create_task(self._weather_loop())
+        try:
+            while self._running:
+                self._async_wake.clear()
+                now = clock()
+                await self.tick(now)
+                if event_driven:
+                    wakeup = self.next_wakeup(now)
+                else:
+                    wakeup = now + self.tick_interval
+                try:
+                    await asyncio.wait_for(self._async_wake.wait(),
+                                           max(0, wakeup - clock()))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            weather.cancel()
+            self.current_program = None
+            await self.async_full_stop()
+            self._loop = None
+
+class StaticWeatherController(AsyncSprinklerController):
+    """AsyncSprinklerController for a fixed weather, a site without a provider"""
+    def __init__(self,
+                 board: Board,
+                 manager: ProgramManager,
+                 lockout: bool = False,
+                 rain: bool = False,
+                 watering_percentage: float = 100):
+        super().__init__(board, manager)
+        self.lockout = lockout
+        self.rain = rain
+        self.watering_percentage = watering_percentage
+    async def fetch_cold_weather_lockout(self) -> bool:
+        """Looks up if there is a lockout for cold weather"""
+        return self.lockout
+    async def fetch_rain_delay(self) -> bool:
+        """Looks up if we should rain-delay"""
+        return self.rain
+    async def fetch_watering_percentage(self) -> float:
+        """Looks up the watering percentage"""
+        return self.watering_percentage
+
+class CachedWeatherController(AsyncSprinklerController):
+    """AsyncSprinklerController reading the weather from a CachedWeather
+
+The CachedWeather refreshes itself in its own worker thread, so rather than
+looking the weather up in a task, the ticks read the cache, which never blocks,
+and a change of the weather wakes the mainloop. The lookup before the first
+tick fills the cache, and the worker goes on from there.
+"""
+    def __init__(self,
+                 board: Board,
+                 manager: ProgramManager,
+                 weather: CachedWeather):
+        super().__init__(board, manager)
+        self.weather = weather
+        self.weather.on_change = lambda _state: self.wake()
+    async def fetch_cold_weather_lockout(self) -> bool:
+        """Reads if there is a lockout for cold weather from the cache"""
+        return self.weather.get().cold_weather_lockout
+    async def fetch_rain_delay(self) -> bool:
+        """Reads if we should rain-delay from the cache"""
+        return self.weather.get().rain_delay
+    async def fetch_watering_percentage(self) -> float:
+        """Reads the watering percentage from the cache"""
+        return self.weather.get().watering_percentage
+    def cold_weather_lockout(self) -> bool:
+        """Returns true if there is a lockout for cold weather"""
+        return self.weather.get().cold_weather_lockout
+    def rain_delay(self) -> bool:
+        """Returns true if we should rain-delay"""
+        return self.weather.get().rain_delay
+    def update_watering_percentage(self):
+        """Updates the watering percentage"""
+        self.water_adjust_percent = self.weather.get().watering_percentage
+    async def refresh_weather(self):
+        """Looks the weather up into the cache, in a thread as the provider blocks
+
+A failed lookup is logged by the cache, one taking over weather_timeout seconds
+is logged here and left to finish in its thread.
+"""
+        try:
+            await asyncio.wait_for(asyncio.to_thread(self.weather.refresh), self.weather_timeout)
+        except asyncio.TimeoutError:
+            LOGGER.warning("Looking up the weather took over %ss", self.weather_timeout)
+    async def _weather_loop(self):
+        """Runs the worker of the cache until cancelled"""
+        self.weather.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.weather.stop(timeout=0)
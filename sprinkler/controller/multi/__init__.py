@@ -0,0 +1,3 @@
+"""Controller running programs in several zones at once"""
+
+from sprinkler.controller.multi.controller import MultiZoneController, Zone
@@ -0,0 +1,200 @@
+"""Controller that runs a program per zone, concurrently"""
+
+from typing import Dict, Iterable, List, Mapping, Optional, Union
+
+from sprinkler.board.board import Board
+from sprinkler.board.sequencer import Sequencer
+from sprinkler.controller.abc import SprinklerController
+from sprinkler.controller.queue import PRIORITY_ADHOC
+from sprinkler.program.abc import ProgramManager
+from sprinkler.program.abc import SprinklerProgram
+from sprinkler.station.station import BaseStation
+
+
+class Zone(SprinklerController):
+    """A group of stations that runs one program at a time
+
+A zone is a board, or some of the stations of a board, fed by a manifold of
+its own, so it can water at the same time as the other zones. It has its own
+manager, current program and run queue, and is ticked by the
+MultiZoneController it belongs to, which looks up the weather for every zone
+and sends the patterns to the boards once all the zones are ticked.
+
+Zones in the same group share a budget, the current of a power supply or the
+flow of a water main. A running program draws draw from the budget of its
+group, and a program that would go over it waits on the queue until enough of
+the budget is free.
+"""
+    def __init__(self,
+                 name: str,
+                 board: Board,
+                 manager: ProgramManager,
+                 stations: Optional[List[BaseStation]] = None,
+                 group: Optional[str] = None,
+                 draw: float = 1):
+        """Setup the zone, stations defaults to all the stations of the board"""
+        super().__init__()
+        self.name = name
+        self.board = board
+        self.manager = manager
+        self.stations: List[BaseStation] = list(board.stations if stations is None else stations)
+        self.group = group
+        self.draw = draw
+        self.site: Optional["MultiZoneController"] = None
+
+    def cold_weather_lockout(self) -> bool:
+        """Returns true if there is a lockout for cold weather at the site"""
+        return self.site.cold_weather_lockout()
+    def rain_delay(self) -> bool:
+        """Returns true if the site should rain-delay"""
+        return self.site.rain_delay()
+    def update_watering_percentage(self):
+        """Takes the watering percentage of the site"""
+        self.water_adjust_percent = self.site.water_adjust_percent
+
+    @property
+    def waiting(self) -> bool:
+        """True if the zone has programs queued and none running"""
+        return not self.current_program and bool(self.run_queue)
+    def _start_next_program(self, now: float) -> Union[SprinklerProgram, None]:
+        """Takes the next program off the queue if the budget allows it"""
+        if self.run_queue and not self.site.can_start(self):
+            self._count("zone_budget_waits")
+            return None
+        return super()._start_next_program(now)
+    def next_wakeup(self, now: float) -> float:
+        """Returns the next UTC time after now that the state may change
+
+A zone waiting on the budget is woken by the program that frees it ending,
+which is a transition of another zone, so it only looks for programs due.
+"""
+        if self.waiting and not self.site.can_start(self):
+            wakeup = now + self.max_sleep
+            program_start = self.manager.next_program_start(now)
+            return wakeup if program_start is None else min(wakeup, program_start)
+        return super().next_wakeup(now)
+    def send_pattern(self):
+        """The site sends the patterns once all the zones are ticked"""
+    def full_stop(self):
+        """Stops the stations of the zone, the site sends the pattern"""
+        for station in self.stations:
+            station.on = False
+        if self.current_program:
+            self.current_program.resync()
+    def wake(self):
+        """Wakes the mainloop of the site"""
+        if self.site is None:
+            super().wake()
+        else:
+            self.site.wake()
+
+class MultiZoneController(SprinklerController):
+    """Sprinkler Controller for a site of several zones
+
+Rather than a single board and current program, the site has zones, each with
+its stations, manager and current program, and the programs of the
+zones run concurrently. That way the watering of a site with several boards
+and independent manifolds takes as long as its busiest zone, rather than the
+sum of all of them.
+
+budgets maps the groups of the zones to the most they may draw at once, a
+group without a budget is not limited. When programs wait on a budget, the one
+first in line, by priority then by when it was due, goes first.
+
+The weather is looked up once a tick, for the whole site, and each board is
+sent its pattern once a tick, however many zones it has. Manual and ad-hoc
+runs go to the zone of the stations they run.
+
+sequencers go through the patterns of their boards before they are sent.
+"""
+    def __init__(self,
+                 zones: Iterable[Zone],
+                 budgets: Optional[Mapping[str, float]] = None):
+        """Initialize the controller"""
+        super().__init__()
+        self.zones: List[Zone] = list(zones)
+        self.budgets: Dict[str, float] = dict(budgets or {})
+        self.boards: List[Board] = []
+        self.sequencers: List[Sequencer] = []
+        self._zone_of: Dict[int, Zone] = {}
+        for zone in self.zones:
+            zone.site = self
+            if all(_b is not zone.board for _b in self.boards):
+                self.boards.append(zone.board)
+            for station in zone.stations:
+                self._zone_of[id(station)] = zone
+
+    @property
+    def current_programs(self) -> Dict[str, SprinklerProgram]:
+        """The programs running, by name of their zone"""
+        return {_z.name: _z.current_program for _z in self.zones if _z.current_program}
+    def zone_for(self, station: BaseStation) -> Zone:
+        """The zone of the station, KeyError if it has none"""
+        try:
+            return self._zone_of[id(station)]
+        except KeyError:
+            raise KeyError(f"Station {station.number} is not in a zone") from None
+    def drawn(self, group: Optional[str]) -> float:
+        """What the running programs of the group draw from its budget"""
+        return sum(_z.draw for _z in self.zones if _z.group == group and _z.current_program)
+    def can_start(self, zone: Zone) -> bool:
+        """True if the next program of the zone fits in the budget of its group
+
+It doesn't if a zone of the group that was waiting longer would fit too.
+"""
+        budget = self.budgets.get(zone.group)
+        if budget is None:
+            return True
+        drawn = self.drawn(zone.group)
+        if drawn + zone.draw > budget:
+            return False
+        head = zone.run_queue.peek()
+        for other in self.zones:
+            if other is zone or other.group != zone.group or not other.waiting:
+                continue
+            other_head = other.run_queue.peek()
+            if (other_head is not None and other_head[:2] < head[:2]
+                    and drawn + other.draw <= budget):
+                return False
+        return True
+    def _service_order(self) -> List[Zone]:
+        """The zones running a program, then those waiting, first in line first"""
+        running = [_z for _z in self.zones if _z.current_program]
+        waiting = sorted((_z for _z in self.zones if _z.waiting),
+                         key=lambda _z: _z.run_queue.peek()[:2])
+        idle = [_z for _z in self.zones if not _z.current_program and not _z.run_queue]
+        return running + waiting + idle
+
+    def queue_program(self,
+                      program: SprinklerProgram,
+                      now: float,
+                      priority: int = PRIORITY_ADHOC) -> bool:
+        """Queues program in the zone of its first station"""
+        return self.zone_for(program.stations[0]).queue_program(program, now, priority)
+    def service_tick(self, now: float):
+        """Ticks every zone, then sends the patterns"""
+        self.last_tick = now
+        self.update_watering_percentage()
+        for zone in self._service_order():
+            zone.metrics = self.metrics
+            zone.service_tick(now)
+        for sequencer in self.sequencers:
+            sequencer.update(now)
+        for board in self.boards:
+            self._timed("send_pattern", board.send_pattern)
+    def next_wakeup(self, now: float) -> float:
+        """Returns the next UTC time after now that the state of a zone may change"""
+        wakeups = [now + self.max_sleep] + [_z.next_wakeup(now) for _z in self.zones]
+        for sequencer in self.sequencers:
+            sequenced = sequencer.next_transition(now)
+            if sequenced is not None:
+                wakeups.append(sequenced)
+        return min(wakeups)
+    def full_stop(self):
+        """Force a full stop of every zone"""
+        for sequencer in self.sequencers:
+            sequencer.stop()
+        for zone in self.zones:
+            zone.full_stop()
+        for board in self.boards:
+            board.send_pattern()
@@ -0,0 +1,79 @@
+"""Queue of programs waiting to run"""
+
+import heapq
+import threading
+from collections import namedtuple
+from enum import Enum
+from typing import List, Optional, Tuple
+
+from sprinkler.program.abc import SprinklerProgram
+
+# Lower priorities run first
+PRIORITY_MANUAL = 0
+PRIORITY_ADHOC = 1
+PRIORITY_SCHEDULED = 2
+
+# queued_at is the UTC time the program was put on the queue
+QueuedRun = namedtuple("QueuedRun", ["priority", "due", "program", "queued_at"])
+
+class QueuePolicy(Enum):
+    """What happens to a scheduled program that comes due while another is running
+
+SKIP drops it, which is how the controller has always behaved.
+DEFER queues it to start as soon as the running program, and anything queued
+ahead of it, is over.
+MERGE defers it, unless the running program or one already queued runs the
+same stations, in which case it is dropped as those stations are watered anyway.
+Manual and ad-hoc runs are always queued.
+"""
+    SKIP = "skip"
+    DEFER = "defer"
+    MERGE = "merge"
+
+class RunQueue:
+    """Priority queue of programs waiting to run
+
+Programs come off in order of priority, then of when they were due, then of
+when they were queued. The queue is locked so programs can be queued from
+other threads while the controller ticks.
+"""
+    def __init__(self):
+        self._heap: List[Tuple[int, float, int, SprinklerProgram, float]] = []
+        self._seq: int = 0
+        self._lock = threading.Lock()
+    def __len__(self) -> int:
+        return len(self._heap)
+    def __bool__(self) -> bool:
+        return bool(self._heap)
+    def __contains__(self, program: SprinklerProgram) -> bool:
+        with self._lock:
+            return any(_entry[3].same_run(program) for _entry in self._heap)
+    @property
+    def programs(self) -> List[SprinklerProgram]:
+        """The queued programs, in the order they will run"""
+        with self._lock:
+            return [_entry[3] for _entry in sorted(self._heap, key=lambda _e: _e[:3])]
+    def push(self, program: SprinklerProgram, priority: int, queued_at: float):
+        """Queues the program"""
+        with self._lock:
+            heapq.heappush(self._heap,
+                           (priority, program.start_time, self._seq, program, queued_at))
+            self._seq += 1
+    def peek(self) -> Optional[QueuedRun]:
+        """The next program to come off the queue, None if it is empty"""
+        with self._lock:
+            if not self._heap:
+                return None
+            priority, due, _, program, queued_at = self._heap[0]
+        return QueuedRun(priority, due, program, queued_at)
+    def pop(self) -> Optional[QueuedRun]:
+        """Takes the next program off the queue, None if it is empty"""
+        with self._lock:
+            if not self._heap:
+                return None
+            priority, due, _, program, queued_at = heapq.heappop(self._heap)
+        return QueuedRun(priority, due, program, queued_at)
+    def clear(self):
+        """Drops every queued program"""
+        with self._lock:
+            self._heap.clear()
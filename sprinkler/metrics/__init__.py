@@ -0,0 +1,4 @@
+"""Library for instrumenting the tick path"""
+
+from sprinkler.metrics.sinks import MetricsSink, MemorySink, LogSink, PrometheusTextFileSink
+from sprinkler.metrics.sinks import Histogram
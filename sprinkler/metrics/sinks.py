@@ -0,0 +1,124 @@
+"""Sinks that timings and counters are reported to
+
+The controller and boards hold an optional MetricsSink, None by default, and
+only read the clock and report to the sink when one is set. With no sink, the
+cost of the instrumentation is an attribute lookup and a compare per tick.
+
+Timings are reported with observe, in seconds, and go into histograms; counts
+are reported with increment. The MemorySink keeps them in memory, the LogSink
+and PrometheusTextFileSink build on it and write them out on flush.
+"""
+
+import logging
+import os
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence
+
+# Upper bounds of the histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5)
+
+class Histogram:
+    """Histogram of observations with fixed bucket bounds"""
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Setup the histogram, the last bucket is for everything above the bounds"""
+        self.buckets = tuple(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.count: int = 0
+        self.total: float = 0
+        self.maximum: float = 0
+    def observe(self, value: float):
+        """Adds an observation"""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+    @property
+    def mean(self) -> float:
+        """Mean of the observations"""
+        if not self.count:
+            return 0
+        return self.total / self.count
+
+class MetricsSink(ABC):
+    """Where the instrumentation reports to"""
+    @abstractmethod
+    def observe(self, name: str, seconds: float):
+        """Records a timing"""
+    @abstractmethod
+    def increment(self, name: str, count: int = 1):
+        """Adds to a counter"""
+    def flush(self):
+        """Writes out what has been recorded, if the sink writes anywhere"""
+
+class MemorySink(MetricsSink):
+    """Keeps the histograms and counters in memory"""
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+    def observe(self, name: str, seconds: float):
+        """Records a timing"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(self.buckets)
+        histogram.observe(seconds)
+    def increment(self, name: str, count: int = 1):
+        """Adds to a counter"""
+        self.counters[name] = self.counters.get(name, 0) + count
+
+class LogSink(MemorySink):
+    """Logs a summary of the histograms and counters on flush"""
+    def __init__(self,
+                 logger: Optional[logging.Logger] = None,
+                 level: int = logging.INFO,
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(buckets)
+        self.logger = logger or logging.getLogger("sprinkler.metrics")
+        self.level = level
+    def flush(self):
+        """Logs a line per histogram and counter"""
+        for name, histogram in sorted(self.histograms.items()):
+            self.logger.log(self.level, "%s count=%d mean=%.6fs max=%.6fs",
+                            name, histogram.count, histogram.mean, histogram.maximum)
+        for name, count in sorted(self.counters.items()):
+            self.logger.log(self.level, "%s %d", name, count)
+
+class PrometheusTextFileSink(MemorySink):
+    """Writes the histograms and counters in the Prometheus text format on flush
+
+The file is replaced atomically, as expected by the textfile collector of the
+node exporter.
+"""
+    def __init__(self,
+                 path: str,
+                 prefix: str = "sprinkler_",
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(buckets)
+        self.path = path
+        self.prefix = prefix
+    def render(self) -> str:
+        """Renders the metrics in the Prometheus text format"""
+        lines: List[str] = []
+        for name, histogram in sorted(self.histograms.items()):
+            metric = f"{self.prefix}{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+            lines.append(f"{metric}_sum {histogram.total}")
+            lines.append(f"{metric}_count {histogram.count}")
+        for name, count in sorted(self.counters.items()):
+            metric = f"{self.prefix}{name}"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {count}")
+        return "\n".join(lines) + "\n"
+    def flush(self):
+        """Writes the metrics out"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(self.render())
+        os.replace(tmp_path, self.path)
@@ -20,15 +20,22 @@ requests that a single station be run on demand.
 All that a Controller cares about is that it can call get_program with the
 current time in UTC and get the next program it should run (if any).
 
-Currently, the code calling get_program expects a single Program in return, so
-it is expected that other portions of the implementation prevent multiple
-programs from running at once. This is partially a limitation of the HW too, as
-it can only realisitcally have a single valve on for any serious length of time
-as there's a physical limit on the current it can have.
+get_program returns a single Program, and a controller runs one program at a
+time, so a manager serves one zone: a board, or some of its stations, whose
+valves can't all be on at once for the current of the board or the flow of
+the manifold. A site with several zones has a manager per zone, and the
+MultiZoneController runs the programs of its zones concurrently, within the
+current or flow budget of each group of zones.
 """
     @abstractmethod
     def get_program(self, now: float) -> Union[SprinklerProgram, None]:
         """Gets the program for the given now, in UTC"""
+    def next_program_start(self, now: float) -> Union[float, None]:
+        """Gets the next UTC time after now a program may be due
+
+None means the manager can't tell, and the caller has to keep polling.
+"""
+        return None # pragma: no cover
     @abstractmethod
     def update_programs(self,
                         additions: List[SprinklerProgram],
@@ -2,10 +2,10 @@
 import datetime
 from abc import ABC, abstractmethod
 from collections import namedtuple
-from typing import Any, List, Mapping
+from typing import Any, List, Mapping, Optional
 from sprinkler.program.program_types import ProgramType
 
-from sprinkler.station.station import Station
+from sprinkler.station.station import BaseStation
 
 # In this tuple, start is a time in UTC, stop is a time in UTC
 ProgramTime = namedtuple("ProgramTime", ["start", "end", "duration"])
@@ -54,6 +54,12 @@ implicit start and stop times. As for overlapping start/stop times, this can
 actually be advantageous to have two stations overlap as it can lower the water
 pressure temporarily and prevent water hammer for at least part of the cycle.
 
+The implementations here look at every ProgramTime on every call, which suits
+programs of a few entries such as a ManualProgram. A station is on while any
+of its entries is running, so a repeated or overlapping station isn't turned
+off by its other entries. Programs of many entries, like DictSprinklerProgram,
+override them to work off a compiled form of the program instead.
+
 ** Yes, this does not account for leap seconds or negative leap seconds.
 If a program is short or long by a couple seconds, no one will really care.
 People will care if the program is short an hour or runs an hour too long. If
@@ -61,19 +67,24 @@ you do care, probably don't use this program for such a sensitive application.
 """
     def __init__(self, start_time: float):
         """Setup the program"""
-        self._stations: Mapping[ProgramTime, Station] = {}
+        self._stations: Mapping[ProgramTime, BaseStation] = {}
         self._start_time: float = start_time
+        self._due_time: float = start_time
     @property
     def start_time(self) -> float:
         """Start time of the station in UTC"""
         return self._start_time
     @property
-    def stations(self) -> List[Station]:
+    def due_time(self) -> float:
+        """Time in UTC the program was due to start, even if it was rescheduled"""
+        return self._due_time
+    @property
+    def stations(self) -> List[BaseStation]:
         """List of stations involved, in run order"""
         return [self._stations[idx]
                 for idx in sorted(self._stations.keys(), key = program_time_start_key)]
     @property
-    def stations_indexed(self) -> Mapping[ProgramTime, Station]: # pragma: no cover
+    def stations_indexed(self) -> Mapping[ProgramTime, BaseStation]: # pragma: no cover
         """Get the stations indexed to their program times"""
         return self._stations
     @property
@@ -86,6 +97,28 @@ you do care, probably don't use this program for such a sensitive application.
         """Returns the time at which the program ends in UTC"""
         return max(self._stations.keys(), key=program_time_end_key).end
 
+    def same_run(self, other: "SprinklerProgram") -> bool:
+        """True if other is the same program due at the same time, wherever it starts"""
+        return (type(self) is type(other)
+                and self._due_time == other.due_time
+                and self.stations == other.stations)
+
+    def reschedule(self, start_time: float):
+        """Moves the whole program to start at start_time, keeping its due time"""
+        delta = start_time - self._start_time
+        self._start_time = start_time
+        self._stations = {ProgramTime(_t.start + delta, _t.end + delta, _t.duration): station
+                          for _t, station in self._stations.items()}
+
+    def resync(self):
+        """Makes the next update_program write the state of every station
+
+This is needed if something other than the program, such as a full stop, has
+changed the state of the stations. update_program here writes every station on
+every call, so there is nothing to do; programs that only write the stations
+that changed override it.
+"""
+
     @property
     @abstractmethod
     def days_of_the_week(self) -> List[int]:
@@ -108,7 +141,7 @@ you do care, probably don't use this program for such a sensitive application.
 
     @classmethod
     @abstractmethod
-    def valid_on_day(cls, day: datetime.datetime, conf: Any) -> bool:
+    def valid_on_day(cls, day: datetime.date, conf: Any) -> bool:
         """Returns if this program can run today"""
 
     @classmethod
@@ -120,16 +153,32 @@ you do care, probably don't use this program for such a sensitive application.
         """Returns true if this program should run now"""
 
     @abstractmethod
-    def adjust_watering(self, percentage: float):
-        """Adjust the watering by the given percentage"""
+    def adjust_watering(self, percentage: float, now: Optional[float] = None):
+        """Adjust the watering by the given percentage
+
+With now during the run, only what is left of the program is adjusted.
+"""
 
     def update_program(self, now: float):
         """Updates the state of the stations based on the given now"""
-        for time_idx, station in self._stations.items():
-            if time_idx.start <= now < time_idx.end:
-                station.on = True
-            else:
-                station.on = False
+        running = {id(station) for time_idx, station in self._stations.items()
+                   if time_idx.start <= now < time_idx.end}
+        for station in self._stations.values():
+            station.on = id(station) in running
+
+    def next_transition(self, now: float) -> Optional[float]:
+        """Returns the next UTC time after now that the program changes state
+
+Past the end of the last station, this is the first whole second the program
+is over. None is returned once the program is over.
+"""
+        edges = [_edge for time_idx in self._stations
+                 for _edge in (time_idx.start, time_idx.end) if _edge > now]
+        if edges:
+            return min(edges)
+        if self.program_over(now):
+            return None
+        return self.program_end_time + 1
 
     def program_over(self, now: float) -> bool:
         """Returns true if the program is over"""
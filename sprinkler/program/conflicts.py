@@ -0,0 +1,60 @@
+"""Interval index of program runs for finding overlaps
+
+Only one program runs at a time, so a program still running when another is
+due means the later one has to wait, or is lost. RunIndex keeps runs sorted by
+start, along with the longest run, so the runs overlapping an interval are
+found with a bisect: they all start before the interval ends and no earlier
+than the longest run before it starts.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from typing import Iterable, Iterator, List
+
+# start and end are UTC times, key is whatever the run belongs to
+Run = namedtuple("Run", ["start", "end", "key"])
+
+# first starts no later than second, and they overlap from start to end
+Conflict = namedtuple("Conflict", ["first", "second", "start", "end"])
+
+class RunIndex:
+    """Runs sorted by start, searchable for overlaps"""
+    def __init__(self, runs: Iterable[Run] = ()):
+        runs = sorted(runs, key=lambda _r: _r.start)
+        self._starts: List[float] = [_r.start for _r in runs]
+        self._runs: List[Run] = runs
+        self._longest: float = max((_r.end - _r.start for _r in runs), default=0.0)
+    def __len__(self) -> int:
+        return len(self._runs)
+    def __iter__(self) -> Iterator[Run]:
+        return iter(self._runs)
+    def add(self, run: Run):
+        """Adds a run, after any others starting at the same time"""
+        idx = bisect_right(self._starts, run.start)
+        self._starts.insert(idx, run.start)
+        self._runs.insert(idx, run)
+        self._longest = max(self._longest, run.end - run.start)
+    def overlapping(self, start: float, end: float) -> List[Run]:
+        """Runs that are running at some point between start and end"""
+        low = bisect_left(self._starts, start - self._longest)
+        high = bisect_left(self._starts, end)
+        return [_r for _r in self._runs[low:high] if _r.end > start]
+    def conflicts_with(self, run: Run) -> List[Conflict]:
+        """Conflicts between run and the indexed runs, other than run itself"""
+        conflicts = []
+        for other in self.overlapping(run.start, run.end):
+            if other is run or (other.start == run.start and other.key is run.key):
+                continue
+            first, second = (other, run) if other.start <= run.start else (run, other)
+            conflicts.append(Conflict(first, second,
+                                      second.start, min(first.end, second.end)))
+        return conflicts
+    def conflicts(self) -> List[Conflict]:
+        """Every pair of indexed runs that overlap, in order of the first to start"""
+        conflicts = []
+        runs = self._runs
+        for idx, first in enumerate(runs):
+            for second in runs[idx + 1:bisect_left(self._starts, first.end, idx + 1)]:
+                conflicts.append(Conflict(first, second,
+                                          second.start, min(first.end, second.end)))
+        return conflicts
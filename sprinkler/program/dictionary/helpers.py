@@ -1,37 +1,76 @@
 """Helper classes for the dict program"""
 # import datetime
+import json
+from array import array
 from collections import namedtuple
-from typing import List, Mapping
+from functools import lru_cache
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Hashable, Iterable, Iterator, List, Mapping, Tuple, Union
 from dataclasses import dataclass, field
 
-from marshmallow import Schema, fields, post_load
 from sprinkler.program.program_types import ProgramType
 
+if TYPE_CHECKING: # pragma: no cover
+    from sprinkler.program.dictionary.schema import ProgramDictSchema
+
 ProgramEntry = namedtuple("ProgramEntry", ["station_id", "duration"])
 
-class ProgramDictSchema(Schema):
-    """Schema defining Programs"""
-    start_time_of_day = fields.Int(required=True)
-    station_durations = fields.List(fields.Dict, required=True)
-    program_type = fields.Int(required=True)
-    respect_rain = fields.Bool(required=True)
-    respect_water_adjustment = fields.Bool(required=True)
-    days_of_the_week = fields.List(fields.Int)
-    name = fields.Str()
-
-    @post_load
-    def tupleize_durations(self, input_data: Mapping, **kwargs): #pylint: disable=unused-argument, no-self-use, line-too-long
-        """Turn station_durations into a list of ProgramEntry"""
-        new_dur = []
-        for duration in input_data["station_durations"]:
-            new_dur.append(ProgramEntry(**duration))
-        input_data["station_durations"] =  new_dur
-        return input_data
-    @post_load
-    def enum_program_type(self, input_data: Mapping, **kwargs): #pylint: disable=unused-argument, no-self-use, line-too-long
-        """Turn the program_type into Enum"""
-        input_data["program_type"] = ProgramType(input_data["program_type"])
-        return input_data
+# start and end are in UTC, as for ProgramTime
+RunTime = Tuple[float, float, float, Hashable]
+
+@dataclass(frozen=True)
+class CompiledProgram:
+    """Compact, immutable form of the station durations of a DictProgram
+
+Each entry, in run order, has its offset from the start of the program and its
+duration in seconds, and the station it runs. A run of the program is derived
+from this by adding the start time to the offsets, scaling the durations first
+if the watering is adjusted. Programs loaded from a ProgramStore have
+read-only memoryviews of doubles in place of the arrays, which are turned into
+arrays when pickled or copied.
+"""
+    offsets: Union[array, memoryview]
+    durations: Union[array, memoryview]
+    station_ids: Tuple[Any, ...]
+    run_time: float
+
+    def __reduce__(self):
+        return (self.__class__,
+                (array("d", self.offsets), array("d", self.durations), self.station_ids,
+                 self.run_time))
+
+    def run_times(self, start_time: float, percentage: float = 1) -> Iterator[RunTime]:
+        """Yields the start, end, duration and station id of each entry
+
+The offsets and durations are scaled by percentage, without rounding, the same
+way a DictSprinklerProgram adjusted by it runs.
+"""
+        for offset, duration, station_id in zip(self.offsets, self.durations, self.station_ids):
+            start = start_time + offset * percentage
+            end = start_time + (offset + duration) * percentage
+            yield start, end, end - start, station_id
+
+def compile_program(station_durations: List[ProgramEntry]) -> CompiledProgram:
+    """Compiles the station durations of a program"""
+    offsets = array("d")
+    durations = array("d")
+    running_time = 0
+    for entry in station_durations:
+        offsets.append(running_time)
+        durations.append(entry.duration)
+        running_time += entry.duration
+    station_ids = tuple(entry.station_id for entry in station_durations)
+    return CompiledProgram(offsets, durations, station_ids, running_time)
+
+@lru_cache(maxsize=None)
+def get_schema(many: bool = False) -> "ProgramDictSchema":
+    """Returns the shared ProgramDictSchema, for a list of programs if many
+
+marshmallow is only imported here, the first time a program is validated.
+"""
+    # pylint: disable=import-outside-toplevel, redefined-outer-name
+    from sprinkler.program.dictionary.schema import ProgramDictSchema
+    return ProgramDictSchema(many=many)
 
 @dataclass
 class DictProgram:
@@ -43,8 +82,11 @@ class DictProgram:
     respect_water_adjustment: bool
     days_of_the_week: List[int] = field(default_factory=list)
     name: str = field(default="")
+    compiled: CompiledProgram = field(default=None, repr=False, compare=False)
     def __post_init__(self):
-        """Fix up names"""
+        """Compile the durations and fix up names"""
+        if self.compiled is None:
+            self.compiled = compile_program(self.station_durations)
         if self.name:
             return #pragma: no cover
         if self.program_type == ProgramType.DAYOFTHEWEEK:
@@ -52,8 +94,59 @@ class DictProgram:
             self.name = f"{self.program_type}_{self.start_time_of_day}_{dow}"
         else:
             self.name = f"{self.program_type}_{self.start_time_of_day}"
+    @property
+    def identity(self) -> Tuple:
+        """Hashable identity of the program, equal programs have equal identities"""
+        return (self.start_time_of_day,
+                tuple(self.station_durations),
+                self.program_type,
+                self.respect_rain,
+                self.respect_water_adjustment,
+                tuple(self.days_of_the_week),
+                self.name)
 
 def turn_dict_into_dict_program(conf: Mapping) -> DictProgram:
     """Takes a raw schema and turn it into a program"""
-    data = ProgramDictSchema().load(conf)
+    data = get_schema().load(conf)
     return DictProgram(**data)
+
+def turn_dicts_into_dict_programs(confs: Iterable[Mapping]) -> List[DictProgram]:
+    """Takes raw schemas and turns them into programs, validating them together"""
+    return [DictProgram(**data) for data in get_schema(many=True).load(list(confs))]
+
+def iter_dicts_from_file(path: str) -> Iterator[Mapping]:
+    """Yields the raw programs from a JSON or JSON Lines file
+
+A JSON file holds a list of programs and is parsed in one go. A JSON Lines file
+holds a program per line and is streamed.
+"""
+    with open(path, "r", encoding="utf-8") as program_file:
+        first = program_file.read(1)
+        while first.isspace():
+            first = program_file.read(1)
+        program_file.seek(0)
+        if first == "[":
+            yield from json.load(program_file)
+            return
+        yield from (json.loads(line) for line in program_file if line.strip())
+
+def iter_programs_from_file(path: str, batch_size: int = 256) -> Iterator[DictProgram]:
+    """Yields the programs from a JSON or JSON Lines file
+
+Programs are validated batch_size at a time, so for a JSON Lines file only a
+batch of raw programs is held at once.
+"""
+    confs = iter_dicts_from_file(path)
+    while True:
+        batch = list(islice(confs, batch_size))
+        if not batch:
+            return
+        yield from turn_dicts_into_dict_programs(batch)
+
+def __getattr__(name: str) -> Any:
+    """ProgramDictSchema is still importable from here, imported when asked for"""
+    if name == "ProgramDictSchema":
+        # pylint: disable=import-outside-toplevel, redefined-outer-name
+        from sprinkler.program.dictionary.schema import ProgramDictSchema
+        return ProgramDictSchema
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
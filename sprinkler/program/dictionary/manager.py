@@ -1,18 +1,34 @@
 """A ProgramManager that can produce DictSprinklerProgram"""
 
+import datetime
+import logging
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
-from typing import Any, List, Mapping, Sequence, Union
-from sprinkler.program.dictionary.helpers import DictProgram, turn_dict_into_dict_program
+from typing import TYPE_CHECKING, Any, Dict, Hashable, Iterable, Iterator, List, Mapping
+from typing import Sequence, Set, Tuple, Union
+from sprinkler.program.dictionary.helpers import DictProgram, iter_programs_from_file
+from sprinkler.program.dictionary.helpers import turn_dicts_into_dict_programs
 from sprinkler.program.dictionary.program import DictSprinklerProgram
 
 from sprinkler.program.program_types import ProgramType
 from sprinkler.program.abc import ProgramManager, SprinklerProgram
-from sprinkler.program.time_utilities import after_now, local_dt_for_utc_now
-from sprinkler.station.station import Station
+from sprinkler.program.conflicts import Conflict, Run, RunIndex
+from sprinkler.program.time_utilities import after_now, local_day_for_utc_now
+from sprinkler.program.time_utilities import utc_for_local_date
+from sprinkler.station.station import BaseStation
+
+if TYPE_CHECKING: # pragma: no cover
+    from sprinkler.program.dictionary.store import ProgramStore
+
+# Days of runs checked for conflicts, enough to cover every weekday and the
+# odd days at the end of a 31 day month
+CONFLICT_DAYS = 62
+
+LOGGER = logging.getLogger(__name__)
 
 def turn_dicts_to_programs(programs: List[Mapping[str, Any]]) -> List[DictProgram]:
     """Takes dicts of programs and turns them into DictSprinklerProgram"""
-    return [turn_dict_into_dict_program(program) for program in programs] # pragma: no cover
+    return turn_dicts_into_dict_programs(programs)
 
 def remove_dup_starts_for_even_odd(programs: List[SprinklerProgram]) -> List[SprinklerProgram]:
     """Remove duplicate programs based on start times.
@@ -30,28 +46,48 @@ Only the first program at a given time on an even/odd day will survive.
         if e_o is None:
             continue
         e_o[program.start_time].append(program)
-    programs_to_remove: List[SprinklerProgram] = []
+    programs_to_remove = set()
 
     for e_o in even_odds.values():
         for dupes in e_o.values():
-            if len(dupes) <= 1:
-                continue
-            programs_to_remove.extend(dupes[1:])
+            programs_to_remove.update(id(dupe) for dupe in dupes[1:])
 
-    new_programs = list(programs)
-    for program in programs_to_remove:
-        new_programs.remove(program)
-
-    return new_programs
+    return [program for program in programs if id(program) not in programs_to_remove]
 
 
 class DictProgramManager(ProgramManager):
-    """Program manager"""
+    """Program manager
+
+Rather than building every program on every call to get_program, the manager
+keeps an index of the UTC start times of the programs that are valid on the
+current local day, sorted by start time. The index is rebuilt when the local
+day rolls over or when the programs are updated, so finding the due program is
+a bisect and a DictSprinklerProgram is only built when one is actually due.
+
+Programs are stored in a dict keyed by a sequence number given out as they are
+added, so the order they were added in is kept, along with an index from the
+identity of a program to its sequence numbers. Adding and removing a program
+is then a couple of dict operations. Even/odd programs sharing a start time are
+tracked as they are added; only the first of them can ever be selected.
+
+The index also holds the starts of the previous local day, so that with
+max_defer set, a program whose start was missed because the controller was
+busy running another is handed out late rather than dropped. Missed programs
+are handed out in order of their start, each once, starting at the time they
+are handed out, as long as they are no more than max_defer seconds late.
+This is the only place a missed start is caught up on: under the controller's
+SKIP policy it isn't asked for programs while one runs, so max_defer covers
+that and downtime. Under DEFER and MERGE it asks every tick, gets the program
+on time and holds it in its run queue; either way a run is handed out once.
+Programs whose runs would overlap can be found ahead of time with
+find_conflicts, or checked before adding with conflicts_with.
+"""
     def __init__(self,
                  programs: List[Mapping[str, Any]],
-                 all_stations: List[Station],
+                 all_stations: List[BaseStation],
                  local_tz: str,
-                 jitter: int = 5):
+                 jitter: int = 5,
+                 max_defer: int = 0):
         """Initialize the manager
 
 programs is a list of Mappings that can be validated by ProgramDictSchema.
@@ -61,23 +97,137 @@ local_tz is the local timezone this Manager, and consequently programs, will be
 operating in.
 jitter is a parameter used to handle the imprecision of clocks when trying to
 select a program.
+max_defer is how late, in seconds, a missed program can still be handed out;
+0 drops programs that are not picked up within jitter of their start.
 """
         self.jitter = jitter
+        self.max_defer = max_defer
         self.local_tz: str = local_tz
         self.all_stations = all_stations
-        self._programs: List[DictProgram] = turn_dicts_to_programs(programs)
+        self._programs: Dict[int, DictProgram] = {}
+        self._next_seq: int = 0
+        self._by_identity: Dict[Hashable, List[int]] = defaultdict(list)
+        self._even_odd_starts: Dict[Tuple[ProgramType, float], List[int]] = defaultdict(list)
+        # UTC bounds of the local day the index was built for
+        self._day_bounds: Tuple[float, float] = (0.0, 0.0)
+        # Parallel lists, sorted by start; seqs are keys into self._programs
+        self._day_starts: List[float] = []
+        self._day_seqs: List[int] = []
+        # Runs, as (start, seq), already handed out while deferring
+        self._handed_out: Set[Tuple[float, int]] = set()
+        self._conflict_index: Union[RunIndex, None] = None
+        self._conflict_key: Tuple[float, int] = (0.0, 0)
+        self._conflict_dates: Tuple[List[datetime.date], List[float]] = ([], [])
+        for program in turn_dicts_to_programs(programs):
+            self.add_program(program)
+    @classmethod
+    def from_programs(cls,
+                      programs: Iterable[DictProgram],
+                      all_stations: List[BaseStation],
+                      local_tz: str,
+                      jitter: int = 5,
+                      max_defer: int = 0) -> "DictProgramManager":
+        """Makes a manager from programs that have already been validated"""
+        manager = cls([], all_stations, local_tz, jitter, max_defer)
+        for program in programs:
+            manager.add_program(program)
+        return manager
+    @classmethod
+    def from_file(cls,
+                  path: str,
+                  all_stations: List[BaseStation],
+                  local_tz: str,
+                  jitter: int = 5,
+                  max_defer: int = 0) -> "DictProgramManager":
+        """Makes a manager from a JSON or JSON Lines file of programs"""
+        return cls.from_programs(iter_programs_from_file(path),
+                                 all_stations,
+                                 local_tz,
+                                 jitter,
+                                 max_defer)
+    @classmethod
+    def from_store(cls,
+                   store: "ProgramStore",
+                   all_stations: List[BaseStation],
+                   local_tz: str,
+                   jitter: int = 5,
+                   max_defer: int = 0) -> "DictProgramManager":
+        """Makes a manager from the programs in a ProgramStore"""
+        return cls.from_programs(store.load(), all_stations, local_tz, jitter, max_defer)
     @property
     def programs(self) -> Sequence[DictProgram]:
         """Programs managed by this manager"""
-        return tuple(self._programs)
+        return tuple(self._programs.values())
+    @property
+    def duplicate_starts(self) -> Sequence[DictProgram]:
+        """Even/odd programs that can't run, as an earlier one starts at the same time"""
+        return tuple(self._programs[seq]
+                     for seqs in self._even_odd_starts.values()
+                     for seq in seqs[1:])
+    def add_program(self, program: DictProgram):
+        """Adds a validated program"""
+        seq = self._next_seq
+        self._next_seq += 1
+        self._programs[seq] = program
+        self._by_identity[program.identity].append(seq)
+        if program.program_type in (ProgramType.EVENDAYSONLY, ProgramType.ODDDAYSONLY):
+            self._even_odd_starts[(program.program_type, program.start_time_of_day)].append(seq)
+        self.invalidate_index()
+    def remove_program(self, program: DictProgram):
+        """Removes the first program added that is equal to program
+
+A ValueError is raised if there is no such program.
+"""
+        seqs = self._by_identity.get(program.identity)
+        if not seqs:
+            raise ValueError(f"Program {program.name} is not managed")
+        seq = seqs.pop(0)
+        if not seqs:
+            del self._by_identity[program.identity]
+        del self._programs[seq]
+        start_key = (program.program_type, program.start_time_of_day)
+        if start_key in self._even_odd_starts:
+            starts = self._even_odd_starts[start_key]
+            starts.remove(seq)
+            if not starts:
+                del self._even_odd_starts[start_key]
+        self.invalidate_index()
+    def invalidate_index(self):
+        """Forces the start time and conflict indexes to be rebuilt on the next lookup"""
+        self._day_bounds = (0.0, 0.0)
+        self._conflict_index = None
+    def build_day_index(self, now: float):
+        """Builds the start time index for the local day containing now
+
+Starts on the previous local day are included, ahead of the day's own.
+"""
+        day_start, day_end, local_date = local_day_for_utc_now(now, self.local_tz)
+        previous_date = local_date - datetime.timedelta(days=1)
+        previous_start = utc_for_local_date(previous_date, self.local_tz)
+        entries: List[Tuple[float, int]] = []
+        for seq, conf in self._programs.items():
+            if DictSprinklerProgram.valid_on_day(previous_date, conf):
+                entries.append((previous_start + conf.start_time_of_day, seq))
+            if DictSprinklerProgram.valid_on_day(local_date, conf):
+                entries.append((day_start + conf.start_time_of_day, seq))
+        entries.sort()
+        self._day_starts = [_start for _start, _ in entries]
+        self._day_seqs = [_seq for _, _seq in entries]
+        self._day_bounds = (day_start, day_end)
+    def _check_index(self, now: float):
+        """Rebuilds the index if now is outside of the indexed local day"""
+        day_start, day_end = self._day_bounds
+        if not day_start <= now < day_end:
+            self.build_day_index(now)
     def search_progs_by_time(self,
                              now: float) -> List[SprinklerProgram]:
         """Returns a program from the even or odd programs"""
         programs: List[DictSprinklerProgram] = []
-        for _search in self._programs:
+        for _search in self._programs.values():
             prog = DictSprinklerProgram.factory(_search,
                                                 self.all_stations,
-                                                now=now)
+                                                now=now,
+                                                local_tz=self.local_tz)
             if after_now(now, prog.start_time, self.jitter):
                 programs.append(prog)
         return programs
@@ -87,28 +237,128 @@ select a program.
 The search is greedy, in that the very first program found is the one that is
 returned if there are many programs at the same time.
 """
-        local_dt = local_dt_for_utc_now(now, self.local_tz)
-        programs = self.search_progs_by_time(now)
-        if not programs:
+        self._check_index(now)
+        if self.max_defer > 0:
+            return self._get_deferred_program(now)
+        # Programs are due if now is within jitter seconds after their start
+        low = bisect_left(self._day_starts, now - self.jitter)
+        high = bisect_right(self._day_starts, now)
+        if low >= high:
             return None
-        for program in programs:
-            if program.program_type in [ProgramType.EVENDAYSONLY, ProgramType.ODDDAYSONLY]:
-                remainder = 0
-                if program.program_type == ProgramType.ODDDAYSONLY:
-                    remainder = 1
-                if local_dt.day % 2 == remainder:
-                    return program
-            if program.program_type == ProgramType.DAYOFTHEWEEK:
-                if local_dt.weekday() in program.days_of_the_week:
-                    return program
+        # The program added first wins
+        seq = min(self._day_seqs[low:high])
+        start = self._day_starts[low + self._day_seqs[low:high].index(seq)]
+        return DictSprinklerProgram(start, self.all_stations, self._programs[seq])
+    def _pending_runs(self, now: float) -> Iterator[Tuple[float, int]]:
+        """Runs due by now, not handed out and no more than max_defer late"""
+        window = max(self.jitter, self.max_defer)
+        low = bisect_left(self._day_starts, now - window)
+        high = bisect_right(self._day_starts, now)
+        for start, seq in sorted(zip(self._day_starts[low:high], self._day_seqs[low:high])):
+            if (start, seq) not in self._handed_out:
+                yield start, seq
+    def _get_deferred_program(self, now: float) -> Union[SprinklerProgram, None]:
+        """Hands out the earliest pending run, starting now if it is late"""
+        window = max(self.jitter, self.max_defer)
+        self._handed_out = {_run for _run in self._handed_out if _run[0] >= now - window}
+        for start, seq in self._pending_runs(now):
+            self._handed_out.add((start, seq))
+            if start < now - self.jitter:
+                LOGGER.info("Program %s started %.0fs late", self._programs[seq].name, now - start)
+                start = now
+            return DictSprinklerProgram(start, self.all_stations, self._programs[seq])
         return None
+    def next_program_start(self, now: float) -> Union[float, None]:
+        """Gets the next UTC time after now a program may be due
+
+If no more programs start today, this is the next local midnight, when the
+index is rebuilt for the new day.
+"""
+        self._check_index(now)
+        if self.max_defer > 0 and next(self._pending_runs(now), None) is not None:
+            return now
+        idx = bisect_right(self._day_starts, now)
+        if idx < len(self._day_starts):
+            return self._day_starts[idx]
+        return self._day_bounds[1]
+    def day_plan(self, now: float) -> List[Run]:
+        """Runs handed out on the local day containing now, in order of start
+
+These are the programs get_program hands out when asked at their starts: of
+the programs starting at the same time, the one added first. The keys of the
+runs are the DictPrograms, and the runs are not adjusted for the watering
+percentage or checked for overlaps.
+"""
+        local_day = local_day_for_utc_now(now, self.local_tz)
+        firsts: Dict[float, DictProgram] = {}
+        for program in self._programs.values():
+            if DictSprinklerProgram.valid_on_day(local_day.date, program):
+                firsts.setdefault(local_day.start + program.start_time_of_day, program)
+        return [Run(_start, _start + _program.compiled.run_time, _program)
+                for _start, _program in sorted(firsts.items(), key=lambda _i: _i[0])]
+    def iter_runs(self,
+                  program: DictProgram,
+                  dates: Sequence[datetime.date],
+                  midnights: Sequence[float]) -> Iterator[Run]:
+        """Runs of program on the local dates, with their UTC midnights"""
+        for local_date, midnight in zip(dates, midnights):
+            if DictSprinklerProgram.valid_on_day(local_date, program):
+                start = midnight + program.start_time_of_day
+                yield Run(start, start + program.compiled.run_time, program)
+    def _conflict_days(self,
+                       now: float,
+                       days: int) -> Tuple[List[datetime.date], List[float]]:
+        """Local dates from the day before now, and their UTC midnights"""
+        local_date = local_day_for_utc_now(now, self.local_tz).date
+        dates = [local_date + datetime.timedelta(days=_d) for _d in range(-1, days)]
+        return dates, [utc_for_local_date(_date, self.local_tz) for _date in dates]
+    def conflict_index(self, now: float, days: int = CONFLICT_DAYS) -> RunIndex:
+        """Index of the runs of every program from the day before now for days
+
+The index is kept until the programs change or is asked for another day.
+"""
+        day_start = local_day_for_utc_now(now, self.local_tz).start
+        if self._conflict_index is None or self._conflict_key != (day_start, days):
+            self._conflict_dates = self._conflict_days(now, days)
+            dates, midnights = self._conflict_dates
+            self._conflict_index = RunIndex(run
+                                            for program in self._programs.values()
+                                            for run in self.iter_runs(program, dates, midnights))
+            self._conflict_key = (day_start, days)
+        return self._conflict_index
+    def find_conflicts(self, now: float, days: int = CONFLICT_DAYS) -> List[Conflict]:
+        """Overlapping runs of the programs from the day before now for days
+
+The keys of the runs in the conflicts are the DictPrograms.
+"""
+        return self.conflict_index(now, days).conflicts()
+    def conflicts_with(self,
+                       program: DictProgram,
+                       now: float,
+                       days: int = CONFLICT_DAYS) -> List[Conflict]:
+        """Runs of the managed programs that runs of program would overlap"""
+        index = self.conflict_index(now, days)
+        dates, midnights = self._conflict_dates
+        return [conflict
+                for run in self.iter_runs(program, dates, midnights)
+                for conflict in index.conflicts_with(run)]
+    def report_conflicts(self, now: float, days: int = CONFLICT_DAYS) -> List[Conflict]:
+        """Logs a warning for each conflict found by find_conflicts, and returns them"""
+        conflicts = self.find_conflicts(now, days)
+        for conflict in conflicts:
+            LOGGER.warning("Program %s is still running when %s is due at %.0f, for %.0fs",
+                           conflict.first.key.name,
+                           conflict.second.key.name,
+                           conflict.second.start,
+                           conflict.end - conflict.start)
+        return conflicts
     def update_programs(self,
                         additions: List[Mapping[str, Any]],
                         deletes: List[Mapping[str, Any]]):
         """Updates the internal list of programs"""
         # Remove programs first
         for _del in turn_dicts_to_programs(deletes):
-            self._programs.remove(_del)
+            self.remove_program(_del)
         # Add programs
         for _add in turn_dicts_to_programs(additions):
-            self._programs.append(_add)
+            self.add_program(_add)
@@ -2,26 +2,48 @@
 
 import time
 import datetime
-from typing import List, Mapping
+from bisect import bisect_right
+from typing import List, Mapping, Optional
 from sprinkler.program.abc.program import SprinklerProgram, ProgramTime
 from sprinkler.program.program_types import ProgramType
-from sprinkler.program.time_utilities import local_dt_for_utc_now
+from sprinkler.program.time_utilities import local_day_for_utc_now
 from sprinkler.program.time_utilities import utc_for_local_midnight
-from sprinkler.station.station import Station
+from sprinkler.station.station import BaseStation
 
 from sprinkler.program.dictionary.helpers import DictProgram
 
 LOCAL_TZ = "US/Central"
 
 class DictSprinklerProgram(SprinklerProgram):
-    """A SprinklerProgram initialized via a dictionary"""
+    """A SprinklerProgram initialized via a dictionary
+
+Rather than looking at every ProgramTime, the program runs straight off the
+offsets of the compiled program, as its entries run back to back. Time in the program is
+a line through an anchor: the entry offset at _base_offset is at UTC time
+_base_time, and offsets further on are _scale seconds apart per second of the
+compiled program. The station due at now is then a bisect over the offsets.
+
+Adjusting the watering only moves the anchor and sets the scale, so it costs
+the same however long the program is. Scaled times are not rounded, so they
+match CompiledProgram.run_times for the same percentage. Before the program starts the anchor is
+its start, and the whole program is scaled. Given a now during the run, the
+anchor is moved to where the program is at now, so what has already run
+stays as it was and only the rest of the program is scaled.
+"""
     def __init__(self,
                  start_time: float,
-                 all_stations: Mapping[int, Station],
+                 all_stations: Mapping[int, BaseStation],
                  program_conf: DictProgram):
         super().__init__(start_time)
         self._prog_conf: DictProgram = program_conf
-        self._stations_used: Mapping[int, Station] = {}
+        self._stations_used: Mapping[int, BaseStation] = {}
+        self._run_order: List[BaseStation] = []
+        self._base_time: float = start_time
+        self._base_offset: float = 0.0
+        self._scale: float = 1.0
+        self._on_station: Optional[BaseStation] = None
+        # now of the last update_program, None to write every station on the next
+        self._updated_at: Optional[float] = None
         self.update_with_config(all_stations)
     def __repr__(self) -> str: #pragma: no cover
         cls = self.__class__.__name__
@@ -50,35 +72,118 @@ class DictSprinklerProgram(SprinklerProgram):
         """The type of program this is"""
         return self._prog_conf.program_type
     def update_with_config(self,
-                           all_stations: Mapping[str, Station]):
+                           all_stations: Mapping[str, BaseStation]):
         """Update the stations with the config"""
-        # Start time is the UTC time we start the program
-        running_time = self.start_time
-        for entry in self._prog_conf.station_durations:
-            start = running_time
-            end = start + entry.duration
-            running_time = end
-            prog_t = ProgramTime(start, end, entry.duration)
-            self._stations[prog_t] = all_stations[entry.station_id]
-            self._stations_used[entry.station_id] = all_stations[entry.station_id]
-    def adjust_watering(self, percentage: float):
-        """Adjust the watering by the given percentage"""
+        compiled = self._prog_conf.compiled
+        for station_id in compiled.station_ids:
+            self._stations_used[station_id] = all_stations[station_id]
+        self._run_order = [self._stations_used[_id] for _id in compiled.station_ids]
+        self._base_time = self.start_time
+        self._base_offset = 0.0
+        self._scale = 1.0
+        self.resync()
+    def resync(self):
+        """Makes the next update_program write the state of every station"""
+        self._updated_at = None
+    @property
+    def watering_scale(self) -> float:
+        """Factor the durations still to run are scaled by"""
+        return self._scale
+    def _time_at(self, offset: float) -> float:
+        """UTC time the program reaches offset into the compiled program"""
+        return self._base_time + (offset - self._base_offset) * self._scale
+    def _offset_at(self, now: float) -> float:
+        """Offset into the compiled program the program is at, at now"""
+        run_time = self._prog_conf.compiled.run_time
+        if now <= self._base_time:
+            return self._base_offset
+        if self._scale == 0:
+            return run_time
+        return min(run_time, self._base_offset + (now - self._base_time) / self._scale)
+    def adjust_watering(self, percentage: float, now: Optional[float] = None):
+        """Adjust the watering by the given percentage
+
+With now during the run, only what is left of the program is adjusted.
+"""
         if not self.respects_water_adjustment:
             return
-        running_time = self.start_time
-        new_stations: Mapping[ProgramTime, Station] = {}
-        for entry in self._prog_conf.station_durations:
-            start = running_time
-            duration = int(round(entry.duration * percentage, 0))
-            end = start + duration
-            running_time = end
-            prog_t = ProgramTime(start, end, duration)
-            new_stations[prog_t] = self._stations_used[entry.station_id]
-        self._stations = new_stations
+        if now is None or now <= self.start_time:
+            self._base_time = self.start_time
+            self._base_offset = 0.0
+        else:
+            self._base_offset = self._offset_at(now)
+            self._base_time = now
+        self._scale = percentage
+    def reschedule(self, start_time: float):
+        """Moves the whole program to start at start_time, keeping its due time"""
+        self._base_time += start_time - self._start_time
+        self._start_time = start_time
+        self.resync()
+    @property
+    def stations(self) -> List[BaseStation]:
+        """List of stations involved, in run order"""
+        return list(self._run_order)
+    @property
+    def stations_indexed(self) -> Mapping[ProgramTime, BaseStation]:
+        """Get the stations indexed to their program times, as currently adjusted"""
+        compiled = self._prog_conf.compiled
+        indexed = {}
+        for offset, duration, station in zip(compiled.offsets,
+                                             compiled.durations,
+                                             self._run_order):
+            start = self._time_at(offset)
+            end = self._time_at(offset + duration)
+            indexed[ProgramTime(start, end, end - start)] = station
+        return indexed
+    @property
+    def program_run_time(self) -> float:
+        """Length of the program, as currently adjusted"""
+        return self.program_end_time - self.start_time
+    @property
+    def program_end_time(self) -> float:
+        """Returns the time at which the program ends in UTC"""
+        return self._time_at(self._prog_conf.compiled.run_time)
+    def _entry_at(self, now: float) -> int:
+        """Index of the last entry started by now, -1 if none has"""
+        return bisect_right(self._prog_conf.compiled.offsets, now, key=self._time_at) - 1
+    def update_program(self, now: float):
+        """Updates the state of the stations based on the given now"""
+        compiled = self._prog_conf.compiled
+        idx = self._entry_at(now)
+        station = None
+        if idx >= 0 and now < self._time_at(compiled.offsets[idx] + compiled.durations[idx]):
+            station = self._run_order[idx]
+        if self._updated_at is None or now < self._updated_at:
+            # Write every station
+            for used in self._stations_used.values():
+                used.on = used is station
+        elif station is not self._on_station:
+            if self._on_station is not None:
+                self._on_station.on = False
+            if station is not None:
+                station.on = True
+        self._on_station = station
+        self._updated_at = now
+    def next_transition(self, now: float) -> Optional[float]:
+        """Returns the next UTC time after now that the program changes state
+
+Past the last station, this is the first whole second the program is over.
+None is returned once the program is over.
+"""
+        offsets = self._prog_conf.compiled.offsets
+        idx = self._entry_at(now) + 1
+        if idx < len(offsets):
+            return self._time_at(offsets[idx])
+        end = self.program_end_time
+        if end > now:
+            return end
+        if self.program_over(now):
+            return None
+        return end + 1
 
     @classmethod
     def valid_on_day(cls: "DictSprinklerProgram",
-                     day: datetime.datetime,
+                     day: datetime.date,
                      conf: DictProgram) -> bool:
         """Returns if this program can run today"""
         program_type: ProgramType = conf.program_type
@@ -95,21 +200,21 @@ class DictSprinklerProgram(SprinklerProgram):
                        conf: DictProgram,
                        jitter: int = 60) -> bool:
         """Returns true if this program should run now"""
-        local_dt = local_dt_for_utc_now(now, LOCAL_TZ)
-        if not cls.valid_on_day(local_dt, conf):
+        local_day = local_day_for_utc_now(now, LOCAL_TZ)
+        if not cls.valid_on_day(local_day.date, conf):
             return False
-        local_midnight_utc = utc_for_local_midnight(now, LOCAL_TZ)
-        program_start = local_midnight_utc + conf.start_time_of_day
+        program_start = local_day.start + conf.start_time_of_day
         return (program_start - jitter) <= now <= (program_start + jitter)
 
     @classmethod
     def factory(cls: "DictSprinklerProgram",
                 program_conf: DictProgram,
-                all_stations: Mapping[int, Station],
-                now: float = 0) -> "DictSprinklerProgram":
+                all_stations: Mapping[int, BaseStation],
+                now: float = 0,
+                local_tz: str = LOCAL_TZ) -> "DictSprinklerProgram":
         """Properly create the class"""
         if now <= 0:
             now = time.time()
-        utc_midnight = utc_for_local_midnight(now, LOCAL_TZ)
+        utc_midnight = utc_for_local_midnight(now, local_tz)
         start_time = utc_midnight + program_conf.start_time_of_day
         return DictSprinklerProgram(start_time, all_stations, program_conf)
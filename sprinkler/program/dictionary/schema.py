@@ -0,0 +1,26 @@
+"""marshmallow schema validating DictPrograms"""
+
+from typing import Mapping
+
+from marshmallow import Schema, fields, post_load
+
+from sprinkler.program.dictionary.helpers import ProgramEntry
+from sprinkler.program.program_types import ProgramType
+
+class ProgramDictSchema(Schema):
+    """Schema defining Programs"""
+    start_time_of_day = fields.Int(required=True)
+    station_durations = fields.List(fields.Dict, required=True)
+    program_type = fields.Int(required=True)
+    respect_rain = fields.Bool(required=True)
+    respect_water_adjustment = fields.Bool(required=True)
+    days_of_the_week = fields.List(fields.Int)
+    name = fields.Str()
+
+    @post_load
+    def normalize(self, input_data: Mapping, **kwargs): #pylint: disable=unused-argument, no-self-use, line-too-long
+        """Turn station_durations into a list of ProgramEntry and program_type into Enum"""
+        input_data["station_durations"] = [ProgramEntry(**duration)
+                                           for duration in input_data["station_durations"]]
+        input_data["program_type"] = ProgramType(input_data["program_type"])
+        return input_data
@@ -0,0 +1,316 @@
+"""Persistent store of validated DictPrograms
+
+Programs are kept in an SQLite database, a row per program, keyed by a hash of
+the raw program they were validated from. Next to the database is a flat file
+of the compiled programs, the offsets and durations of every program as
+doubles followed by the stations they run, which is memory mapped on load.
+Station ids can be any int, str or float, so the file holds the index of each
+in the station_keys table, which is read once on load.
+The compiled programs are read-only views straight onto the mapping, and the
+station durations are made from them, so loading the store takes neither
+marshmallow, compiling nor parsing JSON, which makes a cold start after a power
+blip a matter of milliseconds.
+
+When the programs change, only those with a new hash are validated, the rest
+come from the store, and only the rows of programs that are new, gone or have
+moved are written. If the programs file hasn't changed at all, not even the
+hashing is needed, as the hash of the whole file is kept too.
+
+The compiled file is only a cache. It carries the generation of the database
+it was written for, and if it is missing or out of step, the programs are
+compiled from the station durations in the database and it is written again.
+It is written in the byte order of the machine, so it is not meant to be moved.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import struct
+from array import array
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from sprinkler.program.dictionary.helpers import CompiledProgram, DictProgram, ProgramEntry
+from sprinkler.program.dictionary.helpers import compile_program, iter_dicts_from_file
+from sprinkler.program.dictionary.helpers import turn_dicts_into_dict_programs
+from sprinkler.program.program_types import ProgramType
+
+# magic, generation, number of doubles, number of station indexes; padded so
+# the doubles and indexes after it are aligned
+CACHE_HEADER = struct.Struct("=4s4xQQQ")
+CACHE_MAGIC = b"SPKC"
+
+# Station ids SQLite keeps as they are, in a column without a type
+STATION_KEY_TYPES = (int, str, float)
+
+# Bumped when the tables change, a store of another version is emptied
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS programs (
+    id INTEGER PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    name TEXT NOT NULL,
+    start_time_of_day NUMERIC NOT NULL,
+    program_type INTEGER NOT NULL,
+    respect_rain INTEGER NOT NULL,
+    respect_water_adjustment INTEGER NOT NULL,
+    days_of_the_week TEXT NOT NULL,
+    station_durations TEXT NOT NULL,
+    station_count INTEGER NOT NULL,
+    cache_index INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS programs_seq ON programs (seq);
+CREATE TABLE IF NOT EXISTS station_keys (
+    id INTEGER PRIMARY KEY,
+    key UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+"""
+
+def conf_hash(conf: Mapping[str, Any]) -> str:
+    """Hash of the content of a raw program, independent of key order"""
+    content = json.dumps(conf, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def file_hash(path: str) -> str:
+    """Hash of the bytes of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ProgramStore:
+    """SQLite store of programs with a memory mapped cache of their compiled form"""
+    def __init__(self, path: str):
+        """Opens, or creates, the store at path
+
+The compiled cache lives next to it, at path with .compiled added.
+"""
+        self.path = path
+        self.cache_path = f"{path}.compiled"
+        self._db = sqlite3.connect(path)
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._db.executescript("DROP TABLE IF EXISTS programs; DROP TABLE IF EXISTS meta;"
+                                   " DROP TABLE IF EXISTS station_keys;")
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._db.executescript(SCHEMA)
+    def close(self):
+        """Closes the database"""
+        self._db.close()
+    def __enter__(self) -> "ProgramStore":
+        return self
+    def __exit__(self, *exc_info):
+        self.close()
+    def _get_meta(self, key: str, default: Any = None) -> Any:
+        """Gets a value from the meta table"""
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+    def _set_meta(self, key: str, value: Any):
+        """Sets a value in the meta table, within the current transaction"""
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+    @property
+    def generation(self) -> int:
+        """Number of times the programs have been saved"""
+        return self._get_meta("generation", 0)
+    @property
+    def source_hash(self) -> Optional[str]:
+        """Hash of the programs file the store was last synced from"""
+        return self._get_meta("source_hash")
+    def _map_cache(self) -> Optional[mmap.mmap]:
+        """Maps the compiled cache, None if it is missing or stale"""
+        try:
+            cache_file = open(self.cache_path, "rb") #pylint: disable=consider-using-with
+        except FileNotFoundError:
+            return None
+        with cache_file:
+            if os.fstat(cache_file.fileno()).st_size < CACHE_HEADER.size:
+                return None
+            mapped = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, generation, doubles, ids = CACHE_HEADER.unpack_from(mapped)
+        expected = CACHE_HEADER.size + doubles * array("d").itemsize + ids * array("q").itemsize
+        if magic != CACHE_MAGIC or generation != self.generation or len(mapped) != expected:
+            mapped.close()
+            return None
+        return mapped
+    def _station_indexes(self, compiled: Iterable[CompiledProgram]) -> Dict[Any, int]:
+        """Index in station_keys of each station the programs run, adding new ones
+
+Raises TypeError for a station id that isn't an int, str or float, before
+anything is written.
+"""
+        indexes = dict(self._db.execute("SELECT key, id FROM station_keys"))
+        missing = [_id for _program in compiled for _id in _program.station_ids
+                   if _id not in indexes]
+        if not missing:
+            return indexes
+        for station_id in missing:
+            if type(station_id) not in STATION_KEY_TYPES: #pylint: disable=unidiomatic-typecheck
+                raise TypeError(f"Station id {station_id!r} can't be stored,"
+                                " it must be an int, str or float")
+        with self._db:
+            self._db.executemany("INSERT OR IGNORE INTO station_keys (key) VALUES (?)",
+                                 [(_id,) for _id in dict.fromkeys(missing)])
+        return dict(self._db.execute("SELECT key, id FROM station_keys"))
+    def _write_cache(self, compiled: Sequence[CompiledProgram], indexes: Dict[Any, int]):
+        """Writes the offsets and durations of the programs in order, then their stations
+
+indexes is the index of each station in station_keys, from _station_indexes.
+"""
+        doubles = array("d")
+        station_ids = array("q")
+        for program in compiled:
+            doubles.extend(program.offsets)
+            doubles.extend(program.durations)
+            station_ids.extend(indexes[_id] for _id in program.station_ids)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "wb") as cache_file:
+            cache_file.write(CACHE_HEADER.pack(CACHE_MAGIC,
+                                               self.generation,
+                                               len(doubles),
+                                               len(station_ids)))
+            doubles.tofile(cache_file)
+            station_ids.tofile(cache_file)
+        os.replace(tmp_path, self.cache_path)
+    def _mapped_programs(self,
+                         mapped: mmap.mmap,
+                         slots: Sequence[Tuple[int, int]]) -> List[CompiledProgram]:
+        """Compiled programs viewing the mapped cache, from their station count and cache index
+
+The views keep the mapping open for as long as the programs are around.
+"""
+        keys = dict(self._db.execute("SELECT id, key FROM station_keys"))
+        _, _, count, _ = CACHE_HEADER.unpack_from(mapped)
+        ids_begin = CACHE_HEADER.size + count * array("d").itemsize
+        view = memoryview(mapped)
+        doubles = view[CACHE_HEADER.size:ids_begin].cast("d")
+        station_ids = view[ids_begin:].cast("q")
+        compiled = []
+        for station_count, cache_index in slots:
+            durations = doubles[cache_index + station_count:cache_index + 2 * station_count]
+            first_id = cache_index // 2
+            compiled.append(CompiledProgram(doubles[cache_index:cache_index + station_count],
+                                            durations,
+                                            tuple(keys[_index] for _index in
+                                                  station_ids[first_id:first_id + station_count]),
+                                            sum(durations)))
+        return compiled
+    def load(self) -> List[DictProgram]:
+        """Loads the stored programs, in order, without validating or compiling them"""
+        rows = self._db.execute(
+            "SELECT name, start_time_of_day, program_type, respect_rain,"
+            " respect_water_adjustment, days_of_the_week, station_count, cache_index"
+            " FROM programs ORDER BY seq").fetchall()
+        if not rows:
+            return []
+        mapped = self._map_cache()
+        if mapped is None:
+            compiled = [compile_program([ProgramEntry(*_entry) for _entry in json.loads(_row[0])])
+                        for _row in self._db.execute(
+                            "SELECT station_durations FROM programs ORDER BY seq")]
+            self._write_cache(compiled, self._station_indexes(compiled))
+        else:
+            compiled = self._mapped_programs(mapped, [_row[6:] for _row in rows])
+        return [DictProgram(start_time_of_day=start_time_of_day,
+                            station_durations=list(map(ProgramEntry,
+                                                       _compiled.station_ids,
+                                                       _compiled.durations)),
+                            program_type=ProgramType(program_type),
+                            respect_rain=bool(respect_rain),
+                            respect_water_adjustment=bool(respect_water_adjustment),
+                            days_of_the_week=[int(_d) for _d in days_of_the_week.split(",") if _d],
+                            name=name,
+                            compiled=_compiled)
+                for (name, start_time_of_day, program_type, respect_rain,
+                     respect_water_adjustment, days_of_the_week, _, _), _compiled
+                in zip(rows, compiled)]
+    def save(self,
+             programs: Iterable[Tuple[str, DictProgram]],
+             source_hash: Optional[str] = None):
+        """Stores the hashes and programs given in place of those stored
+
+Programs are matched to the stored ones by hash, and only the rows of those
+that are new, gone or have moved are written. The cache is written again if
+any were. Raises TypeError, storing nothing, if a station id can't be stored.
+"""
+        stored: Dict[str, List[Tuple[int, int, int]]] = defaultdict(list)
+        for row_id, program_hash, seq, cache_index in self._db.execute(
+                "SELECT id, hash, seq, cache_index FROM programs ORDER BY seq"):
+            stored[program_hash].append((row_id, seq, cache_index))
+        inserts = []
+        moves = []
+        compiled = []
+        cache_index = 0
+        for seq, (program_hash, program) in enumerate(programs):
+            station_count = len(program.compiled.station_ids)
+            if stored[program_hash]:
+                row_id, stored_seq, stored_index = stored[program_hash].pop(0)
+                if (stored_seq, stored_index) != (seq, cache_index):
+                    moves.append((seq, cache_index, row_id))
+            else:
+                inserts.append((seq,
+                                program_hash,
+                                program.name,
+                                program.start_time_of_day,
+                                int(program.program_type),
+                                int(program.respect_rain),
+                                int(program.respect_water_adjustment),
+                                ",".join(str(_d) for _d in program.days_of_the_week),
+                                json.dumps([list(_entry) for _entry in program.station_durations]),
+                                station_count,
+                                cache_index))
+            compiled.append(program.compiled)
+            cache_index += 2 * station_count
+        deletes = [(_row[0],) for _rows in stored.values() for _row in _rows]
+        changed = bool(inserts or moves or deletes)
+        indexes = self._station_indexes(compiled) if changed else {}
+        with self._db:
+            if changed:
+                self._db.executemany("DELETE FROM programs WHERE id = ?", deletes)
+                self._db.executemany("UPDATE programs SET seq = ?, cache_index = ? WHERE id = ?",
+                                     moves)
+                self._db.executemany(
+                    "INSERT INTO programs (seq, hash, name, start_time_of_day, program_type,"
+                    " respect_rain, respect_water_adjustment, days_of_the_week,"
+                    " station_durations, station_count, cache_index)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", inserts)
+                self._set_meta("generation", self.generation + 1)
+            self._set_meta("source_hash", source_hash)
+        if changed:
+            self._write_cache(compiled, indexes)
+    def update_from_dicts(self,
+                          confs: Iterable[Mapping[str, Any]],
+                          source_hash: Optional[str] = None) -> List[DictProgram]:
+        """Stores the raw programs, only validating those not already stored
+
+Returns the programs, in order.
+"""
+        confs = list(confs)
+        hashes = [conf_hash(_conf) for _conf in confs]
+        known: Dict[str, DictProgram] = {}
+        stored_hashes = [_row[0] for _row in
+                         self._db.execute("SELECT hash FROM programs ORDER BY seq")]
+        if not set(stored_hashes).isdisjoint(hashes):
+            known = dict(zip(stored_hashes, self.load()))
+        new = [_conf for _conf, _hash in zip(confs, hashes) if _hash not in known]
+        validated = iter(turn_dicts_into_dict_programs(new))
+        programs = [known[_hash] if _hash in known else next(validated) for _hash in hashes]
+        self.save(zip(hashes, programs), source_hash)
+        return programs
+    def sync_file(self, path: str) -> List[DictProgram]:
+        """Brings the store up to date with a JSON or JSON Lines file of programs
+
+If the file is unchanged since it was last synced, the stored programs are
+loaded without reading it further.
+"""
+        source_hash = file_hash(path)
+        if source_hash == self.source_hash:
+            return self.load()
+        return self.update_from_dicts(iter_dicts_from_file(path), source_hash)
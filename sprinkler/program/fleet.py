@@ -0,0 +1,90 @@
+"""Day plans of many sites, evaluated across a pool of processes
+
+Planning centrally means asking what runs where today for thousands of sites,
+each with its own programs and timezone. Rather than a controller per site,
+each site gets a DictProgramManager without stations, and its day_plan gives
+the runs get_program would hand out over the day, without ticking through it.
+
+Sites are sent to the worker processes in chunks, to spread the cost of
+pickling, and only so many chunks are in flight at once, so the sites can come
+from a generator. Plans are yielded as their chunk is done, which is not
+necessarily the order the sites were given in.
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Set
+
+from sprinkler.program.dictionary.manager import DictProgramManager
+from sprinkler.program.time_utilities import local_day_for_utc_now
+
+# programs are raw program dicts, as given to DictProgramManager
+Site = namedtuple("Site", ["site_id", "programs", "local_tz"])
+
+# start and end are UTC, name is that of the program
+PlannedRun = namedtuple("PlannedRun", ["start", "end", "name"])
+
+# runs is empty and error says why if the site can't be planned, as its programs
+# or timezone are invalid; local_date is None too if it is the timezone
+SitePlan = namedtuple("SitePlan", ["site_id", "local_date", "runs", "error"])
+
+def plan_site(site: Site, now: float) -> SitePlan:
+    """Plans the local day containing now at the site
+
+Whatever goes wrong planning the site is turned into the error of its plan, so
+one bad site can't stop the rest of the fleet being planned.
+"""
+    # pylint: disable=import-outside-toplevel
+    from marshmallow import ValidationError
+    local_date = None
+    try:
+        local_date = local_day_for_utc_now(now, site.local_tz).date
+        manager = DictProgramManager(site.programs, [], site.local_tz)
+        runs = [PlannedRun(_run.start, _run.end, _run.key.name)
+                for _run in manager.day_plan(now)]
+    except ValidationError as error:
+        return SitePlan(site.site_id, local_date, [], str(error.messages))
+    except Exception as error: # pylint: disable=broad-except
+        return SitePlan(site.site_id, local_date, [], f"{type(error).__name__}: {error}")
+    return SitePlan(site.site_id, local_date, runs, None)
+
+def plan_sites(sites: List[Site], now: float) -> List[SitePlan]:
+    """Plans the local day containing now at each of the sites"""
+    return [plan_site(_site, now) for _site in sites]
+
+def evaluate_fleet(sites: Iterable[Site],
+                   now: float,
+                   max_workers: Optional[int] = None,
+                   chunksize: int = 64,
+                   executor: Optional[ProcessPoolExecutor] = None) -> Iterator[SitePlan]:
+    """Yields the plan of the local day containing now of every site
+
+The sites are planned by a ProcessPoolExecutor of max_workers processes, or by
+executor if one is given, which is then left running.
+"""
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    # Enough chunks in flight to keep every worker busy
+    in_flight = 2 * (max_workers or os.cpu_count() or 1)
+    sites = iter(sites)
+    pending: Set[Future] = set()
+    try:
+        while True:
+            while len(pending) < in_flight:
+                chunk = list(islice(sites, chunksize))
+                if not chunk:
+                    break
+                pending.add(executor.submit(plan_sites, chunk, now))
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=True)
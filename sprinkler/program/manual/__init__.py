@@ -0,0 +1,3 @@
+"""Manual Program"""
+
+from sprinkler.program.manual.program import ManualProgram
@@ -0,0 +1,55 @@
+"""Program running a single station on demand"""
+
+import datetime
+from typing import Any, List, Optional
+
+from sprinkler.program.abc.program import SprinklerProgram, ProgramTime
+from sprinkler.program.program_types import ProgramType
+from sprinkler.station.station import BaseStation
+
+class ManualProgram(SprinklerProgram):
+    """Runs one station for a duration, from start_time
+
+Manual runs are not scheduled, and water for as long as asked regardless of
+the watering adjustment. By default they run through a rain delay too, as
+someone asked for the water.
+"""
+    def __init__(self,
+                 start_time: float,
+                 station: BaseStation,
+                 duration: float,
+                 respect_rain_delay: bool = False):
+        super().__init__(start_time)
+        self.station = station
+        self.duration = duration
+        self._respect_rain_delay = respect_rain_delay
+        self._stations = {ProgramTime(start_time, start_time + duration, duration): station}
+    def __repr__(self) -> str: #pragma: no cover
+        cls = self.__class__.__name__
+        return f"{cls}({self.start_time}, {repr(self.station)}, {self.duration})"
+    @property
+    def days_of_the_week(self) -> List[int]:
+        """Manual runs are not scheduled on any day"""
+        return []
+    @property
+    def program_type(self) -> Optional[ProgramType]:
+        """Manual runs have no program type"""
+        return None
+    @property
+    def respects_water_adjustment(self) -> bool:
+        """Manual runs water for as long as asked"""
+        return False
+    @property
+    def respect_rain_delay(self) -> bool:
+        """True if this run will respect the rain delay"""
+        return self._respect_rain_delay
+    @classmethod
+    def valid_on_day(cls, day: datetime.date, conf: Any) -> bool:
+        """Manual runs are never scheduled"""
+        return False
+    @classmethod
+    def should_run_now(cls, now: float, conf: Any, jitter: int = 0) -> bool:
+        """Manual runs are never scheduled"""
+        return False
+    def adjust_watering(self, percentage: float, now: Optional[float] = None):
+        """Manual runs are not adjusted"""
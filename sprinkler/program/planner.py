@@ -0,0 +1,102 @@
+"""Vectorized planning of when programs will run
+
+Given a set of DictPrograms and a range of local dates, plan_runs works out
+every run of every program, and the UTC start and end of each of its entries,
+as NumPy arrays. Which programs run on which day is worked out for all the
+programs and days at once with the same rules as DictSprinklerProgram's
+valid_on_day, and the entries of all the runs are laid out at once from the
+compiled programs. The only Python level loop is over the days, to find their
+local midnights, which is what handles DST.
+
+This needs NumPy, which is an optional dependency (the plan extra).
+"""
+
+import datetime
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+
+from sprinkler.program.dictionary.helpers import DictProgram
+from sprinkler.program.program_types import ProgramType
+from sprinkler.program.time_utilities import utc_for_local_date
+
+@dataclass
+class SchedulePlan:
+    """Planned runs and their entries, sorted by start
+
+The run arrays have an element per run of a program, the entry arrays one per
+station entry of a run. program arrays index into the programs planned, and
+run indexes into the run arrays. Times are UTC floats, and the durations are
+not adjusted for the watering percentage.
+"""
+    run_program: np.ndarray
+    run_start: np.ndarray
+    run_end: np.ndarray
+    program: np.ndarray
+    run: np.ndarray
+    station_id: np.ndarray
+    start: np.ndarray
+    end: np.ndarray
+
+def local_dates(start_date: datetime.date, end_date: datetime.date) -> np.ndarray:
+    """The local dates from start_date up to but not including end_date"""
+    return np.arange(np.datetime64(start_date, "D"), np.datetime64(end_date, "D"))
+
+def valid_days(programs: Sequence[DictProgram], dates: np.ndarray) -> np.ndarray:
+    """Boolean array of which programs, by row, run on which dates, by column"""
+    # 1970-01-01 was a Thursday, with Monday being 0
+    weekdays = (dates.astype(np.int64) + 3) % 7
+    days = (dates - dates.astype("datetime64[M]")).astype(np.int64) + 1
+    program_types = np.array([_p.program_type for _p in programs], dtype=np.int64)
+    dow = np.zeros((len(programs), 7), dtype=bool)
+    for row, program in enumerate(programs):
+        dow[row, program.days_of_the_week] = True
+    dow_valid = dow[:, weekdays]
+    parity_valid = np.where((program_types == ProgramType.ODDDAYSONLY)[:, None],
+                            (days % 2 == 1)[None, :],
+                            (days % 2 == 0)[None, :])
+    return np.where((program_types == ProgramType.DAYOFTHEWEEK)[:, None],
+                    dow_valid,
+                    parity_valid)
+
+def plan_runs(programs: Sequence[DictProgram],
+              start_date: datetime.date,
+              end_date: datetime.date,
+              local_tz: str) -> SchedulePlan:
+    """Plans the runs of the programs on the local dates from start_date until end_date"""
+    dates = local_dates(start_date, end_date)
+    midnights = np.array([utc_for_local_date(_date, local_tz) for _date in dates.tolist()],
+                         dtype=np.float64)
+    valid = valid_days(programs, dates) if len(programs) else np.zeros((0, len(dates)), bool)
+    run_program, run_day = np.nonzero(valid)
+    start_of_day = np.array([_p.start_time_of_day for _p in programs], dtype=np.float64)
+    run_time = np.array([_p.compiled.run_time for _p in programs], dtype=np.float64)
+    run_start = midnights[run_day] + start_of_day[run_program]
+    run_end = run_start + run_time[run_program]
+    order = np.argsort(run_start, kind="stable")
+    run_program, run_start, run_end = run_program[order], run_start[order], run_end[order]
+
+    # Entries of all the programs, flattened, with where each program's begin
+    counts = np.array([len(_p.compiled.station_ids) for _p in programs], dtype=np.int64)
+    first_entry = np.cumsum(counts) - counts
+    offsets = np.concatenate([np.asarray(_p.compiled.offsets) for _p in programs] or [[]])
+    durations = np.concatenate([np.asarray(_p.compiled.durations) for _p in programs] or [[]])
+    station_ids = np.array([_id for _p in programs for _id in _p.compiled.station_ids])
+
+    run_counts = counts[run_program]
+    run = np.repeat(np.arange(len(run_program)), run_counts)
+    within_run = np.arange(run_counts.sum()) - np.repeat(np.cumsum(run_counts) - run_counts,
+                                                         run_counts)
+    entry = first_entry[run_program][run] + within_run
+    start = run_start[run] + offsets[entry]
+    order = np.argsort(start, kind="stable")
+    run, entry, start = run[order], entry[order], start[order]
+    return SchedulePlan(run_program=run_program,
+                        run_start=run_start,
+                        run_end=run_end,
+                        program=run_program[run],
+                        run=run,
+                        station_id=station_ids[entry] if len(entry) else station_ids[:0],
+                        start=start,
+                        end=start + durations[entry])
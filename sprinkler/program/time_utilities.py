@@ -1,7 +1,24 @@
-"""Utilities for manipulating time"""
+"""Utilities for manipulating time
+
+Converting between UTC and local time is done with zoneinfo. The UTC bounds of
+the local day are cached per timezone, so within a local day finding the local
+midnight or date is a couple of float compares; the cache is only refreshed
+when a lookup falls outside of the cached day. As the bounds are the actual
+local midnights, the 23 and 25 hour days of the DST transitions are handled.
+"""
 
 import datetime
-import pendulum
+from collections import namedtuple
+from functools import lru_cache
+from typing import Dict, Tuple
+from zoneinfo import ZoneInfo
+
+# start and end are the UTC floats of the local midnights starting the day
+# and the following day, date is the local date
+LocalDay = namedtuple("LocalDay", ["start", "end", "date"])
+
+# Most recently used LocalDay for each timezone
+_LOCAL_DAYS: Dict[str, LocalDay] = {}
 
 def seconds_from_midnight(hour: int, minute: int) -> int:
     """Returns the number of seconds from midnight"""
@@ -11,19 +28,57 @@ def seconds_from_midnight(hour: int, minute: int) -> int:
         raise ValueError(f"Minute must be 0 - 59: {minute}")
     return (hour * 3600) + (minute * 60)
 
+@lru_cache(maxsize=None)
+def get_zone(local_tz: str) -> ZoneInfo:
+    """Returns the ZoneInfo for the timezone name"""
+    return ZoneInfo(local_tz)
+
+def _utc_for_local_date(date: datetime.date, zone: ZoneInfo) -> float:
+    """Returns the UTC float of the local midnight starting the date
+
+If midnight doesn't exist in the zone that day, this is the end of the gap.
+"""
+    midnight = datetime.datetime(date.year, date.month, date.day, tzinfo=zone)
+    return midnight.timestamp()
+
+def utc_for_local_date(date: datetime.date, local_tz: str) -> float:
+    """Returns the UTC float of the local midnight starting the date"""
+    return _utc_for_local_date(date, get_zone(local_tz))
+
+def local_day_for_utc_now(now: float, local_tz: str) -> LocalDay:
+    """Takes the UTC now and returns the local day it falls in"""
+    local_day = _LOCAL_DAYS.get(local_tz)
+    if local_day is not None and local_day.start <= now < local_day.end:
+        return local_day
+    zone = get_zone(local_tz)
+    date = datetime.datetime.fromtimestamp(now, zone).date()
+    tomorrow = date + datetime.timedelta(days=1)
+    local_day = LocalDay(_utc_for_local_date(date, zone),
+                         _utc_for_local_date(tomorrow, zone),
+                         date)
+    _LOCAL_DAYS[local_tz] = local_day
+    return local_day
+
 def utc_for_local_midnight(now: float, local_tz: str) -> float:
     """Takes the UTC now and determines the local midnight, returning a UTC float"""
-    local_now = pendulum.from_timestamp(now, tz = local_tz)
-    local_midnight: pendulum.datetime = local_now.set(hour = 0,
-                                                      minute = 0,
-                                                      second = 0,
-                                                      microsecond=0)
-    return local_midnight.float_timestamp
+    return local_day_for_utc_now(now, local_tz).start
+
+def utc_bounds_for_local_day(now: float, local_tz: str) -> Tuple[float, float]:
+    """Takes the UTC now and returns the UTC floats of the local day's start and end
+
+The end is the start of the following local day, so the length of the day is 23
+or 25 hours on DST transitions.
+"""
+    local_day = local_day_for_utc_now(now, local_tz)
+    return local_day.start, local_day.end
+
+def local_date_for_utc_now(now: float, local_tz: str) -> datetime.date:
+    """Takes the UTC timestamp and a local TZ and gives the local date"""
+    return local_day_for_utc_now(now, local_tz).date
 
 def local_dt_for_utc_now(now: float, local_tz: str)  -> datetime.datetime:
     """Takes the UTC timestampe and a local TZ and gives a datetime in the current TZ"""
-    local_dt = pendulum.from_timestamp(now, tz = local_tz)
-    return local_dt
+    return datetime.datetime.fromtimestamp(now, get_zone(local_tz))
 
 def after_now(now: float, check_time: float, jitter: float) -> bool:
     """Returns true if now is within jitter seconds of check_time"""
@@ -0,0 +1,151 @@
+"""Entry point running the controller against a board"""
+
+import asyncio
+import signal
+import sys
+import time
+from typing import List, Optional, TextIO
+
+import click
+
+from sprinkler.board.board import Board
+from sprinkler.board.sequencer import Sequencer
+from sprinkler.controller.aio import AsyncSprinklerController, CachedWeatherController
+from sprinkler.controller.aio import StaticWeatherController
+from sprinkler.controller.queue import QueuePolicy
+from sprinkler.program.dictionary.manager import DictProgramManager
+from sprinkler.program.dictionary.program import LOCAL_TZ
+from sprinkler.station.registry import StationRegistry
+from sprinkler.station.station import BaseStation
+from sprinkler.weather import CachedWeather, FileWeatherProvider
+
+BOARD_KINDS = ["ospi", "virtual"]
+
+def make_board(kind: str,
+               stations: List[BaseStation],
+               host: str = "localhost",
+               port: int = 8888,
+               stream: TextIO = sys.stdout,
+               master_relay: bool = False) -> Board:
+    """Makes the board of the given kind for the stations"""
+    if kind == "ospi":
+        # pylint: disable=import-outside-toplevel
+        from sprinkler.board.ospi import OSPIBoard, get_pigpio_pi
+        return OSPIBoard(get_pigpio_pi(host=host, port=port), stations,
+                         use_master_relay=master_relay)
+    from sprinkler.board.virtual import VirtualStreamBoard # pylint: disable=import-outside-toplevel
+    return VirtualStreamBoard(stations, stream)
+
+def build_controller(board_kind: str,
+                     programs: str,
+                     local_tz: str,
+                     station_count: int,
+                     host: str = "localhost",
+                     port: int = 8888,
+                     stream: TextIO = sys.stdout,
+                     max_defer: int = 0,
+                     queue_policy: QueuePolicy = QueuePolicy.SKIP,
+                     store: Optional[str] = None,
+                     weather_file: Optional[str] = None,
+                     weather_ttl: float = 15 * 60,
+                     station_delay: float = 0,
+                     master_relay: bool = False,
+                     master_off_delay: float = 0) -> AsyncSprinklerController:
+    """Builds a controller from a JSON or JSON Lines file of programs
+
+With store, the programs go through a ProgramStore at that path, so only the
+programs that changed since the last start are validated.
+With weather_file, the weather is read from that JSON file, at most every
+weather_ttl seconds, otherwise the weather is always fair.
+With station_delay or master_relay, the board is sequenced, waiting
+station_delay seconds between one station going off and the next coming on,
+and keeping the master relay on until master_off_delay seconds after the last.
+Programs whose runs overlap are logged as they are loaded.
+"""
+    stations = StationRegistry(station_count)
+    board = make_board(board_kind, stations.stations, host, port, stream, master_relay)
+    if store is None:
+        manager = DictProgramManager.from_file(programs, stations, local_tz, max_defer=max_defer)
+    else:
+        # pylint: disable=import-outside-toplevel
+        from sprinkler.program.dictionary.store import ProgramStore
+        with ProgramStore(store) as program_store:
+            manager = DictProgramManager.from_programs(program_store.sync_file(programs),
+                                                       stations,
+                                                       local_tz,
+                                                       max_defer=max_defer)
+    manager.report_conflicts(time.time())
+    if weather_file is None:
+        controller = StaticWeatherController(board, manager)
+    else:
+        weather = CachedWeather(FileWeatherProvider(weather_file), ttl=weather_ttl)
+        controller = CachedWeatherController(board, manager, weather)
+    controller.queue_policy = queue_policy
+    if station_delay or master_relay:
+        controller.sequencer = Sequencer(board, station_delay, master_relay, master_off_delay)
+    return controller
+
+async def serve(controller: AsyncSprinklerController, event_driven: bool):
+    """Runs the controller until SIGINT or SIGTERM"""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, controller.stop)
+    await controller.run_async(event_driven=event_driven)
+
+@click.command()
+@click.option("--board", "board_kind", type=click.Choice(BOARD_KINDS), default="virtual",
+              show_default=True, help="Board to drive")
+@click.option("--programs", type=click.Path(exists=True, dir_okay=False), required=True,
+              help="JSON file holding a list of programs, or a JSON Lines file")
+@click.option("--timezone", "local_tz", default=LOCAL_TZ, show_default=True,
+              help="Local timezone the programs are written in")
+@click.option("--stations", "station_count", default=8, show_default=True,
+              help="Number of stations on the board")
+@click.option("--host", default="localhost", show_default=True, help="pigpiod host")
+@click.option("--port", default=8888, show_default=True, help="pigpiod port")
+@click.option("--max-defer", default=0, show_default=True,
+              help="Seconds late a program missed while another ran may still start; "
+                   "mostly for the skip policy, as defer and merge queue programs on time")
+@click.option("--queue-policy", type=click.Choice([_p.value for _p in QueuePolicy]),
+              default=QueuePolicy.SKIP.value, show_default=True,
+              help="What to do with a program due while another runs")
+@click.option("--store", type=click.Path(dir_okay=False), default=None,
+              help="Program store to keep validated programs in between starts")
+@click.option("--weather-file", type=click.Path(dir_okay=False), default=None,
+              help="JSON file holding the weather, fair weather if not given")
+@click.option("--weather-ttl", default=15 * 60, show_default=True,
+              help="Seconds the weather read from the weather file is good for")
+@click.option("--station-delay", default=0.0, show_default=True,
+              help="Seconds between one station going off and the next coming on")
+@click.option("--master-relay/--no-master-relay", default=False, show_default=True,
+              help="Drive a master valve or pump from the external relay")
+@click.option("--master-off-delay", default=0.0, show_default=True,
+              help="Seconds the master relay stays on after the last station")
+@click.option("--event-driven/--poll", default=True, show_default=True,
+              help="Sleep until the next transition or tick every second")
+def main(board_kind: str,
+         programs: str,
+         local_tz: str,
+         station_count: int,
+         host: str,
+         port: int,
+         max_defer: int,
+         queue_policy: str,
+         store: Optional[str],
+         weather_file: Optional[str],
+         weather_ttl: float,
+         station_delay: float,
+         master_relay: bool,
+         master_off_delay: float,
+         event_driven: bool):
+    """Runs the sprinkler controller"""
+    controller = build_controller(board_kind, programs, local_tz, station_count, host, port,
+                                  max_defer=max_defer,
+                                  queue_policy=QueuePolicy(queue_policy),
+                                  store=store,
+                                  weather_file=weather_file,
+                                  weather_ttl=weather_ttl,
+                                  station_delay=station_delay,
+                                  master_relay=master_relay,
+                                  master_off_delay=master_off_delay)
+    asyncio.run(serve(controller, event_driven))
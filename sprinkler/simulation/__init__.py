@@ -0,0 +1,4 @@
+"""Library for simulating a controller running its programs"""
+
+from sprinkler.simulation.engine import PatternChange, RecordingBoard, SimulatedClock
+from sprinkler.simulation.engine import Simulation, SimulationController
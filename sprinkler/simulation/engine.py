@@ -0,0 +1,129 @@
+"""Fast forward simulation of a controller
+
+Rather than ticking the controller every simulated second, the simulation asks
+the controller for its next wakeup and jumps the clock straight there, the same
+way the event driven mainloop sleeps. Station state only changes at those
+transitions, so the result is the same as ticking every second, and a year of
+schedules takes a few thousand ticks.
+
+The board records a PatternChange each time the pattern it is sent changes,
+giving a compact timeline to make assertions on, or to total up the time each
+station ran.
+"""
+
+from collections import namedtuple
+from typing import Any, Dict, List, Mapping
+
+from sprinkler.board.board import Board
+from sprinkler.controller.abc import SprinklerController
+from sprinkler.program.abc import ProgramManager
+from sprinkler.program.dictionary.manager import DictProgramManager
+from sprinkler.station.registry import StationRegistry
+from sprinkler.station.station import BaseStation
+
+# time is the UTC time the board was sent the pattern, packed as in Board
+PatternChange = namedtuple("PatternChange", ["time", "pattern"])
+
+class SimulatedClock:
+    """Clock that only moves when told to"""
+    def __init__(self, now: float = 0):
+        self.now = now
+    def __call__(self) -> float:
+        return self.now
+
+class RecordingBoard(Board):
+    """Board that records a timeline of the pattern changes it is sent"""
+    def __init__(self, stations: List[BaseStation], clock: SimulatedClock):
+        super().__init__()
+        self.stations = stations
+        self.clock = clock
+        self.timeline: List[PatternChange] = []
+    def send_pattern(self):
+        """Records the pattern if it changed"""
+        pattern = self.packed_pattern
+        if self.timeline and self.timeline[-1].pattern == pattern:
+            return
+        if not self.timeline and pattern == 0:
+            return
+        self.timeline.append(PatternChange(self.clock(), pattern))
+
+class SimulationController(SprinklerController):
+    """Controller with the weather given to it"""
+    def __init__(self,
+                 board: Board,
+                 manager: ProgramManager,
+                 lockout: bool = False,
+                 rain: bool = False,
+                 watering_percentage: float = 100):
+        super().__init__()
+        self.board = board
+        self.manager = manager
+        self.lockout = lockout
+        self.rain = rain
+        self.watering_percentage = watering_percentage
+        # Nothing changes between transitions, so there is no need to wake
+        self.max_sleep = float("inf")
+    def cold_weather_lockout(self) -> bool:
+        """Returns true if there is a lockout for cold weather"""
+        return self.lockout
+    def rain_delay(self) -> bool:
+        """Returns true if we should rain-delay"""
+        return self.rain
+    def update_watering_percentage(self):
+        """Updates the watering percentage"""
+        self.water_adjust_percent = self.watering_percentage
+
+class Simulation:
+    """Drives a controller and its RecordingBoard through a simulated clock"""
+    def __init__(self,
+                 controller: SprinklerController,
+                 board: RecordingBoard):
+        self.controller = controller
+        self.board = board
+        self.clock = board.clock
+        self.ticks = 0
+    @classmethod
+    def for_programs(cls,
+                     programs: List[Mapping[str, Any]],
+                     station_count: int,
+                     local_tz: str,
+                     max_defer: int = 0,
+                     **weather) -> "Simulation":
+        """Sets up a simulation of the programs on a site with station_count stations
+
+max_defer is passed on to the DictProgramManager, and weather to the
+SimulationController.
+"""
+        stations = StationRegistry(station_count)
+        board = RecordingBoard(stations.stations, SimulatedClock())
+        manager = DictProgramManager(programs, stations, local_tz, max_defer=max_defer)
+        return cls(SimulationController(board, manager, **weather), board)
+    @property
+    def timeline(self) -> List[PatternChange]:
+        """The pattern changes recorded so far"""
+        return self.board.timeline
+    def run(self, start: float, end: float) -> List[PatternChange]:
+        """Runs the simulation from start until end, UTC, returning the timeline"""
+        now = start
+        while now < end:
+            self.clock.now = now
+            self.controller.on_tick(now)
+            self.ticks += 1
+            wakeup = self.controller.next_wakeup(now)
+            if wakeup <= now:
+                wakeup = now + self.controller.tick_interval
+            now = wakeup
+        self.clock.now = end
+        return self.timeline
+    def station_run_times(self, end: float) -> Dict[int, float]:
+        """Seconds each station was on, by station number, until end"""
+        run_times: Dict[int, float] = {_st.number: 0 for _st in self.board.stations}
+        timeline = self.timeline + [PatternChange(end, 0)]
+        for change, following in zip(timeline, timeline[1:]):
+            duration = min(following.time, end) - change.time
+            if duration <= 0:
+                continue
+            for bit, station in enumerate(self.board.stations):
+                if change.pattern & (1 << bit):
+                    run_times[station.number] += duration
+        return run_times
@@ -1,3 +1,4 @@
 """Library for station and station management"""
 
-from sprinkler.station.station import Station
+from sprinkler.station.station import BaseStation, Station
+from sprinkler.station.registry import StationRegistry
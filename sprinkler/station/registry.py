@@ -0,0 +1,118 @@
+"""Registry of the stations of a site"""
+
+from typing import Iterator, List, Optional, Sequence
+
+from sprinkler.station.station import BaseStation
+
+class RegisteredStation(BaseStation):
+    """Station whose flags are kept in the arrays of a StationRegistry
+
+The station only holds the registry and its position in it. Its number comes
+from its position, and its enabled, weather_aware and on attributes read and
+write the arrays, so the two can't disagree. Watchers are told of changes in
+state as for any Station.
+"""
+    __slots__ = ("_registry", "_index")
+    def __init__(self, registry: "StationRegistry", index: int):
+        """Setup the station at index of the registry"""
+        super().__init__()
+        self._registry = registry
+        self._index = index
+    @property
+    def number(self) -> int:
+        """Number of the station, from its position in the registry"""
+        return self._registry.first_number + self._index
+    @property
+    def enabled(self) -> bool:
+        """Returns if this station is enabled"""
+        return self._registry.enabled[self._index] != 0
+    @enabled.setter
+    def enabled(self, enabled: bool):
+        self._registry.enabled[self._index] = bool(enabled)
+    @property
+    def weather_aware(self) -> bool:
+        """Returns if this station is weather aware"""
+        return self._registry.weather_aware[self._index] != 0
+    @weather_aware.setter
+    def weather_aware(self, weather_aware: bool):
+        self._registry.weather_aware[self._index] = bool(weather_aware)
+    @property
+    def on(self) -> bool: #pylint: disable=invalid-name
+        """Returns if this station is on or not"""
+        return self._registry.on[self._index] != 0
+    @on.setter
+    def on(self, state: bool) -> bool: #pylint: disable=invalid-name
+        flags = self._registry
+        index = self._index
+        state = bool(state) and flags.enabled[index] != 0
+        if state != flags.on[index]:
+            flags.on[index] = state
+            for watcher in self._watchers:
+                watcher(state)
+        return state
+
+class StationRegistry:
+    """The stations of a site, numbered consecutively
+
+The enabled, weather_aware and on flags of the stations are kept in parallel
+bytearrays indexed by the position of the station, and the stations are
+RegisteredStations, views onto them. Looking across all the stations, such as
+finding the ones that are on, then doesn't touch every Station.
+
+The registry can be indexed by station number like the Mapping of stations the
+programs take, and iterates the stations in order like the List the boards take.
+"""
+    def __init__(self,
+                 count: int,
+                 first_number: int = 1,
+                 enabled: Optional[Sequence[bool]] = None,
+                 weather_aware: Optional[Sequence[bool]] = None):
+        """Setup count stations, all enabled and weather aware by default"""
+        if enabled is None:
+            enabled = [True] * count
+        if weather_aware is None:
+            weather_aware = [True] * count
+        if len(enabled) != count or len(weather_aware) != count:
+            raise ValueError(f"Flags must be given for all {count} stations")
+        self.first_number = first_number
+        self.enabled = bytearray(bool(_flag) for _flag in enabled)
+        self.weather_aware = bytearray(bool(_flag) for _flag in weather_aware)
+        self.on = bytearray(count)
+        self._stations: List[RegisteredStation] = [RegisteredStation(self, index)
+                                                   for index in range(count)]
+    def _index(self, number: int) -> int:
+        """Position of the station with the number"""
+        index = number - self.first_number
+        if not 0 <= index < len(self._stations):
+            raise KeyError(number)
+        return index
+    def __getitem__(self, number: int) -> RegisteredStation:
+        """Gets the station with the number"""
+        return self._stations[self._index(number)]
+    def __contains__(self, number: int) -> bool:
+        return 0 <= number - self.first_number < len(self._stations)
+    def __len__(self) -> int:
+        return len(self._stations)
+    def __iter__(self) -> Iterator[RegisteredStation]:
+        return iter(self._stations)
+    @property
+    def stations(self) -> List[RegisteredStation]:
+        """The stations, in order"""
+        return list(self._stations)
+    def set_enabled(self, number: int, enabled: bool):
+        """Enables or disables a station, a disabled station is turned off"""
+        station = self._stations[self._index(number)]
+        station.enabled = enabled
+        if not enabled:
+            station.on = False
+    def set_weather_aware(self, number: int, weather_aware: bool):
+        """Sets if a station is weather aware"""
+        self._stations[self._index(number)].weather_aware = weather_aware
+    def numbers_on(self) -> List[int]:
+        """Numbers of the stations that are on"""
+        numbers: List[int] = []
+        index = self.on.find(1)
+        while index >= 0:
+            numbers.append(self.first_number + index)
+            index = self.on.find(1, index + 1)
+        return numbers
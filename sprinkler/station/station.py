@@ -1,12 +1,50 @@
 """Define a station"""
 
-class Station:
-    """Represents a Station"""
+from typing import Callable, Tuple
+
+class BaseStation:
+    """What every kind of station has: a number, and watchers of its state
+
+A station can be watched by callables, which are told the new state each time
+the state of the station changes. This is how a Board keeps its pattern up to
+date without looking at every station.
+
+Subclasses provide the number, enabled, weather_aware and on attributes, and
+keep them where they like: a Station keeps them in slots of its own, a RegisteredStation
+in the arrays of its StationRegistry. The base holds none of them, so neither
+pays for slots it doesn't use.
+"""
+    __slots__ = ("_watchers",)
+    number: int
+    enabled: bool
+    weather_aware: bool
+    on: bool
+    def __init__(self):
+        """Setup a station, without watchers"""
+        self._watchers: Tuple[Callable[[bool], None], ...] = ()
+    def watch(self, watcher: Callable[[bool], None]):
+        """Adds a callable to be told of changes in state"""
+        self._watchers += (watcher,)
+    def unwatch(self, watcher: Callable[[bool], None]):
+        """Removes a callable added by watch"""
+        self._watchers = tuple(_w for _w in self._watchers if _w != watcher)
+    def __repr__(self) -> str: # pragma: no cover
+        cls_name = self.__class__.__name__
+        return f"{cls_name}({self.number}, {self.enabled}, {self.weather_aware})"
+
+class Station(BaseStation):
+    """Represents a Station
+
+Stations are slotted, as a site can have many of them and reading and writing
+the state of a station is on the hot path of every tick.
+"""
+    __slots__ = ("number", "enabled", "weather_aware", "_on")
     def __init__(self,
                  number: int,
                  enabled: bool,
                  weather_aware: bool):
         """Setup a station"""
+        super().__init__()
         self.number = number
         self.enabled = enabled
         self.weather_aware = weather_aware
@@ -17,11 +55,9 @@ class Station:
         return self._on
     @on.setter
     def on(self, state: bool) -> bool: #pylint: disable=invalid-name
-        if not self.enabled:
-            self._on = False
-            return self._on
-        self._on = state
+        state = bool(state) and self.enabled
+        if state != self._on:
+            self._on = state
+            for watcher in self._watchers:
+                watcher(state)
         return self._on
-    def __repr__(self) -> str: # pragma: no cover
-        cls_name = self.__class__.__name__
-        return f"{cls_name}({self.number}, {self.enabled}, {self.weather_aware})"
@@ -0,0 +1,5 @@
+"""Library for the weather the controller takes into account"""
+
+from sprinkler.weather.provider import WeatherState, WeatherProvider
+from sprinkler.weather.provider import FileWeatherProvider, StaticWeatherProvider
+from sprinkler.weather.cache import CachedWeather
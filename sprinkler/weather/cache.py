@@ -0,0 +1,108 @@
+"""Cache of the weather, refreshed in the background"""
+
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from sprinkler.weather.provider import WeatherProvider, WeatherState
+
+LOGGER = logging.getLogger(__name__)
+
+class CachedWeather:
+    """Last weather looked up from a provider, for the tick path to read
+
+get never blocks: it returns the cached weather, and if that is older than ttl
+seconds it asks for a refresh and still returns it, stale while it is being
+revalidated. Once it is older than max_stale, if set, default is returned
+instead, as the weather it is based on is too old to trust. default is also
+what is returned until the first lookup succeeds.
+
+Refreshing is done by a worker thread, started with start, which looks the
+weather up right away, unless it already has been within ttl, then every ttl
+seconds or when asked. A failed lookup
+is logged and keeps the last weather, and is retried after retry_interval.
+on_change, if set, is called from the worker with the new weather whenever it
+changes.
+"""
+    def __init__(self,
+                 provider: WeatherProvider,
+                 ttl: float = 15 * 60,
+                 max_stale: Optional[float] = None,
+                 default: WeatherState = WeatherState(),
+                 retry_interval: float = 60,
+                 clock: Callable[[], float] = time.monotonic):
+        self.provider = provider
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.default = default
+        self.retry_interval = retry_interval
+        self.clock = clock
+        self.on_change: Optional[Callable[[WeatherState], None]] = None
+        self.failures: int = 0
+        self._state: Optional[WeatherState] = None
+        self._fetched_at: float = float("-inf")
+        self._lock = threading.Lock()
+        self._refresh_wanted = threading.Event()
+        self._stopping = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+    @property
+    def age(self) -> float:
+        """Seconds since the weather was last looked up"""
+        return self.clock() - self._fetched_at
+    def get(self) -> WeatherState:
+        """The cached weather, asking for a refresh if it is stale"""
+        with self._lock:
+            state, fetched_at = self._state, self._fetched_at
+        age = self.clock() - fetched_at
+        if age > self.ttl:
+            self._refresh_wanted.set()
+        if state is None or (self.max_stale is not None and age > self.max_stale):
+            return self.default
+        return state
+    def refresh(self) -> bool:
+        """Looks the weather up now, returns False if that failed"""
+        try:
+            state = self.provider.fetch()
+        except Exception: # pylint: disable=broad-except
+            self.failures += 1
+            LOGGER.warning("Looking up the weather failed", exc_info=True)
+            return False
+        with self._lock:
+            changed = state != self._state
+            self._state = state
+            self._fetched_at = self.clock()
+        if changed and self.on_change is not None:
+            self.on_change(state)
+        return True
+    @property
+    def running(self) -> bool:
+        """True if the worker is refreshing the weather"""
+        return self._worker is not None and self._worker.is_alive()
+    def start(self):
+        """Starts the worker refreshing the weather"""
+        if self.running:
+            return
+        self._stopping.clear()
+        self._worker = threading.Thread(target=self._work, name="weather", daemon=True)
+        self._worker.start()
+    def stop(self, timeout: Optional[float] = None):
+        """Stops the worker, waiting up to timeout seconds for it to finish"""
+        self._stopping.set()
+        self._refresh_wanted.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+            self._worker = None
+    def _work(self):
+        """Refreshes the weather until stopped"""
+        while not self._stopping.is_set():
+            self._refresh_wanted.clear()
+            fresh_for = self.ttl - self.age
+            if fresh_for > 0:
+                self._refresh_wanted.wait(fresh_for)
+                continue
+            if self.refresh():
+                self._refresh_wanted.wait(self.ttl)
+            else:
+                # Stale reads keep asking, so don't retry any sooner
+                self._stopping.wait(min(self.ttl, self.retry_interval))
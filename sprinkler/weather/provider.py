@@ -0,0 +1,48 @@
+"""Weather providers
+
+A WeatherProvider looks up the weather as a WeatherState. Looking it up may be
+slow or fail, so providers are not asked from the tick path, but through a
+CachedWeather.
+"""
+
+import json
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class WeatherState:
+    """What the weather means for the controller"""
+    cold_weather_lockout: bool = False
+    rain_delay: bool = False
+    watering_percentage: float = 100
+
+class WeatherProvider(ABC): # pylint: disable=too-few-public-methods
+    """Looks up the weather"""
+    @abstractmethod
+    def fetch(self) -> WeatherState:
+        """Looks up the weather now, raising if it can't"""
+
+class StaticWeatherProvider(WeatherProvider): # pylint: disable=too-few-public-methods
+    """Provides the same weather every time, a site without a provider"""
+    def __init__(self, state: WeatherState = WeatherState()):
+        self.state = state
+    def fetch(self) -> WeatherState:
+        """Returns the weather it was given"""
+        return self.state
+
+class FileWeatherProvider(WeatherProvider): # pylint: disable=too-few-public-methods
+    """Reads the weather from a JSON file, for testing or a site with a script
+
+The file holds an object with any of the fields of WeatherState, those that are
+missing take their defaults.
+"""
+    def __init__(self, path: str):
+        self.path = path
+    def fetch(self) -> WeatherState:
+        """Reads the file"""
+        with open(self.path, "r", encoding="utf-8") as weather_file:
+            weather = json.load(weather_file)
+        return WeatherState(
+            cold_weather_lockout=bool(weather.get("cold_weather_lockout", False)),
+            rain_delay=bool(weather.get("rain_delay", False)),
+            watering_percentage=float(weather.get("watering_percentage", 100)))
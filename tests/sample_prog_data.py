@@ -136,3 +136,16 @@ SAMPLE_ODD_DST_END_DICT = {
     "respect_rain": True,
     "respect_water_adjustment": True
 }
+
+SAMPLE_CYCLE_SOAK_DICT = {
+    "start_time_of_day": seconds_from_midnight(6, 0),
+    "station_durations": [
+        {"station_id": 1, "duration": 10 * 60},
+        {"station_id": 2, "duration": 10 * 60},
+        {"station_id": 1, "duration": 10 * 60},
+        {"station_id": 2, "duration": 10 * 60},
+    ],
+    "program_type": 2,
+    "respect_rain": True,
+    "respect_water_adjustment": True
+}
@@ -0,0 +1,104 @@
+"""Tests the asyncio controller runtime"""
+
+import asyncio
+import io
+import json
+import os
+import tempfile
+from copy import deepcopy
+from typing import List
+from unittest import IsolatedAsyncioTestCase
+
+import pendulum
+
+from sprinkler.board.virtual import VirtualStreamBoard
+from sprinkler.controller.aio import StaticWeatherController
+from sprinkler.program.dictionary.manager import DictProgramManager
+from sprinkler.program.dictionary.program import LOCAL_TZ
+from sprinkler.scripts.run import build_controller
+from sprinkler.station.station import Station
+from tests.sample_prog_data import SAMPLE_PROGRAM_DICT
+
+class SlowWeatherController(StaticWeatherController):
+    """Controller whose rain delay lookup takes forever"""
+    async def fetch_rain_delay(self) -> bool:
+        """Looks up if we should rain-delay"""
+        await asyncio.sleep(3600)
+        return True # pragma: no cover
+
+class TestAsyncSprinklerController(IsolatedAsyncioTestCase):
+    """Tests the AsyncSprinklerController"""
+    def setUp(self):
+        """Setup the controller"""
+        self.all_st = {_i: Station(_i, True, True) for _i in range(1, 9)}
+        self.stream = io.StringIO()
+        self.board = VirtualStreamBoard(list(self.all_st.values()), self.stream)
+        self.manager = DictProgramManager([deepcopy(SAMPLE_PROGRAM_DICT)],
+                                          self.all_st,
+                                          LOCAL_TZ)
+        # SAMPLE_PROGRAM_DICT runs at 6 am on even days
+        self.start = pendulum.datetime(2022, 4, 2, 6, tz=LOCAL_TZ).float_timestamp
+    async def run_ticks(self, controller: StaticWeatherController, count: int) -> List[float]:
+        """Runs the controller with a fake clock for count ticks"""
+        ticks: List[float] = []
+        on_tick = controller.on_tick
+        def record_tick(now: float):
+            ticks.append(now)
+            on_tick(now)
+            if len(ticks) == count:
+                controller.stop()
+        controller.on_tick = record_tick
+        controller.tick_interval = 0
+        await controller.run_async(clock=lambda: self.start, event_driven=False)
+        return ticks
+    async def test_slow_weather_does_not_block_ticks(self):
+        """Tests a slow weather lookup only holds the ticks up to weather_timeout"""
+        controller = SlowWeatherController(self.board, self.manager)
+        controller.weather_timeout = 0.1
+        with self.assertLogs("sprinkler.controller.aio.controller", "WARNING") as logs:
+            ticks = await asyncio.wait_for(self.run_ticks(controller, 3), 5)
+        self.assertEqual(3, len(ticks))
+        self.assertFalse(controller.rain_delay())
+        self.assertIn("rain delay", logs.output[0])
+    async def test_weather_before_first_tick(self):
+        """Tests the first tick already knows about the rain"""
+        controller = StaticWeatherController(self.board, self.manager, rain=True)
+        await self.run_ticks(controller, 1)
+        self.assertNotIn("[1, 0, 0, 0, 0, 0, 0, 0]", self.stream.getvalue().splitlines())
+    async def test_failed_weather_logged(self):
+        """Tests a failed lookup is logged and keeps the last known value"""
+        controller = StaticWeatherController(self.board, self.manager, watering_percentage=50)
+        await controller.refresh_weather()
+        async def failing_lookup() -> float:
+            raise ValueError("no weather")
+        controller.fetch_watering_percentage = failing_lookup
+        with self.assertLogs("sprinkler.controller.aio.controller", "WARNING") as logs:
+            await controller.refresh_weather()
+        self.assertIn("watering percentage", logs.output[0])
+        controller.update_watering_percentage()
+        self.assertEqual(50, controller.water_adjust_percent)
+    async def test_refresh_weather(self):
+        """Tests the weather lookups are cached for the ticks"""
+        controller = StaticWeatherController(self.board, self.manager,
+                                             rain=True, watering_percentage=50)
+        await controller.refresh_weather()
+        controller.update_watering_percentage()
+        self.assertTrue(controller.rain_delay())
+        self.assertFalse(controller.cold_weather_lockout())
+        self.assertEqual(50, controller.water_adjust_percent)
+    async def test_run_async_stops_stations(self):
+        """Tests the program is run, and the stations stopped on the way out"""
+        controller = StaticWeatherController(self.board, self.manager)
+        await self.run_ticks(controller, 1)
+        lines = self.stream.getvalue().splitlines()
+        self.assertEqual("[1, 0, 0, 0, 0, 0, 0, 0]", lines[0])
+        self.assertEqual("[0, 0, 0, 0, 0, 0, 0, 0]", lines[-1])
+    async def test_build_controller(self):
+        """Tests the entry point builds a controller on a virtual board"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "programs.json")
+            with open(path, "w", encoding="utf-8") as programs:
+                json.dump([SAMPLE_PROGRAM_DICT], programs)
+            controller = build_controller("virtual", path, LOCAL_TZ, 8, stream=self.stream)
+        self.assertEqual(8, len(controller.board.stations))
+        self.assertEqual(1, len(controller.manager.programs))
@@ -0,0 +1,47 @@
+"""Tests the run interval index"""
+
+from unittest import TestCase
+
+from sprinkler.program.conflicts import Conflict, Run, RunIndex
+
+class TestRunIndex(TestCase):
+    """Tests RunIndex"""
+    def setUp(self):
+        self.runs = [Run(100, 200, "a"), Run(150, 160, "b"), Run(300, 400, "c"),
+                     Run(390, 500, "d"), Run(0, 50, "e")]
+        self.index = RunIndex(self.runs)
+    def test_sorted(self):
+        """Tests the runs are kept in order of start"""
+        self.assertEqual([_r.key for _r in self.index], ["e", "a", "b", "c", "d"])
+        self.index.add(Run(150, 155, "f"))
+        self.assertEqual([_r.key for _r in self.index], ["e", "a", "b", "f", "c", "d"])
+        self.assertEqual(len(self.index), 6)
+    def test_overlapping(self):
+        """Tests finding the runs overlapping an interval"""
+        expected = {
+            (0, 10): ["e"],
+            (50, 100): [],
+            (155, 156): ["a", "b"],
+            (199, 301): ["a", "c"],
+            (500, 600): [],
+        }
+        for (start, end), keys in expected.items():
+            with self.subTest(start=start, end=end):
+                self.assertEqual([_r.key for _r in self.index.overlapping(start, end)], keys)
+    def test_long_run(self):
+        """Tests a long run added later is still found"""
+        self.index.add(Run(-1000, 1000, "long"))
+        self.assertIn("long", [_r.key for _r in self.index.overlapping(600, 700)])
+    def test_conflicts(self):
+        """Tests finding every overlapping pair"""
+        self.assertEqual(self.index.conflicts(),
+                         [Conflict(self.runs[0], self.runs[1], 150, 160),
+                          Conflict(self.runs[2], self.runs[3], 390, 400)])
+    def test_conflicts_with(self):
+        """Tests conflicts with a run that isn't indexed"""
+        run = Run(180, 310, "new")
+        self.assertEqual(self.index.conflicts_with(run),
+                         [Conflict(self.runs[0], run, 180, 200),
+                          Conflict(run, self.runs[2], 300, 310)])
+        self.assertEqual(self.index.conflicts_with(self.runs[0]),
+                         [Conflict(self.runs[0], self.runs[1], 150, 160)])
@@ -0,0 +1,234 @@
+"""Tests the SprinklerController"""
+
+from copy import deepcopy
+from typing import List
+from unittest import TestCase
+
+import pendulum
+
+from sprinkler.board.board import Board
+from sprinkler.controller.abc import SprinklerController
+from sprinkler.controller.queue import QueuePolicy
+from sprinkler.program.dictionary.helpers import turn_dict_into_dict_program
+from sprinkler.program.dictionary.manager import DictProgramManager
+from sprinkler.program.dictionary.program import LOCAL_TZ, DictSprinklerProgram
+from sprinkler.program.manual import ManualProgram
+from sprinkler.station.station import Station
+from tests.sample_prog_data import SAMPLE_PROGRAM_DICT, STATION_1_RUN, SAMPLE_RUN_TIME
+
+class RecordingBoard(Board):
+    """Board that records the patterns sent to it"""
+    def __init__(self, stations: List[Station]):
+        super().__init__()
+        self.stations = stations
+        self.patterns: List[List[int]] = []
+    def send_pattern(self):
+        """Records the pattern"""
+        self.patterns.append(self.get_bit_pattern())
+
+class FairWeatherController(SprinklerController):
+    """Controller that never has weather to worry about"""
+    def __init__(self, board: Board, manager: DictProgramManager):
+        super().__init__()
+        self.board = board
+        self.manager = manager
+        self.lockout = False
+        self.raining = False
+    def cold_weather_lockout(self) -> bool:
+        """Returns true if there is a lockout for cold weather"""
+        return self.lockout
+    def rain_delay(self) -> bool:
+        """Returns true if we should rain-delay"""
+        return self.raining
+    def update_watering_percentage(self):
+        """Updates the watering percentage"""
+
+class TestSprinklerController(TestCase):
+    """Tests the SprinklerController"""
+    def setUp(self):
+        """Setup the controller"""
+        self.all_st = {_i: Station(_i, True, True) for _i in range(1, 9)}
+        self.board = RecordingBoard(list(self.all_st.values()))
+        manager = DictProgramManager([deepcopy(SAMPLE_PROGRAM_DICT)],
+                                     self.all_st,
+                                     LOCAL_TZ)
+        self.controller = FairWeatherController(self.board, manager)
+        # SAMPLE_PROGRAM_DICT runs at 6 am on even days
+        self.start = pendulum.datetime(2022, 4, 2, 6, tz=LOCAL_TZ).float_timestamp
+    def test_on_tick_runs_program(self):
+        """Tests on_tick picks up and services the program"""
+        self.controller.on_tick(self.start)
+        self.assertIsNotNone(self.controller.current_program)
+        self.assertEqual([1, 0, 0, 0, 0, 0, 0, 0], self.board.patterns[-1])
+        self.controller.on_tick(self.start + STATION_1_RUN)
+        self.assertEqual([0, 1, 0, 0, 0, 0, 0, 0], self.board.patterns[-1])
+        self.controller.on_tick(self.start + SAMPLE_RUN_TIME + 1)
+        self.assertIsNone(self.controller.current_program)
+    def test_rain_delay(self):
+        """Tests the rain delay stops the stations"""
+        self.controller.on_tick(self.start)
+        self.controller.raining = True
+        self.controller.on_tick(self.start + 1)
+        self.assertEqual([0] * 8, self.board.get_bit_pattern())
+        self.controller.raining = False
+        self.controller.on_tick(self.start + 2)
+        self.assertEqual([1, 0, 0, 0, 0, 0, 0, 0], self.board.patterns[-1])
+    def test_rain_delay_retires_program(self):
+        """Tests a program held off by the rain is retired once past its end"""
+        controller = self.controller
+        controller.max_sleep = float("inf")
+        controller.on_tick(self.start)
+        controller.raining = True
+        controller.on_tick(self.start + 1)
+        end = self.start + SAMPLE_RUN_TIME
+        self.assertEqual(end + 1, controller.next_wakeup(end))
+        controller.on_tick(end + 1)
+        self.assertIsNone(controller.current_program)
+        self.assertLess(controller.next_wakeup(end + 1), float("inf"))
+    def test_watering_change_mid_run(self):
+        """Tests a change of the watering percentage applies to the rest of the run"""
+        controller = self.controller
+        controller.max_sleep = 24 * 3600
+        controller.on_tick(self.start)
+        halfway = self.start + STATION_1_RUN / 2
+        controller.water_adjust_percent = 50
+        controller.on_tick(halfway)
+        program = controller.current_program
+        self.assertEqual(halfway + STATION_1_RUN / 4, controller.next_wakeup(halfway))
+        self.assertEqual(halfway + (SAMPLE_RUN_TIME - STATION_1_RUN / 2) / 2,
+                         program.program_end_time)
+        controller.on_tick(halfway + STATION_1_RUN / 4)
+        self.assertEqual([0, 1, 0, 0, 0, 0, 0, 0], self.board.patterns[-1])
+    def test_next_wakeup(self):
+        """Tests next_wakeup follows the manager and the program transitions"""
+        controller = self.controller
+        controller.max_sleep = 24 * 3600
+        with self.subTest(state="idle"):
+            self.assertEqual(self.start, controller.next_wakeup(self.start - 3600))
+        controller.on_tick(self.start)
+        with self.subTest(state="running"):
+            self.assertEqual(self.start + STATION_1_RUN, controller.next_wakeup(self.start))
+        end = self.start + SAMPLE_RUN_TIME
+        with self.subTest(state="ending"):
+            self.assertEqual(end + 1, controller.next_wakeup(end))
+        controller.max_sleep = 60
+        with self.subTest(state="max_sleep"):
+            self.assertEqual(self.start + 60, controller.next_wakeup(self.start))
+    def test_run_event_driven(self):
+        """Tests the mainloop only ticks on transitions"""
+        controller = self.controller
+        controller.max_sleep = 24 * 3600
+        clock = [self.start - 10]
+        ticks: List[float] = []
+        on_tick = controller.on_tick
+        def record_tick(now: float):
+            ticks.append(now)
+            on_tick(now)
+            if len(ticks) == 9:
+                controller.stop()
+        def sleep(timeout: float) -> bool:
+            clock[0] += timeout
+            return False
+        controller.on_tick = record_tick
+        controller._wake_event.wait = sleep # pylint: disable=protected-access
+        controller.run(clock=lambda: clock[0])
+        offsets = [int(_tick - self.start) for _tick in ticks]
+        # One tick per station, one to notice it is over, then the next midnight
+        self.assertEqual([-10, 0, 3300, 5700, 8400, 10200, 13200, 13201, 18 * 3600], offsets)
+
+class TestRunQueue(TestCase):
+    """Tests programs going through the controller's run queue"""
+    def setUp(self):
+        """Setup a controller with a short program due an hour into another"""
+        self.all_st = {_i: Station(_i, True, True) for _i in range(1, 9)}
+        self.board = RecordingBoard(list(self.all_st.values()))
+        late = deepcopy(SAMPLE_PROGRAM_DICT)
+        late["start_time_of_day"] += 3600
+        late["station_durations"] = [{"station_id": 8, "duration": 600}]
+        self.programs = [deepcopy(SAMPLE_PROGRAM_DICT), late]
+        manager = DictProgramManager(deepcopy(self.programs), self.all_st, LOCAL_TZ)
+        self.controller = FairWeatherController(self.board, manager)
+        self.controller.max_sleep = 24 * 3600
+        self.start = pendulum.datetime(2022, 4, 2, 6, tz=LOCAL_TZ).float_timestamp
+        self.end = self.start + SAMPLE_RUN_TIME
+    def run_through(self, until: float) -> List[float]:
+        """Ticks the controller on its wakeups until until, returning the ticks"""
+        now = self.start - 1
+        ticks = []
+        while now < until:
+            self.controller.on_tick(now)
+            ticks.append(now)
+            wakeup = self.controller.next_wakeup(now)
+            now = wakeup if wakeup > now else now + 1
+        return ticks
+    def test_skip(self):
+        """Tests a program due while another runs is dropped by default"""
+        self.run_through(self.end + 3600)
+        self.assertFalse(any(_p[7] for _p in self.board.patterns))
+    def test_defer(self):
+        """Tests a program due while another runs starts as soon as it is over"""
+        self.controller.queue_policy = QueuePolicy.DEFER
+        ticks = self.run_through(self.end + 3600)
+        self.assertIn(self.start + 3600, ticks)
+        started = [_t for _t, _p in zip(ticks, self.board.patterns) if _p[7]]
+        # Back to back, started on the tick noticing the first program is over
+        self.assertEqual(self.end + 1, started[0])
+        self.assertEqual([0, 0, 0, 0, 0, 0, 0, 1], self.board.patterns[ticks.index(self.end + 1)])
+        self.assertEqual([0] * 8, self.board.patterns[ticks.index(self.end + 601)])
+        self.assertEqual(0, len(self.controller.run_queue))
+    def test_merge(self):
+        """Tests a program running stations that are already going to run is dropped"""
+        self.controller.queue_policy = QueuePolicy.MERGE
+        self.controller.manager.update_programs([], [deepcopy(self.programs[1])])
+        repeat = deepcopy(SAMPLE_PROGRAM_DICT)
+        repeat["start_time_of_day"] += 3600
+        self.controller.manager.update_programs([repeat], [])
+        self.controller.on_tick(self.start)
+        self.controller.on_tick(self.start + 3600)
+        self.assertEqual(0, len(self.controller.run_queue))
+        # Station 8 isn't going to be watered otherwise
+        self.controller.manager.update_programs(deepcopy(self.programs[1:]), [repeat])
+        self.controller.on_tick(self.start + 3601)
+        self.assertEqual(1, len(self.controller.run_queue))
+    def test_due_program_queued_once(self):
+        """Tests polling a due program within the jitter only queues it once"""
+        self.controller.queue_policy = QueuePolicy.DEFER
+        self.controller.on_tick(self.start)
+        for offset in range(3):
+            self.controller.on_tick(self.start + 3600 + offset)
+        self.assertEqual(1, len(self.controller.run_queue))
+    def test_manual_runs_first(self):
+        """Tests a manual station run goes ahead of an ad-hoc program"""
+        controller = self.controller
+        controller.queue_policy = QueuePolicy.DEFER
+        controller.on_tick(self.start)
+        adhoc = DictSprinklerProgram(self.start, self.all_st,
+                                     turn_dict_into_dict_program(deepcopy(self.programs[1])))
+        self.assertTrue(controller.run_program(adhoc, now=self.start + 1))
+        self.assertTrue(controller.run_station(self.all_st[3], 60, now=self.start + 2))
+        self.assertIsInstance(controller.run_queue.programs[0], ManualProgram)
+        controller.on_tick(self.end + 1)
+        self.assertEqual([0, 0, 1, 0, 0, 0, 0, 0], self.board.patterns[-1])
+        self.assertEqual(self.end + 1, controller.current_program.start_time)
+        self.assertEqual(self.end + 62, controller.next_wakeup(self.end + 61))
+        controller.on_tick(self.end + 62)
+        self.assertEqual([0, 0, 0, 0, 0, 0, 0, 1], self.board.patterns[-1])
+    def test_skip_queues_manual_runs(self):
+        """Tests manual and ad-hoc runs asked for while a program runs are kept under SKIP"""
+        controller = self.controller
+        controller.on_tick(self.start)
+        self.assertTrue(controller.run_station(self.all_st[1], 60, now=self.start + 1))
+        adhoc = DictSprinklerProgram(self.start, self.all_st,
+                                     turn_dict_into_dict_program(deepcopy(self.programs[1])))
+        self.assertTrue(controller.run_program(adhoc, now=self.start + 2))
+        self.assertEqual(2, len(controller.run_queue))
+        controller.on_tick(self.end + 1)
+        self.assertEqual([1, 0, 0, 0, 0, 0, 0, 0], self.board.patterns[-1])
+        controller.on_tick(self.end + 62)
+        self.assertEqual([0, 0, 0, 0, 0, 0, 0, 1], self.board.patterns[-1])
+    def test_lockout_clears_queue(self):
+        """Tests the cold weather lockout drops queued programs"""
+        self.controller.run_station(self.all_st[3], 60, now=self.start)
+        self.controller.lockout = True
+        self.controller.on_tick(self.start)
+        self.assertEqual(0, len(self.controller.run_queue))
@@ -0,0 +1,51 @@
+"""Tests the evaluation of the day plans of a fleet of sites"""
+
+from copy import deepcopy
+from unittest import TestCase
+
+import pendulum
+
+from sprinkler.program.fleet import PlannedRun, Site, evaluate_fleet, plan_site
+from tests.sample_prog_data import SAMPLE_BAD_PROGRAM_DICT, SAMPLE_ODD_DAY
+from tests.sample_prog_data import SAMPLE_PROGRAM_DICT, SAMPLE_RUN_TIME
+
+TIMEZONES = ["America/Los_Angeles", "Europe/London", "Asia/Tokyo", "Australia/Sydney"]
+
+class TestFleet(TestCase):
+    """Tests plan_site and evaluate_fleet"""
+    def setUp(self):
+        programs = [deepcopy(SAMPLE_PROGRAM_DICT), deepcopy(SAMPLE_ODD_DAY)]
+        self.sites = [Site(_i, programs, TIMEZONES[_i % len(TIMEZONES)]) for _i in range(20)]
+        self.now = pendulum.datetime(2022, 4, 2, 12, tz="UTC").float_timestamp
+    def test_plan_site(self):
+        """Tests the plan of a site is in its local day"""
+        plan = plan_site(Site("home", [deepcopy(SAMPLE_PROGRAM_DICT)], "America/Los_Angeles"),
+                         self.now)
+        start = pendulum.datetime(2022, 4, 2, 6, tz="America/Los_Angeles").float_timestamp
+        self.assertEqual("home", plan.site_id)
+        self.assertEqual(pendulum.date(2022, 4, 2), plan.local_date)
+        self.assertEqual([PlannedRun(start, start + SAMPLE_RUN_TIME, "2_21600")], plan.runs)
+        self.assertIsNone(plan.error)
+    def test_invalid_site(self):
+        """Tests a site with invalid programs gets an error rather than a plan"""
+        plan = plan_site(Site("bad", [deepcopy(SAMPLE_BAD_PROGRAM_DICT)], "UTC"), self.now)
+        self.assertEqual([], plan.runs)
+        self.assertIn("start_time_of_day", plan.error)
+    def test_invalid_timezone(self):
+        """Tests a site with an unknown timezone gets an error, and the rest are planned"""
+        sites = self.sites[:5] + [Site("nowhere", self.sites[0].programs, "Nowhere/Atlantis")]
+        sites += self.sites[5:10]
+        plans = {_plan.site_id: _plan
+                 for _plan in evaluate_fleet(sites, self.now, max_workers=2, chunksize=3)}
+        self.assertEqual(len(sites), len(plans))
+        self.assertEqual([], plans["nowhere"].runs)
+        self.assertIsNone(plans["nowhere"].local_date)
+        self.assertIn("Nowhere/Atlantis", plans["nowhere"].error)
+        self.assertTrue(all(_plan.error is None
+                            for _id, _plan in plans.items() if _id != "nowhere"))
+    def test_evaluate_fleet(self):
+        """Tests the pool gives the same plans as planning in process"""
+        expected = {_site.site_id: plan_site(_site, self.now) for _site in self.sites}
+        plans = list(evaluate_fleet(iter(self.sites), self.now, max_workers=2, chunksize=3))
+        self.assertEqual(expected, {_plan.site_id: _plan for _plan in plans})
+        self.assertEqual(len(self.sites), len(plans))
@@ -0,0 +1,45 @@
+"""Guards how long importing the sprinkler takes"""
+
+import subprocess
+import sys
+from typing import Mapping, Set
+from unittest import TestCase
+
+# Microseconds importing the entry point may take, with room for slow CI; the
+# modules below are what made it take seconds on a Pi Zero
+IMPORT_BUDGET_US = 1_000_000
+LAZY_MODULES = {"marshmallow", "pendulum", "pigpio", "mockpigio", "numpy", "sqlite3"}
+
+def import_times(module: str) -> Mapping[str, int]:
+    """Cumulative microseconds importing each module took, from python -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+def top_level(times: Mapping[str, int]) -> Set[str]:
+    """Top level packages that were imported"""
+    return {_name.split(".")[0] for _name in times}
+
+class TestImportTime(TestCase):
+    """Tests the heavy dependencies are only imported when used"""
+    def test_entry_point(self):
+        """Tests the entry point imports within budget, without the heavy modules"""
+        times = import_times("sprinkler.scripts.run")
+        self.assertSetEqual(set(), LAZY_MODULES & top_level(times))
+        self.assertLess(times["sprinkler.scripts.run"], IMPORT_BUDGET_US)
+    def test_board_package(self):
+        """Tests importing the board package doesn't import the boards"""
+        times = import_times("sprinkler.board")
+        self.assertNotIn("sprinkler.board.ospi", times)
+        self.assertNotIn("sprinkler.board.virtual", times)
+    def test_program_package(self):
+        """Tests importing the programs doesn't import marshmallow"""
+        times = import_times("sprinkler.program.dictionary.manager")
+        self.assertSetEqual(set(), LAZY_MODULES & top_level(times))
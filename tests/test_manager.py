@@ -161,3 +161,130 @@ class TestDictProgramManager(TestCase):
             msg = f"Wrong for ts: {repr(date_t)}"
             with self.subTest(prog=prog, result=result, msg=msg):
                 self.assertEqual(prog, result)
+    def test_get_program_jitter(self):
+        """Test DictProgramManager.get_program only matches within the jitter"""
+        start = pendulum.datetime(2022, 4, 2, 6, tz = LOCAL_TZ).float_timestamp
+        mgr = self.all_progs_mgr()
+        expected = {
+            start - 1: False,
+            start: True,
+            start + mgr.jitter: True,
+            start + mgr.jitter + 1: False,
+        }
+        for now, found in expected.items():
+            with self.subTest(now=now, found=found):
+                self.assertEqual(found, mgr.get_program(now) is not None)
+    def test_get_program_across_days(self):
+        """Test the start time index follows the local day"""
+        mgr = self.all_progs_mgr()
+        for day in range(1, 8):
+            date_t = pendulum.datetime(2022, 4, day, 6, tz = LOCAL_TZ)
+            # Odd programs come before the DOW program, so they win on odd days
+            expected = SAMPLE_PROGRAM_DICT if date_t.day % 2 == 0 else SAMPLE_ODD_DAY
+            prog = DictSprinklerProgram.factory(turn_dict_into_dict_program(expected),
+                                                self.all_st,
+                                                now=date_t.float_timestamp)
+            with self.subTest(date_t=date_t):
+                self.assertEqual(prog, mgr.get_program(date_t.float_timestamp))
+    def test_update_programs_rebuilds_index(self):
+        """Test DictProgramManager.update_programs invalidates the index"""
+        date_t = pendulum.datetime(2022, 4, 4, 6, tz = LOCAL_TZ)
+        mgr = self.dow_only_mgr()
+        self.assertIsNotNone(mgr.get_program(date_t.float_timestamp))
+        mgr.update_programs([], deepcopy(self.dow_programs))
+        self.assertIsNone(mgr.get_program(date_t.float_timestamp))
+        mgr.update_programs(deepcopy(self.dow_programs), [])
+        self.assertIsNotNone(mgr.get_program(date_t.float_timestamp))
+    def test_duplicate_starts(self):
+        """Test even/odd programs sharing a start are tracked as they are added"""
+        mgr = self.all_progs_mgr()
+        expected = turn_dicts_to_programs(self.multi_even[1:] + self.multi_odd[1:])
+        self.assertListEqual(expected, list(mgr.duplicate_starts))
+        mgr.update_programs([], deepcopy(self.multi_odd))
+        self.assertEqual(DUPLICATES - 1, len(mgr.duplicate_starts))
+    def test_update_programs_keeps_order(self):
+        """Test update_programs removes the first equal program and appends"""
+        mgr = self.all_progs_mgr()
+        mgr.update_programs([deepcopy(SAMPLE_PROGRAM_DICT)], [deepcopy(SAMPLE_PROGRAM_DICT)])
+        expected = turn_dicts_to_programs(self.all_programs[1:] + [SAMPLE_PROGRAM_DICT])
+        self.assertSequenceEqual(expected, mgr.programs)
+    def test_update_programs_unknown_delete(self):
+        """Test deleting a program that isn't managed raises a ValueError"""
+        mgr = self.dow_only_mgr()
+        with self.assertRaises(ValueError):
+            mgr.update_programs([], [deepcopy(SAMPLE_PROGRAM_DICT)])
+    def test_day_plan(self):
+        """Tests the day plan holds the programs get_program hands out"""
+        late = deepcopy(SAMPLE_PROGRAM_DICT)
+        late["start_time_of_day"] += 4 * 3600
+        self.all_programs.append(late)
+        mgr = self.all_progs_mgr()
+        now = pendulum.datetime(2022, 4, 2, 12, tz=LOCAL_TZ).float_timestamp
+        plan = mgr.day_plan(now)
+        self.assertEqual([pendulum.datetime(2022, 4, 2, 6, tz=LOCAL_TZ).float_timestamp,
+                          pendulum.datetime(2022, 4, 2, 10, tz=LOCAL_TZ).float_timestamp],
+                         [_run.start for _run in plan])
+        for run in plan:
+            with self.subTest(run=run):
+                program = mgr.get_program(run.start)
+                self.assertEqual(DictSprinklerProgram(run.start, self.all_st, run.key), program)
+                self.assertEqual(program.program_end_time, run.end)
+    def test_find_conflicts(self):
+        """Test overlapping runs of different programs are found"""
+        now = pendulum.datetime(2022, 4, 4, tz = LOCAL_TZ).float_timestamp
+        mgr = DictProgramManager([deepcopy(SAMPLE_PROGRAM_DICT), deepcopy(SAMPLE_ODD_DAY)],
+                                 self.all_st,
+                                 LOCAL_TZ)
+        self.assertListEqual([], mgr.find_conflicts(now))
+        mgr = self.all_progs_mgr()
+        conflicts = mgr.find_conflicts(now)
+        self.assertTrue(conflicts)
+        for conflict in conflicts:
+            with self.subTest(conflict=conflict):
+                self.assertLessEqual(conflict.first.start, conflict.second.start)
+                self.assertLess(conflict.second.start, conflict.first.end)
+        with self.assertLogs("sprinkler.program.dictionary.manager", "WARNING") as logs:
+            self.assertEqual(conflicts, mgr.report_conflicts(now))
+        self.assertEqual(len(conflicts), len(logs.output))
+    def test_conflicts_with(self):
+        """Test checking a program against the runs of the managed programs"""
+        now = pendulum.datetime(2022, 4, 4, tz = LOCAL_TZ).float_timestamp
+        mgr = DictProgramManager([deepcopy(SAMPLE_PROGRAM_DICT)], self.all_st, LOCAL_TZ)
+        late = deepcopy(SAMPLE_DOW_DAY)
+        late["start_time_of_day"] += 3600
+        late = turn_dict_into_dict_program(late)
+        conflicts = mgr.conflicts_with(late, now)
+        # Mon, Wed and Fri that are even days
+        starts = [_c.second.start for _c in conflicts]
+        expected = [pendulum.datetime(2022, 4, _d, 7, tz = LOCAL_TZ).float_timestamp
+                    for _d in (4, 6, 8)]
+        self.assertListEqual(expected, starts[:3])
+        self.assertTrue(all(_c.second.key is late for _c in conflicts))
+        mgr.add_program(late)
+        self.assertEqual(len(conflicts), len(mgr.find_conflicts(now)))
+    def test_deferred_program(self):
+        """Test a program due while another runs is handed out late with max_defer"""
+        late = deepcopy(SAMPLE_DOW_DAY)
+        late["start_time_of_day"] += 3600
+        start = pendulum.datetime(2022, 4, 4, 6, tz = LOCAL_TZ).float_timestamp
+        first_end = start + sum(_s["duration"] for _s in SAMPLE_PROGRAM_DICT["station_durations"])
+        dropping = DictProgramManager([deepcopy(SAMPLE_PROGRAM_DICT), deepcopy(late)],
+                                      self.all_st,
+                                      LOCAL_TZ)
+        deferring = DictProgramManager([deepcopy(SAMPLE_PROGRAM_DICT), deepcopy(late)],
+                                       self.all_st,
+                                       LOCAL_TZ,
+                                       max_defer=4 * 3600)
+        for mgr in (dropping, deferring):
+            self.assertEqual(start, mgr.get_program(start).start_time)
+        self.assertIsNone(dropping.get_program(first_end))
+        self.assertEqual(first_end, deferring.next_program_start(first_end))
+        program = deferring.get_program(first_end)
+        self.assertEqual(first_end, program.start_time)
+        self.assertEqual(late["days_of_the_week"], program.days_of_the_week)
+        self.assertIsNone(deferring.get_program(first_end + 1))
+        self.assertLess(first_end + 1, deferring.next_program_start(first_end + 1))
+        # Too late to run
+        deferring = DictProgramManager.from_programs(deferring.programs, self.all_st, LOCAL_TZ,
+                                                     max_defer=60)
+        self.assertIsNone(deferring.get_program(first_end))
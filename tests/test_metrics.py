@@ -0,0 +1,100 @@
+"""Tests the metrics sinks and the instrumentation of the tick path"""
+
+import os
+import tempfile
+from copy import deepcopy
+from unittest import TestCase
+
+import pendulum
+
+import mockpigio
+from sprinkler.board import OSPIBoard
+from sprinkler.metrics import Histogram, LogSink, MemorySink, PrometheusTextFileSink
+from sprinkler.program.dictionary.manager import DictProgramManager
+from sprinkler.program.dictionary.program import LOCAL_TZ
+from sprinkler.station.station import Station
+from tests.sample_prog_data import SAMPLE_PROGRAM_DICT
+from tests.test_controller import FairWeatherController
+
+class TestSinks(TestCase):
+    """Tests the sinks"""
+    def test_histogram(self):
+        """Tests Histogram puts observations in the right buckets"""
+        histogram = Histogram([1, 2])
+        for value in (0.5, 1, 1.5, 3):
+            histogram.observe(value)
+        self.assertListEqual([2, 1, 1], histogram.counts)
+        self.assertEqual(4, histogram.count)
+        self.assertEqual(1.5, histogram.mean)
+        self.assertEqual(3, histogram.maximum)
+    def test_memory_sink(self):
+        """Tests MemorySink keeps histograms and counters"""
+        sink = MemorySink()
+        sink.observe("tick_seconds", 0.001)
+        sink.observe("tick_seconds", 0.002)
+        sink.increment("pushes")
+        sink.increment("pushes", 2)
+        self.assertEqual(2, sink.histograms["tick_seconds"].count)
+        self.assertDictEqual({"pushes": 3}, sink.counters)
+    def test_log_sink(self):
+        """Tests LogSink logs on flush"""
+        sink = LogSink()
+        sink.observe("tick_seconds", 0.001)
+        sink.increment("pushes")
+        with self.assertLogs("sprinkler.metrics") as logs:
+            sink.flush()
+        self.assertEqual(2, len(logs.output))
+    def test_prometheus_sink(self):
+        """Tests PrometheusTextFileSink writes the text format"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "sprinkler.prom")
+            sink = PrometheusTextFileSink(path, buckets=[0.01, 0.1])
+            sink.observe("tick_seconds", 0.05)
+            sink.increment("pushes")
+            sink.flush()
+            with open(path, "r", encoding="utf-8") as prom_file:
+                lines = prom_file.read().splitlines()
+        expected = [
+            "# TYPE sprinkler_tick_seconds histogram",
+            'sprinkler_tick_seconds_bucket{le="0.01"} 0',
+            'sprinkler_tick_seconds_bucket{le="0.1"} 1',
+            'sprinkler_tick_seconds_bucket{le="+Inf"} 1',
+            "sprinkler_tick_seconds_sum 0.05",
+            "sprinkler_tick_seconds_count 1",
+            "# TYPE sprinkler_pushes counter",
+            "sprinkler_pushes 1",
+        ]
+        self.assertListEqual(expected, lines)
+
+class TestTickInstrumentation(TestCase):
+    """Tests the instrumentation of the controller and board"""
+    def setUp(self):
+        """Setup a controller on an OSPIBoard"""
+        self.all_st = {_i: Station(_i, True, True) for _i in range(1, 9)}
+        board = OSPIBoard(mockpigio.pi(), list(self.all_st.values()))
+        manager = DictProgramManager([deepcopy(SAMPLE_PROGRAM_DICT)], self.all_st, LOCAL_TZ)
+        self.controller = FairWeatherController(board, manager)
+        self.sink = MemorySink()
+        self.controller.metrics = self.sink
+        board.metrics = self.sink
+        self.start = pendulum.datetime(2022, 4, 2, 6, tz=LOCAL_TZ).float_timestamp
+    def test_tick_phases(self):
+        """Tests the ticks and their phases are timed"""
+        for offset in range(3):
+            self.controller.on_tick(self.start + offset)
+        histograms = self.sink.histograms
+        self.assertEqual(3, histograms["tick_seconds"].count)
+        self.assertEqual(1, histograms["tick_get_next_program_seconds"].count)
+        self.assertEqual(3, histograms["tick_update_program_seconds"].count)
+        self.assertEqual(3, histograms["tick_send_pattern_seconds"].count)
+    def test_board_counters(self):
+        """Tests pushed and suppressed patterns are counted"""
+        for offset in range(3):
+            self.controller.on_tick(self.start + offset)
+        self.assertEqual(1, self.sink.counters["board_patterns_pushed"])
+        self.assertEqual(2, self.sink.counters["board_patterns_suppressed"])
+    def test_tick_overruns(self):
+        """Tests ticks longer than the tick interval are counted"""
+        self.controller.tick_interval = 0
+        self.controller.on_tick(self.start)
+        self.assertEqual(1, self.sink.counters["tick_overruns"])
@@ -0,0 +1,65 @@
+"""Tests the cost model, write log and stats of mockpigio"""
+
+from unittest import TestCase
+
+import mockpigio
+from sprinkler.board.ospi import OSPIBoard
+from sprinkler.station import Station
+
+class TestMockPi(TestCase):
+    """Tests mockpigio.pi"""
+    def test_write_log_is_bounded(self):
+        """Tests only the last log_size writes are kept, but all are counted"""
+        gpio = mockpigio.pi(log_size=4)
+        for value in range(10):
+            gpio.write(4, value & 1)
+        self.assertEqual(4, len(gpio.write_log))
+        self.assertEqual(10, gpio.stats.writes[4])
+        self.assertEqual(10, gpio.stats.calls["write"])
+        self.assertEqual(1, gpio.read(4))
+    def test_write_log_keeps_every_write(self):
+        """Tests every write is kept by default, so the log can be sliced"""
+        gpio = mockpigio.pi()
+        for value in range(10):
+            gpio.write(4, value & 1)
+        self.assertEqual(10, len(gpio.write_log))
+        self.assertEqual([0, 1], [_e.value for _e in gpio.write_log[-2:]])
+    def test_bank_writes(self):
+        """Tests a bank write changes each of its pins in one call"""
+        gpio = mockpigio.pi(cost_model=mockpigio.CostModel(call=1e-4, bank_write=1e-5))
+        gpio.set_bank_1(0b1010)
+        gpio.clear_bank_1(0b0010)
+        self.assertEqual(0b1000, gpio.read_bank_1())
+        self.assertEqual(3, gpio.stats.total_writes)
+        self.assertEqual(3, gpio.stats.total_calls)
+        self.assertAlmostEqual(3e-4 + 2e-5, gpio.stats.seconds)
+    def test_wave_cost(self):
+        """Tests a waveform costs its calls and the delays of its pulses"""
+        gpio = mockpigio.pi(cost_model=mockpigio.CostModel(call=1e-4))
+        gpio.wave_add_generic([mockpigio.pulse(1, 0, 10), mockpigio.pulse(0, 1, 30)])
+        wave_id = gpio.wave_create()
+        gpio.reset_stats()
+        gpio.wave_send_once(wave_id)
+        self.assertEqual(0, gpio.wave_tx_busy())
+        self.assertEqual(1, gpio.stats.waves_sent)
+        self.assertEqual(2, gpio.stats.pulses_sent)
+        self.assertAlmostEqual(2e-4 + 40e-6, gpio.stats.seconds)
+    def test_sleep(self):
+        """Tests the waveform is busy transmitting when calls take their cost"""
+        gpio = mockpigio.pi(sleep=True)
+        gpio.wave_add_generic([mockpigio.pulse(1, 0, 50_000)])
+        gpio.wave_send_once(gpio.wave_create())
+        self.assertEqual(1, gpio.wave_tx_busy())
+    def test_board_strategies(self):
+        """Tests a waveform push costs fewer round trips than bit by bit"""
+        costs = {}
+        for use_waveforms in (True, False):
+            gpio = mockpigio.pi(cost_model=mockpigio.PIGPIOD_SOCKET)
+            stations = [Station(_i, True, True) for _i in range(1, 9)]
+            board = OSPIBoard(gpio, stations, use_waveforms=use_waveforms)
+            gpio.reset_stats()
+            stations[0].on = True
+            board.send_pattern()
+            costs[use_waveforms] = gpio.stats
+        self.assertLess(costs[True].total_calls, costs[False].total_calls)
+        self.assertLess(costs[True].seconds, costs[False].seconds)
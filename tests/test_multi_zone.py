@@ -0,0 +1,113 @@
+"""Tests the MultiZoneController"""
+
+from copy import deepcopy
+from typing import Dict, List
+from unittest import TestCase
+
+import pendulum
+
+from sprinkler.controller.multi import MultiZoneController, Zone
+from sprinkler.program.dictionary.manager import DictProgramManager
+from sprinkler.program.dictionary.program import LOCAL_TZ
+from sprinkler.station.station import Station
+from tests.sample_prog_data import SAMPLE_PROGRAM_DICT, SAMPLE_RUN_TIME
+from tests.test_controller import RecordingBoard
+
+class FairWeatherSite(MultiZoneController):
+    """Site that never has weather to worry about"""
+    def __init__(self, zones: List[Zone], budgets: Dict[str, float] = None):
+        super().__init__(zones, budgets)
+        self.lockout = False
+        self.raining = False
+    def cold_weather_lockout(self) -> bool:
+        """Returns true if there is a lockout for cold weather"""
+        return self.lockout
+    def rain_delay(self) -> bool:
+        """Returns true if we should rain-delay"""
+        return self.raining
+    def update_watering_percentage(self):
+        """Updates the watering percentage"""
+
+def make_zone(name: str, board: RecordingBoard, stations: List[Station], **kwargs) -> Zone:
+    """A zone running SAMPLE_PROGRAM_DICT on stations"""
+    by_id = {_i: _s for _i, _s in enumerate(stations, 1)}
+    manager = DictProgramManager([deepcopy(SAMPLE_PROGRAM_DICT)], by_id, LOCAL_TZ)
+    return Zone(name, board, manager, stations, **kwargs)
+
+class TestMultiZoneController(TestCase):
+    """Tests the MultiZoneController"""
+    def setUp(self):
+        """Setup two boards of 8 stations"""
+        self.boards = [RecordingBoard([Station(_i, True, True) for _i in range(1, 9)])
+                       for _ in range(2)]
+        # SAMPLE_PROGRAM_DICT runs at 6 am on even days
+        self.start = pendulum.datetime(2022, 4, 2, 6, tz=LOCAL_TZ).float_timestamp
+    def make_site(self, budgets: Dict[str, float] = None, **kwargs) -> FairWeatherSite:
+        """A site with a zone per board"""
+        zones = [make_zone(f"zone{_i}", _b, _b.stations, **kwargs)
+                 for _i, _b in enumerate(self.boards)]
+        return FairWeatherSite(zones, budgets)
+    def test_zones_run_concurrently(self):
+        """Tests the programs of the zones run at the same time"""
+        site = self.make_site()
+        site.on_tick(self.start)
+        self.assertEqual({"zone0", "zone1"}, set(site.current_programs))
+        for board in self.boards:
+            self.assertEqual([[1, 0, 0, 0, 0, 0, 0, 0]], board.patterns)
+        site.on_tick(self.start + SAMPLE_RUN_TIME + 1)
+        self.assertEqual({}, site.current_programs)
+        for board in self.boards:
+            self.assertEqual([0] * 8, board.patterns[-1])
+    def test_budget(self):
+        """Tests a program waits until the budget of its group is free"""
+        site = self.make_site({"supply": 1}, group="supply")
+        site.on_tick(self.start)
+        self.assertEqual({"zone0"}, set(site.current_programs))
+        self.assertEqual([1, 0, 0, 0, 0, 0, 0, 0], self.boards[0].patterns[-1])
+        self.assertEqual([0] * 8, self.boards[1].patterns[-1])
+        # Waiting on the budget doesn't spin the mainloop
+        self.assertGreater(site.next_wakeup(self.start + 1), self.start + 1)
+        # The zone waiting goes on the tick the budget is freed
+        end = self.start + SAMPLE_RUN_TIME + 1
+        site.on_tick(end)
+        self.assertEqual({"zone1"}, set(site.current_programs))
+        self.assertEqual([0] * 8, self.boards[0].patterns[-1])
+        self.assertEqual([1, 0, 0, 0, 0, 0, 0, 0], self.boards[1].patterns[-1])
+        self.assertEqual(end, site.current_programs["zone1"].start_time)
+    def test_budget_fits_draws(self):
+        """Tests zones run together when their draws fit the budget"""
+        site = self.make_site({"supply": 2}, group="supply")
+        site.on_tick(self.start)
+        self.assertEqual({"zone0", "zone1"}, set(site.current_programs))
+        self.assertEqual(2, site.drawn("supply"))
+    def test_shared_board(self):
+        """Tests zones on one board, which is sent its pattern once a tick"""
+        board = RecordingBoard([Station(_i, True, True) for _i in range(1, 17)])
+        site = FairWeatherSite([make_zone("low", board, board.stations[:8]),
+                                make_zone("high", board, board.stations[8:])])
+        self.assertEqual([board], site.boards)
+        site.on_tick(self.start)
+        self.assertEqual([[1] + [0] * 7 + [1] + [0] * 7], board.patterns)
+    def test_rain_and_lockout(self):
+        """Tests the weather of the site stops every zone"""
+        site = self.make_site()
+        site.on_tick(self.start)
+        site.raining = True
+        site.on_tick(self.start + 1)
+        for board in self.boards:
+            self.assertEqual([0] * 8, board.patterns[-1])
+        site.raining = False
+        site.lockout = True
+        site.on_tick(self.start + 2)
+        self.assertEqual({}, site.current_programs)
+    def test_run_station(self):
+        """Tests a manual run goes to the zone of the station"""
+        site = self.make_site()
+        station = self.boards[1].stations[3]
+        now = self.start - 3600
+        self.assertTrue(site.run_station(station, 60, now))
+        site.on_tick(now)
+        self.assertEqual({"zone1"}, set(site.current_programs))
+        self.assertEqual([0, 0, 0, 1, 0, 0, 0, 0], self.boards[1].patterns[-1])
+        with self.assertRaises(KeyError):
+            site.zone_for(Station(99, True, True))
@@ -1,6 +1,6 @@
 """Tests the OSPIBoard class using mocks"""
 
-from typing import Mapping
+from typing import List, Mapping
 from unittest import TestCase
 from unittest.mock import patch, MagicMock
 
@@ -11,6 +11,24 @@ from sprinkler.board.ospi import PiGPIOConnFailure
 from sprinkler.board.pins import SRPins
 from sprinkler.station import Station
 
+def latched_bits(write_log: List[mockpigio.WriteLogEntry]) -> List[int]:
+    """Replays a write log through a shift register, returning the latched bits
+
+The bits are returned in station order, the first station being the last bit
+clocked into the register.
+"""
+    levels: Mapping[int, int] = {}
+    register: List[int] = []
+    latched: List[int] = []
+    for entry in write_log:
+        rising = entry.value and not levels.get(entry.pin, 0)
+        levels[entry.pin] = entry.value
+        if rising and entry.pin == SRPins.CLOCK:
+            register.insert(0, levels.get(SRPins.DATA, 0))
+        if rising and entry.pin == SRPins.LATCH:
+            latched = list(register)
+    return latched
+
 class TestOSPIBoard(TestCase):
     """Test out the functionality of the OSPIBoard"""
     @patch("sprinkler.board.ospi.get_pigpio_pi")
@@ -113,3 +131,98 @@ class TestOSPIBoard(TestCase):
         gpio.connected = False
         with self.assertRaises(PiGPIOConnFailure):
             OSPIBoard(gpio, self.all_st)
+    def do_send_pattern(self, use_waveforms: bool) -> mockpigio.pi:
+        """Sends a pattern through a fresh board, returning the gpio used"""
+        gpio = mockpigio.pi()
+        board = OSPIBoard(gpio, self.all_st, use_waveforms=use_waveforms)
+        for station in self.all_st:
+            station.on = station.number in (2, 3, 7)
+        gpio.write_log.clear()
+        board.send_pattern()
+        return gpio
+    def test_send_pattern_strategies(self):
+        """Test the waveform and bit by bit writes latch the same pattern"""
+        expected = [0, 1, 1, 0, 0, 0, 1, 0]
+        for use_waveforms in (True, False):
+            gpio = self.do_send_pattern(use_waveforms)
+            with self.subTest(use_waveforms=use_waveforms):
+                self.assertListEqual(expected, latched_bits(gpio.write_log))
+                self.assertEqual(mockpigio.LOW, gpio.write_log[-1].value)
+                self.assertEqual(SRPins.OUTPUT_EN, gpio.write_log[-1].pin)
+    def test_send_pattern_uses_one_waveform(self):
+        """Test the waveform path only creates a single waveform"""
+        gpio = self.do_send_pattern(True)
+        self.assertEqual(1, gpio.next_wave_id)
+        self.assertDictEqual({}, gpio.waves)
+    def test_send_pattern_waveform_fallback(self):
+        """Test the bit by bit path is used when a waveform can't be created"""
+        gpio = mockpigio.pi()
+        board = OSPIBoard(gpio, self.all_st)
+        with patch.object(gpio, "wave_create", return_value=-1):
+            self.all_st[0].on = True
+            board.send_pattern()
+        self.assertFalse(board.use_waveforms)
+        self.assertEqual([1, 0, 0, 0, 0, 0, 0, 0], latched_bits(gpio.write_log))
+    def test_send_pattern_waveform_send_fails(self):
+        """Test a waveform failing to send is deleted and the bits written one by one"""
+        gpio = mockpigio.pi()
+        board = OSPIBoard(gpio, self.all_st)
+        with patch.object(gpio, "wave_send_once", side_effect=mockpigio.error("send")):
+            self.all_st[0].on = True
+            board.send_pattern()
+        self.assertFalse(board.use_waveforms)
+        self.assertDictEqual({}, gpio.waves)
+        self.assertEqual([1, 0, 0, 0, 0, 0, 0, 0], latched_bits(gpio.write_log))
+    def test_packed_pattern(self):
+        """Test Board.packed_pattern follows the stations"""
+        self.all_st[0].on = True
+        self.all_st[2].on = True
+        self.assertEqual(0b101, self.rainless.packed_pattern)
+        self.assertListEqual([0, 0, 0, 0, 0, 1, 0, 1], self.rainless.get_msb_pattern())
+        self.all_st[0].on = False
+        self.assertEqual(0b100, self.rainless.packed_pattern)
+        self.assertEqual(0b100, self.rainful.packed_pattern)
+    def test_reassign_stations(self):
+        """Test a board stops watching the stations it is no longer given"""
+        old_stations = self.rainless.stations
+        self.rainless.stations = [Station(1, True, True)]
+        old_stations[1].on = True
+        self.assertEqual(0, self.rainless.packed_pattern)
+        self.rainless.stations[0].on = True
+        self.assertEqual(1, self.rainless.packed_pattern)
+    def test_send_pattern_suppressed(self):
+        """Test an unchanged pattern isn't written again"""
+        gpio = self.rainless.gpio
+        self.all_st[0].on = True
+        self.rainless.send_pattern()
+        writes = len(gpio.write_log)
+        self.all_st[1].on = True
+        self.all_st[1].on = False
+        self.rainless.send_pattern()
+        self.assertEqual(writes, len(gpio.write_log))
+    def test_master_relay(self):
+        """Test the external relay follows master_on, around the valves"""
+        gpio = mockpigio.pi()
+        board = OSPIBoard(gpio, self.all_st, use_master_relay=True)
+        self.assertEqual(mockpigio.OUTPUT, gpio.pin_modes[SRPins.EXTERNAL_RELAY])
+        gpio.write_log.clear()
+        self.all_st[0].on = True
+        board.master_on = True
+        board.send_pattern()
+        self.assertEqual((SRPins.EXTERNAL_RELAY, mockpigio.HIGH),
+                         (gpio.write_log[-1].pin, gpio.write_log[-1].value))
+        self.assertEqual([1, 0, 0, 0, 0, 0, 0, 0], latched_bits(gpio.write_log))
+        # Switching stations leaves the relay alone
+        writes = len(gpio.write_log)
+        self.all_st[0].on = False
+        self.all_st[1].on = True
+        board.send_pattern()
+        relay_writes = [_e for _e in gpio.write_log[writes:]
+                        if _e.pin == SRPins.EXTERNAL_RELAY]
+        self.assertEqual([], relay_writes)
+        gpio.write_log.clear()
+        self.all_st[1].on = False
+        board.master_on = False
+        board.send_pattern()
+        self.assertEqual((SRPins.EXTERNAL_RELAY, mockpigio.LOW),
+                         (gpio.write_log[0].pin, gpio.write_log[0].value))
@@ -0,0 +1,78 @@
+"""Tests the vectorized schedule planner"""
+
+import datetime
+from copy import deepcopy
+from unittest import TestCase, skipIf
+from zoneinfo import ZoneInfo
+
+try:
+    import numpy
+except ImportError: # pragma: no cover
+    numpy = None #pylint: disable=invalid-name
+
+from sprinkler.program.dictionary.helpers import turn_dicts_into_dict_programs
+from sprinkler.program.dictionary.program import LOCAL_TZ, DictSprinklerProgram
+from sprinkler.program.time_utilities import utc_for_local_date
+from tests.sample_prog_data import SAMPLE_PROGRAM_DICT, SAMPLE_EVEN_DST_START_DICT
+from tests.sample_prog_data import SAMPLE_CYCLE_SOAK_DICT, SAMPLE_DOW_DAY
+
+def reference_plan(programs, start_date, end_date):
+    """The planned entries worked out a day and program at a time"""
+    entries = []
+    day = start_date
+    while day < end_date:
+        midnight = utc_for_local_date(day, LOCAL_TZ)
+        for index, program in enumerate(programs):
+            if not DictSprinklerProgram.valid_on_day(day, program):
+                continue
+            for start, end, _, station_id in program.compiled.run_times(
+                    midnight + program.start_time_of_day):
+                entries.append((start, index, station_id, end))
+        day += datetime.timedelta(days=1)
+    return sorted(entries)
+
+@skipIf(numpy is None, "numpy is not installed")
+class TestPlanner(TestCase):
+    """Tests plan_runs"""
+    def setUp(self):
+        dow = deepcopy(SAMPLE_PROGRAM_DICT)
+        odd = deepcopy(SAMPLE_CYCLE_SOAK_DICT)
+        odd["program_type"] = 3
+        odd["start_time_of_day"] = 3600 * 20
+        self.programs = turn_dicts_into_dict_programs([deepcopy(SAMPLE_DOW_DAY),
+                                                       dow,
+                                                       deepcopy(SAMPLE_EVEN_DST_START_DICT),
+                                                       odd])
+    def test_matches_reference(self):
+        """Tests the plan over a year with DST changes matches working it out day by day"""
+        from sprinkler.program.planner import plan_runs #pylint: disable=import-outside-toplevel
+        start_date, end_date = datetime.date(2022, 1, 1), datetime.date(2023, 1, 1)
+        plan = plan_runs(self.programs, start_date, end_date, LOCAL_TZ)
+        entries = sorted(zip(plan.start.tolist(),
+                             plan.program.tolist(),
+                             plan.station_id.tolist(),
+                             plan.end.tolist()))
+        self.assertEqual(entries, reference_plan(self.programs, start_date, end_date))
+        self.assertTrue(numpy.all(numpy.diff(plan.start) >= 0))
+        self.assertTrue(numpy.all(numpy.diff(plan.run_start) >= 0))
+        self.assertTrue(numpy.array_equal(plan.program, plan.run_program[plan.run]))
+        run_times = numpy.array([_p.compiled.run_time for _p in self.programs])
+        self.assertTrue(numpy.array_equal(plan.run_end - plan.run_start,
+                                          run_times[plan.run_program]))
+    def test_day_of_week(self):
+        """Tests a day of the week program only runs on its days"""
+        from sprinkler.program.planner import plan_runs #pylint: disable=import-outside-toplevel
+        plan = plan_runs(self.programs[:1], datetime.date(2022, 4, 4),
+                         datetime.date(2022, 4, 11), LOCAL_TZ)
+        zone = ZoneInfo(LOCAL_TZ)
+        weekdays = [datetime.datetime.fromtimestamp(_s, zone).weekday() for _s in plan.run_start]
+        self.assertEqual(sorted(set(weekdays)), sorted(self.programs[0].days_of_the_week))
+    def test_empty(self):
+        """Tests planning no programs or no days"""
+        from sprinkler.program.planner import plan_runs #pylint: disable=import-outside-toplevel
+        plan = plan_runs([], datetime.date(2022, 1, 1), datetime.date(2022, 2, 1), LOCAL_TZ)
+        self.assertEqual(len(plan.start), 0)
+        plan = plan_runs(self.programs, datetime.date(2022, 1, 1),
+                         datetime.date(2022, 1, 1), LOCAL_TZ)
+        self.assertEqual(len(plan.run_start), 0)
+        self.assertEqual(len(plan.station_id), 0)
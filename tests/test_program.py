@@ -1,4 +1,7 @@
 """Tests out SprinklerPrograms"""
+import json
+import os
+import tempfile
 from copy import deepcopy
 from datetime import datetime
 from typing import Callable, List, Tuple
@@ -10,12 +13,15 @@ import pendulum
 from sprinkler.program.dictionary.program import LOCAL_TZ, DictSprinklerProgram
 from sprinkler.program.dictionary.helpers import ProgramDictSchema, ProgramEntry
 from sprinkler.program.dictionary.helpers import turn_dict_into_dict_program
+from sprinkler.program.dictionary.helpers import compile_program, iter_programs_from_file
+from sprinkler.program.dictionary.helpers import turn_dicts_into_dict_programs
 from sprinkler.program.program_types import ProgramType
 from sprinkler.station.station import Station
 
 from tests.sample_prog_data import SAMPLE_PROGRAM_DICT, SAMPLE_ODD_DAY, SAMPLE_DOW_DAY
 from tests.sample_prog_data import SAMPLE_NO_ADJ_PROGRAM_DICT, SAMPLE_RUN_TIME
-from tests.sample_prog_data import SAMPLE_BAD_PROGRAM_DICT
+from tests.sample_prog_data import STATION_1_RUN, STATION_2_RUN
+from tests.sample_prog_data import SAMPLE_BAD_PROGRAM_DICT, SAMPLE_CYCLE_SOAK_DICT
 
 class TestDictProgramHelpers(TestCase):
     """Tests the dictionary program helpers"""
@@ -48,6 +54,71 @@ class TestDictProgramHelpers(TestCase):
         """Tests that we get a validation error"""
         with self.assertRaises(ValidationError):
             turn_dict_into_dict_program(SAMPLE_BAD_PROGRAM_DICT)
+    def test_bulk_load(self):
+        """Tests loading many programs in one go"""
+        confs = [SAMPLE_PROGRAM_DICT, SAMPLE_ODD_DAY, SAMPLE_DOW_DAY]
+        expected = [turn_dict_into_dict_program(conf) for conf in confs]
+        self.assertListEqual(expected, turn_dicts_into_dict_programs(confs))
+        with self.assertRaises(ValidationError):
+            turn_dicts_into_dict_programs([SAMPLE_PROGRAM_DICT, SAMPLE_BAD_PROGRAM_DICT])
+    def test_load_programs_from_file(self):
+        """Tests loading programs from JSON and JSON Lines files"""
+        confs = [SAMPLE_PROGRAM_DICT, SAMPLE_ODD_DAY, SAMPLE_DOW_DAY] * 3
+        expected = [turn_dict_into_dict_program(conf) for conf in confs]
+        contents = {
+            "programs.json": json.dumps(confs, indent=2),
+            "programs.jsonl": "\n".join(json.dumps(conf) for conf in confs) + "\n\n",
+        }
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name, content in contents.items():
+                path = os.path.join(tmp_dir, name)
+                with open(path, "w", encoding="utf-8") as program_file:
+                    program_file.write(content)
+                with self.subTest(name=name):
+                    programs = list(iter_programs_from_file(path, batch_size=4))
+                    self.assertListEqual(expected, programs)
+    def test_compiled_program(self):
+        """Tests the DictProgram is compiled when it is loaded"""
+        program = turn_dict_into_dict_program(SAMPLE_PROGRAM_DICT)
+        compiled = program.compiled
+        with self.subTest(compiled=compiled):
+            self.assertEqual(SAMPLE_RUN_TIME, compiled.run_time)
+            self.assertEqual((1, 2, 3, 4, 5), compiled.station_ids)
+            self.assertEqual([0, STATION_1_RUN, STATION_1_RUN + STATION_2_RUN],
+                             list(compiled.offsets[:3]))
+        with self.subTest(compiled=compiled):
+            self.assertEqual(compiled, compile_program(program.station_durations))
+            self.assertEqual(program, turn_dict_into_dict_program(SAMPLE_PROGRAM_DICT))
+    def test_compiled_run_times(self):
+        """Tests CompiledProgram.run_times lays out and scales the entries"""
+        compiled = turn_dict_into_dict_program(SAMPLE_PROGRAM_DICT).compiled
+        start = 1000
+        run_times = list(compiled.run_times(start))
+        self.assertEqual((start, start + STATION_1_RUN, STATION_1_RUN, 1), run_times[0])
+        self.assertEqual(start + SAMPLE_RUN_TIME, run_times[-1][1])
+        half_times = list(compiled.run_times(start, 0.5))
+        self.assertEqual((start, start + STATION_1_RUN / 2, STATION_1_RUN / 2, 1),
+                         half_times[0])
+        self.assertEqual(start + SAMPLE_RUN_TIME / 2, half_times[-1][1])
+    def test_run_times_match_adjusted_program(self):
+        """Tests run_times and an adjusted program agree at a percentage other than 100"""
+        conf = turn_dict_into_dict_program(SAMPLE_PROGRAM_DICT)
+        stations = {_i: Station(_i, True, True) for _i in range(1, 6)}
+        start = pendulum.datetime(2022, 4, 2, hour=6, tz=LOCAL_TZ).float_timestamp
+        program = DictSprinklerProgram(start, stations, conf)
+        program.adjust_watering(0.73)
+        expected = list(conf.compiled.run_times(start, 0.73))
+        self.assertEqual([(_s, _e) for _s, _e, _, _ in expected],
+                         [(_t.start, _t.end) for _t in program.stations_indexed])
+        # The stations change exactly at the times run_times gives
+        now = start
+        for begin, end, _, station_id in expected:
+            self.assertEqual(begin, now)
+            program.update_program(now)
+            self.assertTrue(stations[station_id].on)
+            now = program.next_transition(now)
+        self.assertEqual(expected[-1][1], now)
+        self.assertEqual(expected[-1][1], program.program_end_time)
 
 
 class TestSprinklerProgram(TestCase):
@@ -197,6 +268,45 @@ class TestSprinklerProgram(TestCase):
         expected_run = SAMPLE_RUN_TIME
         program.adjust_watering(percentage)
         self.assertAlmostEqual(expected_run, program.program_run_time, 0)
+    def test_adjust_watering_mid_run(self):
+        """Test adjusting the watering during a run only scales what is left"""
+        start = pendulum.datetime(2022, 4, 2, hour=6, tz=LOCAL_TZ).float_timestamp
+        program = DictSprinklerProgram.factory(self.sample_dict_program,
+                                               self.all_stations,
+                                               now=start)
+        program.adjust_watering(2)
+        self.assertEqual(start + 2 * SAMPLE_RUN_TIME, program.program_end_time)
+        halfway = start + STATION_1_RUN
+        program.update_program(halfway)
+        self.assertTrue(self.all_stations[1].on)
+        program.adjust_watering(0.5, halfway)
+        self.assertEqual(0.5, program.watering_scale)
+        # Half of station 1 has run at double, the rest of the program is halved
+        station_1_end = halfway + STATION_1_RUN / 4
+        self.assertEqual(station_1_end, program.next_transition(halfway))
+        self.assertEqual(halfway + (SAMPLE_RUN_TIME - STATION_1_RUN / 2) / 2,
+                         program.program_end_time)
+        program.update_program(station_1_end)
+        self.assertFalse(self.all_stations[1].on)
+        self.assertTrue(self.all_stations[2].on)
+        self.assertEqual(station_1_end + STATION_2_RUN / 2,
+                         program.next_transition(station_1_end))
+        program.update_program(program.program_end_time)
+        self.assertFalse(any(_s.on for _s in self.all_stations.values()))
+        self.assertTrue(program.program_over(program.program_end_time + 1))
+    def test_adjust_watering_before_start(self):
+        """Test adjusting before the start scales the whole program, however often"""
+        start = pendulum.datetime(2022, 4, 2, hour=6, tz=LOCAL_TZ).float_timestamp
+        program = DictSprinklerProgram.factory(self.sample_dict_program,
+                                               self.all_stations,
+                                               now=start)
+        for percentage in (0.5, 1.5, 0.8):
+            program.adjust_watering(percentage, start - 60)
+        self.assertAlmostEqual(0.8 * SAMPLE_RUN_TIME, program.program_run_time)
+        times = sorted(program.stations_indexed)
+        self.assertEqual(start, times[0].start)
+        self.assertAlmostEqual(0.8 * STATION_1_RUN, times[0].duration)
+        self.assertEqual(times[0].end, times[1].start)
     def test_program_over(self):
         """Tests SprinklerProgram.program_over"""
         runtime_hrs = int(SAMPLE_RUN_TIME // 3600)
@@ -287,6 +397,41 @@ class TestSprinklerProgram(TestCase):
                 test_prog.update_program(test_now)
                 res = [st.on for st in test_prog.stations]
                 self.assertListEqual(expect_res, res)
+    def test_update_program_repeated_station(self):
+        """Tests SprinklerProgram.update_program with a repeated station"""
+        test_prog_now = pendulum.datetime(2022, 4, 2, hour=6, tz=LOCAL_TZ)
+        cycle_soak = turn_dict_into_dict_program(SAMPLE_CYCLE_SOAK_DICT)
+        test_prog = DictSprinklerProgram.factory(cycle_soak,
+                                                 self.all_stations,
+                                                 now=test_prog_now.float_timestamp)
+        expected_results = [
+            (test_prog_now.add(minutes=5), [True, False]),
+            (test_prog_now.add(minutes=15), [False, True]),
+            (test_prog_now.add(minutes=25), [True, False]),
+            (test_prog_now.add(minutes=35), [False, True]),
+            (test_prog_now.add(minutes=40), [False, False]),
+            # Going back in time replays the timeline
+            (test_prog_now.add(minutes=20), [True, False]),
+        ]
+        for test_now, expect_res in expected_results:
+            with self.subTest(test_now=test_now, expect_res=expect_res):
+                test_prog.update_program(test_now.float_timestamp)
+                res = [self.all_stations[1].on, self.all_stations[2].on]
+                self.assertListEqual(expect_res, res)
+    def test_update_program_resync(self):
+        """Tests SprinklerProgram.update_program only writes changed stations"""
+        test_prog_now = pendulum.datetime(2022, 4, 2, hour=6, tz=LOCAL_TZ)
+        test_prog = DictSprinklerProgram.factory(self.sample_dict_program,
+                                                 self.all_stations,
+                                                 now=test_prog_now.float_timestamp)
+        test_prog.update_program(test_prog_now.float_timestamp)
+        self.all_stations[5].on = True
+        test_prog.update_program(test_prog_now.add(seconds=1).float_timestamp)
+        self.assertTrue(self.all_stations[5].on)
+        test_prog.resync()
+        test_prog.update_program(test_prog_now.add(seconds=2).float_timestamp)
+        self.assertFalse(self.all_stations[5].on)
+        self.assertTrue(self.all_stations[1].on)
     def test_prog_equal(self):
         """Test DictSprinklerProgram.__eq__"""
         test_prog_now = pendulum.datetime(2022, 4, 2, hour=6, tz=LOCAL_TZ)
@@ -0,0 +1,61 @@
+"""Tests the RunQueue and ManualProgram"""
+
+from unittest import TestCase
+
+from sprinkler.controller.queue import PRIORITY_ADHOC, PRIORITY_MANUAL, PRIORITY_SCHEDULED
+from sprinkler.controller.queue import RunQueue
+from sprinkler.program.manual import ManualProgram
+from sprinkler.station.station import Station
+
+class TestRunQueue(TestCase):
+    """Tests RunQueue"""
+    def setUp(self):
+        self.stations = [Station(_i, True, True) for _i in range(1, 5)]
+        self.queue = RunQueue()
+    def test_order(self):
+        """Tests programs come off by priority, then due time, then queue order"""
+        scheduled = ManualProgram(100, self.stations[0], 60)
+        early = ManualProgram(50, self.stations[1], 60)
+        manual = ManualProgram(200, self.stations[2], 60)
+        adhoc = ManualProgram(50, self.stations[3], 60)
+        self.queue.push(scheduled, PRIORITY_SCHEDULED, 100)
+        self.queue.push(early, PRIORITY_SCHEDULED, 100)
+        self.queue.push(adhoc, PRIORITY_ADHOC, 100)
+        self.queue.push(manual, PRIORITY_MANUAL, 200)
+        self.assertEqual([manual, adhoc, early, scheduled], self.queue.programs)
+        self.assertIs(manual, self.queue.peek().program)
+        self.assertEqual(4, len(self.queue))
+        popped = [self.queue.pop().program for _ in range(4)]
+        self.assertEqual([manual, adhoc, early, scheduled], popped)
+        self.assertIsNone(self.queue.pop())
+        self.assertIsNone(self.queue.peek())
+        self.assertFalse(self.queue)
+    def test_contains_same_run(self):
+        """Tests a rescheduled program is still the same run"""
+        program = ManualProgram(100, self.stations[0], 60)
+        self.queue.push(program, PRIORITY_MANUAL, 100)
+        again = ManualProgram(100, self.stations[0], 60)
+        again.reschedule(500)
+        self.assertIn(again, self.queue)
+        self.assertNotIn(ManualProgram(100, self.stations[1], 60), self.queue)
+        self.queue.clear()
+        self.assertEqual(0, len(self.queue))
+
+class TestManualProgram(TestCase):
+    """Tests ManualProgram"""
+    def test_runs_station(self):
+        """Tests the station is on for the duration"""
+        station = Station(1, True, True)
+        program = ManualProgram(100, station, 60)
+        program.update_program(100)
+        self.assertTrue(station.on)
+        program.adjust_watering(0.5)
+        self.assertEqual(160, program.program_end_time)
+        program.reschedule(200)
+        self.assertEqual(100, program.due_time)
+        program.update_program(150)
+        self.assertFalse(station.on)
+        program.update_program(259)
+        self.assertTrue(station.on)
+        self.assertTrue(program.program_over(261))
+        self.assertFalse(program.respect_rain_delay)
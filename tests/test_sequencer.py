@@ -0,0 +1,92 @@
+"""Tests the Sequencer"""
+
+from copy import deepcopy
+from unittest import TestCase
+
+import pendulum
+
+from sprinkler.board.sequencer import Sequencer
+from sprinkler.program.dictionary.manager import DictProgramManager
+from sprinkler.program.dictionary.program import LOCAL_TZ
+from sprinkler.station.station import Station
+from tests.sample_prog_data import SAMPLE_PROGRAM_DICT, SAMPLE_RUN_TIME, STATION_1_RUN
+from tests.test_controller import FairWeatherController, RecordingBoard
+
+class TestSequencer(TestCase):
+    """Tests the Sequencer"""
+    def setUp(self):
+        self.stations = [Station(_i, True, True) for _i in range(1, 9)]
+        self.board = RecordingBoard(self.stations)
+        self.sequencer = Sequencer(self.board, station_delay=5, master=True,
+                                   master_off_delay=30)
+    def send(self, now: float):
+        """Sequences and sends the pattern at now"""
+        self.sequencer.update(now)
+        self.board.send_pattern()
+    def test_station_delay(self):
+        """Tests the next station is held until the delay is up"""
+        self.stations[0].on = True
+        self.send(100)
+        self.assertEqual([1, 0, 0, 0, 0, 0, 0, 0], self.board.patterns[-1])
+        self.assertIsNone(self.sequencer.next_transition(100))
+        self.stations[0].on = False
+        self.stations[1].on = True
+        self.send(200)
+        self.assertEqual([0] * 8, self.board.patterns[-1])
+        self.assertTrue(self.board.master_on)
+        self.assertEqual(205, self.sequencer.next_transition(200))
+        self.send(203)
+        self.assertEqual([0] * 8, self.board.patterns[-1])
+        self.send(205)
+        self.assertEqual([0, 1, 0, 0, 0, 0, 0, 0], self.board.patterns[-1])
+        self.assertIsNone(self.sequencer.next_transition(205))
+    def test_master_off_delay(self):
+        """Tests the master stays on between stations and for the off delay"""
+        self.stations[0].on = True
+        self.send(100)
+        self.assertTrue(self.board.master_on)
+        self.stations[0].on = False
+        self.send(200)
+        self.assertTrue(self.board.master_on)
+        self.assertEqual(230, self.sequencer.next_transition(200))
+        self.stations[2].on = True
+        self.send(220)
+        self.assertTrue(self.board.master_on)
+        self.stations[2].on = False
+        self.send(300)
+        self.send(330)
+        self.assertFalse(self.board.master_on)
+        self.assertIsNone(self.sequencer.next_transition(330))
+    def test_stop(self):
+        """Tests a stop drops what is held and the master"""
+        self.stations[0].on = True
+        self.send(100)
+        self.stations[0].on = False
+        self.stations[1].on = True
+        self.send(200)
+        self.sequencer.stop()
+        self.board.stop_all_stations()
+        self.assertFalse(self.board.master_on)
+        self.assertEqual(0, self.board.held)
+
+class TestSequencedController(TestCase):
+    """Tests the controller with a Sequencer"""
+    def test_program_with_station_delay(self):
+        """Tests the controller wakes to release the held station"""
+        stations = {_i: Station(_i, True, True) for _i in range(1, 9)}
+        board = RecordingBoard(list(stations.values()))
+        manager = DictProgramManager([deepcopy(SAMPLE_PROGRAM_DICT)], stations, LOCAL_TZ)
+        controller = FairWeatherController(board, manager)
+        controller.sequencer = Sequencer(board, station_delay=10, master=True)
+        start = pendulum.datetime(2022, 4, 2, 6, tz=LOCAL_TZ).float_timestamp
+        controller.on_tick(start)
+        self.assertTrue(board.master_on)
+        controller.on_tick(start + STATION_1_RUN)
+        self.assertEqual([0] * 8, board.patterns[-1])
+        self.assertTrue(board.master_on)
+        self.assertEqual(start + STATION_1_RUN + 10,
+                         controller.next_wakeup(start + STATION_1_RUN))
+        controller.on_tick(start + STATION_1_RUN + 10)
+        self.assertEqual([0, 1, 0, 0, 0, 0, 0, 0], board.patterns[-1])
+        controller.on_tick(start + SAMPLE_RUN_TIME + 1)
+        self.assertFalse(board.master_on)
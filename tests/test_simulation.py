@@ -0,0 +1,103 @@
+"""Tests the fast forward simulation"""
+
+import datetime
+import time
+from copy import deepcopy
+from unittest import TestCase
+
+import pendulum
+
+from sprinkler.controller.queue import QueuePolicy
+from sprinkler.program.dictionary.program import LOCAL_TZ
+from sprinkler.simulation import PatternChange, Simulation
+from tests.sample_prog_data import SAMPLE_EVEN_DST_START_DICT, SAMPLE_ODD_DAY
+from tests.sample_prog_data import SAMPLE_PROGRAM_DICT
+from tests.sample_prog_data import STATION_1_RUN, STATION_2_RUN, SAMPLE_RUN_TIME
+
+def even_days(year: int) -> int:
+    """Number of even days of the month in the year"""
+    day = datetime.date(year, 1, 1)
+    count = 0
+    while day.year == year:
+        count += day.day % 2 == 0
+        day += datetime.timedelta(days=1)
+    return count
+
+class TestSimulation(TestCase):
+    """Tests the Simulation"""
+    def test_single_run(self):
+        """Tests the timeline of a single run of a program"""
+        sim = Simulation.for_programs([deepcopy(SAMPLE_PROGRAM_DICT)], 8, LOCAL_TZ)
+        start = pendulum.datetime(2022, 4, 2, 6, tz=LOCAL_TZ).float_timestamp
+        timeline = sim.run(start - 3600, start + 3600 * 5)
+        expected = [
+            PatternChange(start, 0b1),
+            PatternChange(start + STATION_1_RUN, 0b10),
+            PatternChange(start + STATION_1_RUN + STATION_2_RUN, 0b100),
+        ]
+        self.assertListEqual(expected, timeline[:3])
+        self.assertEqual(PatternChange(start + SAMPLE_RUN_TIME, 0), timeline[-1])
+    def test_year(self):
+        """Tests a year of an even day program, across DST, runs fast"""
+        programs = [deepcopy(SAMPLE_PROGRAM_DICT), deepcopy(SAMPLE_EVEN_DST_START_DICT)]
+        sim = Simulation.for_programs(programs, 8, LOCAL_TZ)
+        start = pendulum.datetime(2023, 1, 1, tz=LOCAL_TZ).float_timestamp
+        end = pendulum.datetime(2024, 1, 1, tz=LOCAL_TZ).float_timestamp
+        began = time.perf_counter()
+        sim.run(start, end)
+        elapsed = time.perf_counter() - began
+        runs = 2 * even_days(2023)
+        run_times = sim.station_run_times(end)
+        self.assertEqual(runs * STATION_1_RUN, run_times[1])
+        self.assertEqual(0, run_times[8])
+        # Ticks only at the transitions, about 8 for a run of 5 stations, not every second
+        self.assertLess(sim.ticks, 10 * runs)
+        self.assertLess(elapsed, 1)
+    def test_rain(self):
+        """Tests programs ignoring the rain run every day, those respecting it don't"""
+        ignores_rain = deepcopy(SAMPLE_ODD_DAY)
+        ignores_rain["respect_rain"] = False
+        sim = Simulation.for_programs([deepcopy(SAMPLE_PROGRAM_DICT), ignores_rain],
+                                      8, LOCAL_TZ, rain=True)
+        start = pendulum.datetime(2022, 4, 1, tz=LOCAL_TZ).float_timestamp
+        end = start + 7 * 86400
+        timeline = sim.run(start, end)
+        odd_starts = [pendulum.datetime(2022, 4, _day, 6, tz=LOCAL_TZ).float_timestamp
+                      for _day in (1, 3, 5, 7)]
+        self.assertListEqual(odd_starts,
+                             [_change.time for _change in timeline if _change.pattern == 0b1])
+        self.assertEqual(4 * STATION_1_RUN, sim.station_run_times(end)[1])
+        self.assertEqual(end, sim.clock.now)
+    def test_deferred_program(self):
+        """Tests a program due while another runs starts once it finishes"""
+        late = deepcopy(SAMPLE_PROGRAM_DICT)
+        late["start_time_of_day"] += 3600
+        late["station_durations"] = [{"station_id": 8, "duration": 600}]
+        programs = [deepcopy(SAMPLE_PROGRAM_DICT), late]
+        start = pendulum.datetime(2022, 4, 2, 6, tz=LOCAL_TZ).float_timestamp
+        end = start + SAMPLE_RUN_TIME
+        dropped = Simulation.for_programs(deepcopy(programs), 8, LOCAL_TZ)
+        dropped.run(start - 60, start + 86400)
+        self.assertEqual(0, dropped.station_run_times(start + 86400)[8])
+        deferred = Simulation.for_programs(deepcopy(programs), 8, LOCAL_TZ, max_defer=4 * 3600)
+        timeline = deferred.run(start - 60, start + 86400)
+        late_start, pattern = timeline[-2]
+        self.assertEqual(0b10000000, pattern)
+        # It starts on the first tick after the first program is over
+        self.assertTrue(end <= late_start <= end + deferred.controller.tick_interval + 1)
+        self.assertEqual(PatternChange(late_start + 600, 0), timeline[-1])
+    def test_deferred_by_manager_and_queue(self):
+        """Tests a program deferred by both the manager and the queue runs once"""
+        late = deepcopy(SAMPLE_PROGRAM_DICT)
+        late["start_time_of_day"] += 3600
+        late["station_durations"] = [{"station_id": 8, "duration": 600}]
+        start = pendulum.datetime(2022, 4, 2, 6, tz=LOCAL_TZ).float_timestamp
+        sim = Simulation.for_programs([deepcopy(SAMPLE_PROGRAM_DICT), late], 8, LOCAL_TZ,
+                                      max_defer=4 * 3600)
+        sim.controller.queue_policy = QueuePolicy.DEFER
+        timeline = sim.run(start - 60, start + 86400)
+        # The queue picks it up on time, and it starts on the tick after the first is over
+        self.assertEqual([PatternChange(start + SAMPLE_RUN_TIME + 1, 0b10000000),
+                          PatternChange(start + SAMPLE_RUN_TIME + 601, 0)],
+                         timeline[-2:])
+        self.assertEqual(600, sim.station_run_times(start + 86400)[8])
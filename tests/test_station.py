@@ -42,3 +42,18 @@ class TestStation(TestCase):
                 station.on = new_state
                 result = station.on
                 self.assertEqual(result, exp_state)
+    def test_watch(self):
+        """Test watchers are only told of changes in state"""
+        changes: List[bool] = []
+        self.enabled_st.watch(changes.append)
+        for state in (True, True, False, False, True):
+            self.enabled_st.on = state
+        self.enabled_st.unwatch(changes.append)
+        self.enabled_st.on = False
+        self.assertListEqual([True, False, True], changes)
+    def test_watch_disabled(self):
+        """Test a disabled station never tells its watchers it is on"""
+        changes: List[bool] = []
+        self.disabled_st.watch(changes.append)
+        self.disabled_st.on = True
+        self.assertListEqual([], changes)
@@ -0,0 +1,60 @@
+"""Test out the StationRegistry class"""
+
+import sys
+from unittest import TestCase
+
+from sprinkler.station.registry import StationRegistry
+from sprinkler.station.station import Station
+
+class TestStationRegistry(TestCase):
+    """Test the station registry"""
+    def setUp(self):
+        """Setup a registry of 8 stations, the last disabled"""
+        self.registry = StationRegistry(8, enabled=[True] * 7 + [False])
+    def test_lookup(self):
+        """Test stations are looked up by number and iterated in order"""
+        self.assertEqual(3, self.registry[3].number)
+        self.assertListEqual(list(range(1, 9)), [_st.number for _st in self.registry])
+        self.assertNotIn(0, self.registry)
+        with self.assertRaises(KeyError):
+            self.registry[9] # pylint: disable=pointless-statement
+    def test_on_flags(self):
+        """Test the on flags follow the stations"""
+        for number in (2, 5, 8):
+            self.registry[number].on = True
+        self.assertListEqual([2, 5], self.registry.numbers_on())
+        self.registry[2].on = False
+        self.assertEqual(bytearray([0, 0, 0, 0, 1, 0, 0, 0]), self.registry.on)
+    def test_set_enabled(self):
+        """Test disabling a station through the registry turns it off"""
+        self.registry[4].on = True
+        self.registry.set_enabled(4, False)
+        self.assertFalse(self.registry[4].on)
+        self.assertEqual(0, self.registry.enabled[3])
+        self.assertListEqual([], self.registry.numbers_on())
+    def test_flag_lengths(self):
+        """Test flags must be given for every station"""
+        with self.assertRaises(ValueError):
+            StationRegistry(2, enabled=[True])
+    def test_station_flags_are_views(self):
+        """Test the flags of a station and the registry can't disagree"""
+        station = self.registry[1]
+        station.enabled = False
+        self.assertEqual(0, self.registry.enabled[0])
+        station.on = True
+        self.assertFalse(station.on)
+        self.registry.set_weather_aware(2, False)
+        self.assertFalse(self.registry[2].weather_aware)
+        self.registry[3].weather_aware = True
+        self.assertEqual(1, self.registry.weather_aware[2])
+        changes = []
+        self.registry[3].watch(changes.append)
+        self.registry[3].on = True
+        self.registry[3].on = True
+        self.assertEqual([True], changes)
+        self.assertEqual(1, self.registry.on[2])
+    def test_stations_hold_no_flags(self):
+        """Test registry stations are smaller than a Station, as they keep no flags"""
+        station = self.registry[1]
+        self.assertFalse(hasattr(station, "__dict__"))
+        self.assertLess(sys.getsizeof(station), sys.getsizeof(Station(1, True, True)))
@@ -0,0 +1,146 @@
+"""Tests the ProgramStore"""
+
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+from array import array
+from copy import deepcopy
+from unittest import TestCase
+from unittest.mock import patch
+
+from sprinkler.program.dictionary import store as store_module
+from sprinkler.program.dictionary.helpers import turn_dicts_into_dict_programs
+from sprinkler.program.dictionary.manager import DictProgramManager
+from sprinkler.program.dictionary.program import LOCAL_TZ
+from sprinkler.program.dictionary.store import ProgramStore, conf_hash
+from sprinkler.station.station import Station
+from tests.sample_prog_data import SAMPLE_PROGRAM_DICT, SAMPLE_ODD_DAY, SAMPLE_DOW_DAY
+
+class TestProgramStore(TestCase):
+    """Tests ProgramStore"""
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory() #pylint: disable=consider-using-with
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db_path = os.path.join(self.tmp_dir.name, "programs.db")
+        self.programs_path = os.path.join(self.tmp_dir.name, "programs.json")
+        self.confs = [deepcopy(SAMPLE_PROGRAM_DICT), deepcopy(SAMPLE_ODD_DAY),
+                      deepcopy(SAMPLE_DOW_DAY)]
+        self.write_programs(self.confs)
+    def write_programs(self, confs):
+        """Writes the programs file"""
+        with open(self.programs_path, "w", encoding="utf-8") as programs_file:
+            json.dump(confs, programs_file)
+    def open_store(self) -> ProgramStore:
+        """Opens the store, closing it at the end of the test"""
+        store = ProgramStore(self.db_path)
+        self.addCleanup(store.close)
+        return store
+    def test_round_trip(self):
+        """Tests stored programs load equal to the validated ones"""
+        expected = turn_dicts_into_dict_programs(deepcopy(self.confs))
+        self.assertEqual(expected, self.open_store().sync_file(self.programs_path))
+        loaded = self.open_store().load()
+        self.assertEqual(expected, loaded)
+        for program, stored in zip(expected, loaded):
+            with self.subTest(program=program.name):
+                self.assertEqual(program.compiled, stored.compiled)
+                self.assertEqual(program.identity, stored.identity)
+    def test_unchanged_file_skips_validation(self):
+        """Tests an unchanged file is loaded from the store alone"""
+        self.open_store().sync_file(self.programs_path)
+        with patch.object(store_module, "iter_dicts_from_file") as iter_dicts:
+            programs = self.open_store().sync_file(self.programs_path)
+        iter_dicts.assert_not_called()
+        self.assertEqual(3, len(programs))
+    def test_only_changed_programs_validated(self):
+        """Tests only programs with a new hash are validated"""
+        self.open_store().sync_file(self.programs_path)
+        changed = deepcopy(self.confs)
+        changed[1]["start_time_of_day"] += 60
+        self.write_programs(changed)
+        validate = store_module.turn_dicts_into_dict_programs
+        with patch.object(store_module, "turn_dicts_into_dict_programs",
+                          side_effect=validate) as validating:
+            programs = self.open_store().sync_file(self.programs_path)
+        validating.assert_called_once_with([changed[1]])
+        self.assertEqual(turn_dicts_into_dict_programs(deepcopy(changed)), programs)
+    def test_stale_cache_rebuilt(self):
+        """Tests the programs are compiled again if the cache is missing or stale"""
+        store = self.open_store()
+        expected = store.sync_file(self.programs_path)
+        os.remove(store.cache_path)
+        self.assertEqual(expected, store.load())
+        self.assertTrue(os.path.exists(store.cache_path))
+        with open(store.cache_path, "r+b") as cache_file:
+            cache_file.write(b"JUNK")
+        self.assertEqual([_p.compiled for _p in expected],
+                         [_p.compiled for _p in store.load()])
+    def test_load_views_cache(self):
+        """Tests loading with the cache in place views it rather than parsing the rows"""
+        self.open_store().sync_file(self.programs_path)
+        with patch.object(store_module, "json") as json_module:
+            loaded = self.open_store().load()
+        json_module.loads.assert_not_called()
+        self.assertIsInstance(loaded[0].compiled.offsets, memoryview)
+        self.assertEqual(turn_dicts_into_dict_programs(deepcopy(self.confs)), loaded)
+    def test_only_changed_rows_written(self):
+        """Tests rows of unchanged programs are kept as they are"""
+        self.open_store().sync_file(self.programs_path)
+        with sqlite3.connect(self.db_path) as database:
+            before = database.execute("SELECT id, hash FROM programs ORDER BY seq").fetchall()
+        changed = deepcopy(self.confs)
+        changed[1]["start_time_of_day"] += 60
+        self.write_programs(changed)
+        self.open_store().sync_file(self.programs_path)
+        with sqlite3.connect(self.db_path) as database:
+            after = database.execute("SELECT id, hash FROM programs ORDER BY seq").fetchall()
+        self.assertEqual(before[0], after[0])
+        self.assertEqual(before[2], after[2])
+        self.assertNotIn(after[1], before)
+        self.assertEqual(conf_hash(changed[1]), after[1][1])
+        self.assertEqual(turn_dicts_into_dict_programs(deepcopy(changed)),
+                         self.open_store().load())
+    def test_station_keys(self):
+        """Tests station ids of any kind SQLite keeps come back as they were"""
+        keyed = deepcopy(SAMPLE_PROGRAM_DICT)
+        keyed["station_durations"] = [{"station_id": "front", "duration": 60},
+                                      {"station_id": 2, "duration": 30},
+                                      {"station_id": 2.5, "duration": 30}]
+        self.write_programs([keyed, deepcopy(SAMPLE_ODD_DAY)])
+        expected = self.open_store().sync_file(self.programs_path)
+        loaded = self.open_store().load()
+        self.assertEqual(expected, loaded)
+        self.assertEqual(("front", 2, 2.5), loaded[0].compiled.station_ids)
+        self.assertIsInstance(loaded[0].compiled.station_ids[1], int)
+    def test_unstorable_station_key(self):
+        """Tests a station id that can't be stored is refused, storing nothing"""
+        store = self.open_store()
+        expected = store.sync_file(self.programs_path)
+        keyed = deepcopy(SAMPLE_PROGRAM_DICT)
+        keyed["station_durations"] = [{"station_id": (1, 2), "duration": 60}]
+        with self.assertRaises(TypeError):
+            store.update_from_dicts([keyed])
+        self.assertEqual(expected, self.open_store().load())
+    def test_pickle_loaded(self):
+        """Tests programs viewing the cache can be pickled and copied"""
+        self.open_store().sync_file(self.programs_path)
+        loaded = self.open_store().load()
+        for copied in (pickle.loads(pickle.dumps(loaded)), deepcopy(loaded)):
+            self.assertEqual(loaded, copied)
+            self.assertEqual([_p.compiled for _p in loaded], [_p.compiled for _p in copied])
+            self.assertIsInstance(copied[0].compiled.offsets, array)
+    def test_conf_hash(self):
+        """Tests the hash doesn't depend on key order"""
+        reordered = dict(reversed(list(SAMPLE_PROGRAM_DICT.items())))
+        self.assertEqual(conf_hash(SAMPLE_PROGRAM_DICT), conf_hash(reordered))
+        self.assertNotEqual(conf_hash(SAMPLE_PROGRAM_DICT), conf_hash(SAMPLE_ODD_DAY))
+    def test_manager_from_store(self):
+        """Tests a manager is made from the stored programs"""
+        store = self.open_store()
+        store.sync_file(self.programs_path)
+        stations = [Station(_i, True, True) for _i in range(8)]
+        manager = DictProgramManager.from_store(store, stations, LOCAL_TZ)
+        self.assertSequenceEqual(turn_dicts_into_dict_programs(deepcopy(self.confs)),
+                                 manager.programs)
@@ -5,6 +5,7 @@ from unittest import TestCase
 import pendulum
 
 from sprinkler.program.time_utilities import after_now, seconds_from_midnight, utc_for_local_midnight
+from sprinkler.program.time_utilities import local_day_for_utc_now, utc_bounds_for_local_day
 
 class TestTimeUtils(TestCase):
     """Test out the time utilities"""
@@ -29,6 +30,40 @@ class TestTimeUtils(TestCase):
         for test_now, expected_mid in tests:
             test_val = utc_for_local_midnight(test_now, self.tz)
             self.assertEqual(expected_mid, test_val)
+    def test_utc_bounds_for_local_day(self):
+        """Tests utc_bounds_for_local_day over normal and DST transition days"""
+        tests = [
+            (pendulum.datetime(2022, 4, 1, hour = 6, tz = self.tz), 24),
+            (pendulum.datetime(2023, 3, 12, hour = 6, tz = self.tz), 23),
+            (pendulum.datetime(2023, 11, 5, hour = 0, minute = 30, tz = self.tz), 25),
+            (pendulum.datetime(2023, 11, 5, hour = 23, minute = 59, tz = self.tz), 25),
+        ]
+        for test_dt, hours in tests:
+            with self.subTest(test_dt=test_dt, hours=hours):
+                start, end = utc_bounds_for_local_day(test_dt.float_timestamp, self.tz)
+                self.assertEqual(test_dt.start_of("day").float_timestamp, start)
+                self.assertEqual(hours * 3600, end - start)
+    def test_local_day_cache_rolls_over(self):
+        """Tests the cached local day follows now across midnight, and back"""
+        midnight = pendulum.datetime(2022, 4, 2, tz = self.tz)
+        tests = [
+            (midnight.float_timestamp - 1, 1),
+            (midnight.float_timestamp, 2),
+            (midnight.float_timestamp + 3600, 2),
+            (midnight.float_timestamp - 3600, 1),
+        ]
+        for test_now, day in tests:
+            with self.subTest(test_now=test_now, day=day):
+                local_day = local_day_for_utc_now(test_now, self.tz)
+                self.assertEqual(day, local_day.date.day)
+                self.assertTrue(local_day.start <= test_now < local_day.end)
+    def test_local_midnight_in_dst_gap(self):
+        """Tests a day whose midnight is skipped starts at the end of the gap"""
+        # Cuba springs forward from midnight to 1 am
+        havana = "America/Havana"
+        noon = pendulum.datetime(2023, 3, 12, hour = 12, tz = havana).float_timestamp
+        one_am = pendulum.datetime(2023, 3, 12, hour = 1, tz = havana).float_timestamp
+        self.assertEqual(one_am, utc_for_local_midnight(noon, havana))
     def test_seconds_from_midnight(self):
         """Tests seconds_from_midnight"""
         tests: List[Tuple[int, int, int]] = [
@@ -0,0 +1,128 @@
+"""Tests the weather providers and cache"""
+
+import io
+import json
+import os
+import tempfile
+import threading
+from copy import deepcopy
+from unittest import TestCase
+
+import pendulum
+
+from sprinkler.board.virtual import VirtualStreamBoard
+from sprinkler.controller.aio import CachedWeatherController
+from sprinkler.program.dictionary.manager import DictProgramManager
+from sprinkler.program.dictionary.program import LOCAL_TZ
+from sprinkler.station.station import Station
+from sprinkler.weather import CachedWeather, FileWeatherProvider, StaticWeatherProvider
+from sprinkler.weather import WeatherProvider, WeatherState
+from tests.sample_prog_data import SAMPLE_PROGRAM_DICT
+
+class FakeClock: # pylint: disable=too-few-public-methods
+    """Clock the tests move by hand"""
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self) -> float:
+        return self.now
+
+class FlakyProvider(WeatherProvider): # pylint: disable=too-few-public-methods
+    """Provider returning its state, or raising while it is down"""
+    def __init__(self, state: WeatherState):
+        self.state = state
+        self.down = False
+        self.fetches = 0
+        self.fetched = threading.Event()
+    def fetch(self) -> WeatherState:
+        """Returns the state unless it is down"""
+        self.fetches += 1
+        self.fetched.set()
+        if self.down:
+            raise ConnectionError("provider is down")
+        return self.state
+
+class TestFileWeatherProvider(TestCase):
+    """Tests FileWeatherProvider"""
+    def test_fetch(self):
+        """Tests the file is read, with defaults for what is missing"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "weather.json")
+            with open(path, "w", encoding="utf-8") as weather_file:
+                json.dump({"rain_delay": True, "watering_percentage": 80}, weather_file)
+            self.assertEqual(WeatherState(False, True, 80), FileWeatherProvider(path).fetch())
+
+class TestCachedWeather(TestCase):
+    """Tests CachedWeather"""
+    def setUp(self):
+        self.clock = FakeClock()
+        self.provider = FlakyProvider(WeatherState(rain_delay=True))
+        self.cache = CachedWeather(self.provider, ttl=60, max_stale=600, clock=self.clock)
+        self.addCleanup(self.cache.stop, 5)
+    def test_default_until_fetched(self):
+        """Tests the default is returned until the weather is looked up"""
+        self.assertEqual(WeatherState(), self.cache.get())
+        self.assertTrue(self.cache.refresh())
+        self.assertEqual(WeatherState(rain_delay=True), self.cache.get())
+        self.assertEqual(1, self.provider.fetches)
+    def test_stale_while_revalidate(self):
+        """Tests stale weather is still returned until max_stale"""
+        self.cache.refresh()
+        self.provider.down = True
+        self.clock.now += 120
+        self.assertEqual(WeatherState(rain_delay=True), self.cache.get())
+        self.assertFalse(self.cache.refresh())
+        self.assertEqual(1, self.cache.failures)
+        self.assertEqual(WeatherState(rain_delay=True), self.cache.get())
+        self.clock.now += 600
+        self.assertEqual(WeatherState(), self.cache.get())
+    def test_worker_refreshes_stale(self):
+        """Tests the worker looks the weather up and again once it is stale"""
+        changes = []
+        changed = threading.Event()
+        def on_change(state: WeatherState):
+            changes.append(state)
+            changed.set()
+        self.cache.on_change = on_change
+        self.cache.start()
+        self.assertTrue(changed.wait(5))
+        self.assertEqual([WeatherState(rain_delay=True)], changes)
+        self.assertEqual(WeatherState(rain_delay=True), self.cache.get())
+        self.provider.fetched.clear()
+        changed.clear()
+        self.provider.state = WeatherState(watering_percentage=50)
+        self.clock.now += 120
+        # The stale weather comes back right away, and the worker revalidates
+        self.assertEqual(WeatherState(rain_delay=True), self.cache.get())
+        self.assertTrue(changed.wait(5))
+        self.assertEqual(WeatherState(watering_percentage=50), self.cache.get())
+        self.cache.stop(5)
+        self.assertFalse(self.cache.running)
+    def test_worker_skips_fresh_weather(self):
+        """Tests the worker doesn't look up again weather that was just looked up"""
+        self.cache.refresh()
+        self.provider.fetched.clear()
+        self.cache.start()
+        self.assertFalse(self.provider.fetched.wait(0.1))
+        self.assertEqual(1, self.provider.fetches)
+        self.clock.now += 120
+        self.cache.get()
+        self.assertTrue(self.provider.fetched.wait(5))
+
+class TestCachedWeatherController(TestCase):
+    """Tests the CachedWeatherController reads the cache on the tick"""
+    def test_tick_reads_cache(self):
+        """Tests the rain delay and watering percentage come from the cache"""
+        all_st = {_i: Station(_i, True, True) for _i in range(1, 9)}
+        board = VirtualStreamBoard(list(all_st.values()), io.StringIO())
+        manager = DictProgramManager([deepcopy(SAMPLE_PROGRAM_DICT)], all_st, LOCAL_TZ)
+        provider = StaticWeatherProvider(WeatherState(watering_percentage=50))
+        controller = CachedWeatherController(board, manager, CachedWeather(provider))
+        controller.weather.refresh()
+        start = pendulum.datetime(2022, 4, 2, 6, tz=LOCAL_TZ).float_timestamp
+        controller.on_tick(start)
+        self.assertEqual(50, controller.water_adjust_percent)
+        self.assertEqual(0.5, controller.current_program.watering_scale)
+        provider.state = WeatherState(rain_delay=True)
+        controller.weather.refresh()
+        controller.on_tick(start + 1)
+        self.assertEqual([0] * 8, board.get_bit_pattern())